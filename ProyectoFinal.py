@@ -1,193 +1,198 @@
 import sys
-import math
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QVBoxLayout, QPushButton, QWidget,
-    QComboBox, QScrollArea, QMessageBox, QHBoxLayout, QDesktopWidget
+    QComboBox, QMessageBox, QHBoxLayout, QDesktopWidget, QPlainTextEdit, QProgressBar,
+    QTableView, QHeaderView, QAbstractItemView, QLineEdit, QFileDialog
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFontDatabase
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-import networkx as nx
+from matplotlib.figure import Figure
 from matplotlib.lines import Line2D  # Añadido para solucionar el error NameError
-
-class Nodo:
-    def __init__(self, name, tipo, pared, ventana, puerta, ruido, frecuencia, position, piso, es_fuente=False):
-        self.name = name
-        self.tipo = tipo
-        self.pared = pared
-        self.ventana = ventana
-        self.puerta = puerta
-        self.ruido = ruido
-        self.frecuencia = frecuencia
-        self.sensores = []
-        self.conexiones = []
-        self.position = position  # (x, y, z)
-        self.piso = piso
-        self.es_fuente = es_fuente
-
-    def agregar_sensor(self, sensor):
-        self.sensores.append(sensor)
-
-    def conectar(self, nodo):
-        if nodo not in self.conexiones:
-            self.conexiones.append(nodo)
-            nodo.conectar_bidireccional(self)
-
-    def conectar_bidireccional(self, nodo):
-        if nodo not in self.conexiones:
-            self.conexiones.append(nodo)
-
-    def medir_ruido(self):
-        ruido_propio = self.ruido if self.es_fuente else 0
-        ruido_propagado = 0
-        for nodo in self.conexiones:
-            distancia = self.calcular_distancia(nodo)
-            if distancia == 0:
-                continue
-            atenuacion = math.log(distancia + 1)  # Atenuación logarítmica
-            if self.piso != nodo.piso:
-                atenuacion *= 1.5  # Mayor atenuación entre pisos
-            ruido_propagado += nodo.ruido / atenuacion
-        absorcion = 0.8 if self.pared else 1.0
-        ruido_total = ruido_propio + (ruido_propagado * absorcion)
-        return ruido_total
-
-    def calcular_distancia(self, otro_nodo):
-        x1, y1, z1 = self.position
-        x2, y2, z2 = otro_nodo.position
-        return math.sqrt((x2 - x1)**2 + (y2 - y1)**2 + (z2 - z1)**2)
-
-    def get_limite_ruido(self):
-        limites = {
-            "aula": {"limite_adecuado": 55, "limite_cercano": 60, "limite_excedido": 65},
-            "pasillo": {"limite_adecuado": 45, "limite_cercano": 50, "limite_excedido": 55},
-            "biblioteca": {"limite_adecuado": 35, "limite_cercano": 40, "limite_excedido": 45},
-            "auditorio": {"limite_adecuado": 60, "limite_cercano": 65, "limite_excedido": 70},
-            "cafetería": {"limite_adecuado": 60, "limite_cercano": 65, "limite_excedido": 70},
-            "laboratorio": {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60},
-            "oficina": {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60},
-            "reuniones": {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60},
-        }
-        return limites.get(self.tipo, {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60})
-
-class Sensor:
-    def __init__(self, ubicacion, ruido_fijo=None):
-        self.ubicacion = ubicacion
-        self.ruido_fijo = ruido_fijo
-
-    def medir(self):
-        return self.ruido_fijo if self.ruido_fijo is not None else 0
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+import numpy as np
+from grafo import datos_grafo
+from modelo import ESTADOS
+from modelo_reporte import ModeloReporte
+from simulacion import Simulacion, cargar_edificio, crear_edificio_predeterminado, escribir_reporte
+from optimizacion import aplicar_plan, describir, optimizar
+from trabajos import EjecutorFondo
+import perfil
+
+COLORES_ESTADO = {"Excede": 'red', "Cerca": 'yellow', "Adecuado": 'green'}
+PRESUPUESTO_OPTIMIZACION = 5.0  # Segundos de búsqueda del plan de arreglos desde la interfaz
 
 class ReporteWindow(QWidget):
-    def __init__(self, datos_reporte):
+    MAX_PISOS_FILTRO = 500  # Más pisos que esto no se listan en el filtro
+
+    def __init__(self, tabla, exportar_func=None):
         super().__init__()
         self.setWindowTitle("Reporte de Ruido")
-        self.setGeometry(150, 150, 400, 500)
-
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        contenido = QWidget()
-        layout = QVBoxLayout()
-
-        for name, nivel, estado, recomendacion in datos_reporte:
-            if estado == "Excede":
-                simbolo = "❌"
-                color = "red"
-            elif estado == "Cerca":
-                simbolo = "⚠️"
-                color = "orange"
-            else:
-                simbolo = "✅"
-                color = "green"
-            texto = f"{simbolo} {name}: {nivel:.2f} dB - {recomendacion}"
-            label = QLabel(texto)
-            label.setWordWrap(True)
-            label.setStyleSheet(f"color: {color};")
-            layout.addWidget(label)
-
-        contenido.setLayout(layout)
-        scroll.setWidget(contenido)
+        self.setGeometry(150, 150, 800, 500)
+        self.exportar_func = exportar_func
+
+        with perfil.etapa("widgets_reporte"):
+            # La tabla solo crea lo que se ve: el costo no crece con el número de habitaciones
+            self.modelo = ModeloReporte(tabla, self)
+            self.tabla = QTableView()
+            self.tabla.setModel(self.modelo)
+            self.tabla.verticalHeader().hide()
+            self.tabla.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+            self.tabla.horizontalHeader().setStretchLastSection(True)
+            self.tabla.setSelectionBehavior(QAbstractItemView.SelectRows)
+            self.tabla.setWordWrap(False)
+            self.tabla.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+            self.tabla.setSortingEnabled(True)
+
+            self.filtro_estado = QComboBox()
+            self.filtro_estado.addItem("Todos los estados", None)
+            for codigo, estado in enumerate(ESTADOS):
+                self.filtro_estado.addItem(estado, codigo)
+            self.filtro_piso = QComboBox()
+            self.filtro_piso.addItem("Todos los pisos", None)
+            pisos = np.unique(tabla["pisos"])
+            for piso in pisos[:self.MAX_PISOS_FILTRO].tolist():
+                self.filtro_piso.addItem(f"Piso {piso}", piso)
+            self.filtro_tipo = QComboBox()
+            self.filtro_tipo.addItem("Todos los tipos", None)
+            for tipo in tabla["tipos"]:
+                self.filtro_tipo.addItem(tipo, tipo)
+            self.buscar = QLineEdit()
+            self.buscar.setPlaceholderText("Buscar habitación")
+            self.buscar.setClearButtonEnabled(True)
+            # Buscar al dejar de escribir, no en cada tecla
+            self.demora_busqueda = QTimer(self)
+            self.demora_busqueda.setSingleShot(True)
+            self.demora_busqueda.setInterval(250)
+            self.demora_busqueda.timeout.connect(self.aplicar_filtros)
+            self.buscar.textChanged.connect(self.demora_busqueda.start)
+            for combo in (self.filtro_estado, self.filtro_piso, self.filtro_tipo):
+                combo.currentIndexChanged.connect(self.aplicar_filtros)
+        perfil.fijar("filas_reporte", len(tabla["nombres"]))
+
+        filtros = QHBoxLayout()
+        for widget in (self.filtro_estado, self.filtro_piso, self.filtro_tipo, self.buscar):
+            filtros.addWidget(widget)
+
+        self.resumen = QLabel()
+        botones = QHBoxLayout()
+        botones.addWidget(self.resumen, 1)
+        for formato in ("csv", "json"):
+            boton = QPushButton(f"Exportar {formato.upper()}")
+            boton.clicked.connect(lambda _, formato=formato: self.exportar(formato))
+            boton.setEnabled(exportar_func is not None)
+            botones.addWidget(boton)
 
         main_layout = QVBoxLayout()
-        main_layout.addWidget(scroll)
+        main_layout.addLayout(filtros)
+        main_layout.addWidget(self.tabla)
+        main_layout.addLayout(botones)
         self.setLayout(main_layout)
+        self.mostrar_resumen()
+
+    def aplicar_filtros(self):
+        self.demora_busqueda.stop()
+        self.modelo.filtrar(
+            estado=self.filtro_estado.currentData(),
+            piso=self.filtro_piso.currentData(),
+            tipo=self.filtro_tipo.currentData(),
+            texto=self.buscar.text().strip(),
+        )
+        self.mostrar_resumen()
+
+    def copiar_vista(self, anterior):
+        # Conserva filtros y orden al reemplazar la ventana tras un recálculo completo
+        for combo, combo_anterior in ((self.filtro_estado, anterior.filtro_estado),
+                                      (self.filtro_piso, anterior.filtro_piso),
+                                      (self.filtro_tipo, anterior.filtro_tipo)):
+            combo.blockSignals(True)
+            combo.setCurrentIndex(max(combo.findData(combo_anterior.currentData()), 0))
+            combo.blockSignals(False)
+        self.buscar.blockSignals(True)
+        self.buscar.setText(anterior.buscar.text())
+        self.buscar.blockSignals(False)
+        self.setGeometry(anterior.geometry())
+        encabezado = anterior.tabla.horizontalHeader()
+        self.tabla.horizontalHeader().setSortIndicator(encabezado.sortIndicatorSection(), encabezado.sortIndicatorOrder())
+        self.aplicar_filtros()
+
+    def mostrar_resumen(self):
+        conteo = self.modelo.conteo().tolist()
+        total = len(self.modelo.nombres)
+        visibles = self.modelo.rowCount()
+        texto = f"{visibles} de {total} habitaciones" if visibles != total else f"{total} habitaciones"
+        self.resumen.setText(texto + " — " + ", ".join(
+            f"{estado}: {cantidad}" for estado, cantidad in zip(reversed(ESTADOS), reversed(conteo))
+        ))
+
+    def exportar(self, formato):
+        ruta, _ = QFileDialog.getSaveFileName(
+            self, "Exportar reporte", f"reporte.{formato}", f"{formato.upper()} (*.{formato})"
+        )
+        if ruta:
+            # Exporta las filas visibles, en el orden de la tabla
+            self.exportar_func(ruta, formato, self.modelo.visibles.copy())
+
+    def actualizar_filas(self, filas):
+        # Parchea solo las filas de las habitaciones afectadas
+        self.modelo.actualizar_filas(filas)
+        self.mostrar_resumen()
 
 class Grafo3DWindow(QWidget):
-    def __init__(self, habitaciones, posiciones_fijas):
+    # Por encima de estos límites se dibujan solo las aristas más cortas y las
+    # etiquetas de las habitaciones más problemáticas
+    MAX_ARISTAS = 5000
+    MAX_ETIQUETAS = 200
+
+    def __init__(self, simulacion, max_aristas=MAX_ARISTAS, max_etiquetas=MAX_ETIQUETAS, figura=None):
+        # `figura` (de construir_figura) puede prepararse fuera del hilo de la interfaz
         super().__init__()
         self.setWindowTitle("Grafo 3D")
         self.setGeometry(150, 150, 800, 600)
         layout = QVBoxLayout()
 
-        fig = plt.figure()
+        if figura is None:
+            # Conexiones acústicas reales más pares de pisos adyacentes cercanos (índice espacial)
+            datos = datos_grafo(simulacion, max_aristas=max_aristas, max_etiquetas=max_etiquetas)
+            figura = self.construir_figura(simulacion, datos)
+        self.indice = figura["indice"]
+        self.colores = figura["colores"]
+        self.puntos = figura["puntos"]
+        self.canvas = FigureCanvas(figura["figura"])
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+        self.canvas.draw()
+
+    @classmethod
+    def construir_figura(cls, simulacion, datos):
+        # Figura y artistas sin widgets (Figure, no pyplot), así que no necesita el hilo de la interfaz
+        with perfil.etapa("dibujo_grafo"):
+            return cls._construir_figura(simulacion, datos)
+
+    @classmethod
+    def _construir_figura(cls, simulacion, datos):
+        fig = Figure()
         ax = fig.add_subplot(111, projection='3d')
+        posiciones = datos["posiciones"]
 
-        G = nx.Graph()
-        for name, nodo in habitaciones.items():
-            G.add_node(name, tipo=nodo.tipo, ruido=nodo.medir_ruido())
-
-        # Conectar todos los nodos dentro del mismo piso
-        pisos = {}
-        for name, nodo in habitaciones.items():
-            pisos.setdefault(nodo.piso, []).append(nodo)
-
-        for piso, nodos in pisos.items():
-            for i in range(len(nodos)):
-                for j in range(i + 1, len(nodos)):
-                    G.add_edge(nodos[i].name, nodos[j].name)
-
-        # Conectar entre pisos adyacentes
-        for piso, nodos in pisos.items():
-            if piso < max(pisos.keys()):
-                pisos_siguiente = pisos.get(piso + 1, [])
-                for nodo in nodos:
-                    for otro_nodo in pisos_siguiente:
-                        distancia_total = nodo.calcular_distancia(otro_nodo)
-                        if distancia_total <= 7:  # Umbral ajustado
-                            G.add_edge(nodo.name, otro_nodo.name)
-
-        pos = posiciones_fijas  # Usar posiciones fijas
-        nx.set_node_attributes(G, pos, 'pos')
-
-        # Dibujar nodos
-        for name, nodo in habitaciones.items():
-            niveles = nodo.get_limite_ruido()
-            nivel_ruido = nodo.medir_ruido()
-            if nivel_ruido > niveles['limite_excedido']:
-                color = 'red'
-            elif nivel_ruido > niveles['limite_cercano']:
-                color = 'yellow'
-            else:
-                color = 'green'
-            p = pos[name]
-            ax.scatter(p[0], p[1], p[2], color=color, s=100)
-            ax.text(p[0], p[1], p[2], name, fontsize=9)
-
-        # Dibujar aristas con atenuación logarítmica
-        for edge in G.edges():
-            if edge[0] in pos and edge[1] in pos:
-                p1 = pos[edge[0]]
-                p2 = pos[edge[1]]
-                distancia = math.sqrt(
-                    (p2[0] - p1[0])**2 +
-                    (p2[1] - p1[1])**2 +
-                    (p2[2] - p1[2])**2
-                )
-                atenuacion = math.log(distancia + 1)  # Evitar log(0)
-                ax.plot(
-                    [p1[0], p2[0]],
-                    [p1[1], p2[1]],
-                    [p1[2], p2[2]],
-                    color='gray',
-                    linestyle='--',
-                    linewidth=0.5 / atenuacion  # Atenuar según distancia
-                )
+        # Todos los nodos en una sola colección
+        colores = list(datos["colores"])
+        puntos = ax.scatter(
+            posiciones[:, 0], posiciones[:, 1], posiciones[:, 2], c=colores, s=100, depthshade=False
+        )
+        for i in datos["etiquetas"].tolist():
+            ax.text(*posiciones[i], datos["nombres"][i], fontsize=9)
+
+        # Todas las aristas en una sola colección, con atenuación logarítmica en el ancho
+        ax.add_collection3d(Line3DCollection(
+            datos["segmentos"], colors='gray', linestyles='--', linewidths=datos["anchos"]
+        ))
 
         # Configurar límites de los ejes basados en el primer piso
-        limite_piso1 = self.obtener_limites_piso1(habitaciones)
+        limite_piso1 = cls.obtener_limites_piso1(simulacion.habitaciones)
         ax.set_xlim([-limite_piso1['x'], limite_piso1['x']])
         ax.set_ylim([-limite_piso1['y'], limite_piso1['y']])
-        ax.set_zlim([0, max(piso for piso in pisos.keys()) * 3 + 3])  # Ajustar según pisos
+        ax.set_zlim([0, max(nodo.piso for nodo in simulacion.habitaciones.values()) * 3 + 3])  # Ajustar según pisos
 
         # Añadir leyenda
         legend_elements = [
@@ -196,34 +201,55 @@ class Grafo3DWindow(QWidget):
             Line2D([0], [0], marker='o', color='w', label='Excede límite', markerfacecolor='red', markersize=10)
         ]
         ax.legend(handles=legend_elements, loc='upper right')
+        return {
+            "figura": fig, "puntos": puntos, "colores": colores,
+            "indice": {name: i for i, name in enumerate(datos["nombres"])},
+        }
 
-        self.canvas = FigureCanvas(fig)
-        layout.addWidget(self.canvas)
-        self.setLayout(layout)
-        self.canvas.draw()
-
-    def obtener_limites_piso1(self, habitaciones):
+    def actualizar_colores(self, estados):
+        # Recolorea en sitio los puntos de las habitaciones afectadas
+        for name, estado in estados.items():
+            i = self.indice.get(name)
+            if i is not None:
+                self.colores[i] = COLORES_ESTADO[estado]
+        self.puntos.set_color(self.colores)
+        self.canvas.draw_idle()
+
+    @staticmethod
+    def obtener_limites_piso1(habitaciones):
         nodos_piso1 = [nodo for nodo in habitaciones.values() if nodo.piso == 1]
         max_x = max(abs(nodo.position[0]) for nodo in nodos_piso1)
         max_y = max(abs(nodo.position[1]) for nodo in nodos_piso1)
         return {'x': max_x + 2, 'y': max_y + 2}  # Margen adicional
 
+def habitaciones_excedidas(simulacion, trabajo=None):
+    # Habitaciones que exceden según los niveles del motor (mismo modo y suma que el reporte y
+    # el grafo); solo se evalúa si todavía no hay niveles o cambió la topología
+    if trabajo is not None:
+        trabajo.progreso(-1, "Buscando habitaciones que exceden")
+    with perfil.etapa("excedidas"):
+        if not simulacion.datos_ruido or simulacion.version_motor != simulacion.edificio.version:
+            simulacion.evaluar()
+        estados = simulacion.motor.estados(simulacion.niveles)
+        nombres = simulacion.motor.nombres
+        return [nombres[i] for i in np.flatnonzero(estados == ESTADOS.index("Excede")).tolist()]
+
 class ArreglarNodoWindow(QWidget):
-    def __init__(self, habitaciones, actualizar_func):
+    def __init__(self, habitaciones, excedidas, arreglar_func, optimizar_func=None):
+        # arreglar_func(name, ruido) aplica el cambio y recalcula en segundo plano (la ventana no
+        # modifica habitaciones mientras el ejecutor puede estar usándolas); optimizar_func(al_terminar)
+        # busca el plan en segundo plano y llama al_terminar(resultado)
         super().__init__()
         self.setWindowTitle("Arreglar Nodo")
         self.setGeometry(300, 300, 300, 200)  # Tamaño reducido
         self.habitaciones = habitaciones
-        self.actualizar_func = actualizar_func
+        self.arreglar_func = arreglar_func
+        self.optimizar_func = optimizar_func
 
         layout = QVBoxLayout()
 
         self.combo = QComboBox()
-        for name, nodo in habitaciones.items():
-            limites = nodo.get_limite_ruido()
-            nivel = nodo.medir_ruido()
-            if nivel > limites['limite_excedido']:
-                self.combo.addItem(name)
+        self.combo.addItems(excedidas)
         layout.addWidget(QLabel("Seleccionar nodo a arreglar:"))
         layout.addWidget(self.combo)
 
@@ -231,6 +257,11 @@ class ArreglarNodoWindow(QWidget):
         self.btn_arreglar.clicked.connect(self.arreglar)
         layout.addWidget(self.btn_arreglar, alignment=Qt.AlignCenter)
 
+        if optimizar_func is not None:
+            self.btn_optimizar = QPushButton("Optimizar todos")
+            self.btn_optimizar.clicked.connect(self.optimizar)
+            layout.addWidget(self.btn_optimizar, alignment=Qt.AlignCenter)
+
         self.setLayout(layout)
 
     def arreglar(self):
@@ -238,13 +269,54 @@ class ArreglarNodoWindow(QWidget):
         if name:
             nodo = self.habitaciones[name]
             limites = nodo.get_limite_ruido()
-            nodo.ruido = limites['limite_adecuado']  # Reducir el ruido al límite adecuado
-            self.actualizar_func()
+            self.arreglar_func(name, limites['limite_adecuado'])  # Reducir el ruido al límite adecuado
             QMessageBox.information(self, "Arreglar Nodo", f"Nodo '{name}' arreglado al límite adecuado.")
             self.close()
 
-class MainWindow(QMainWindow):
+    def optimizar(self):
+        self.btn_optimizar.setEnabled(False)
+        self.btn_optimizar.setText("Optimizando...")
+        self.optimizar_func(self.mostrar_optimizacion)
+
+    def mostrar_optimizacion(self, resultado):
+        lineas = [describir(intervencion) for intervencion in resultado["intervenciones"]]
+        if resultado["factible"]:
+            lineas.append(f"Costo total: {resultado['costo']:g}")
+        else:
+            lineas.append(f"Quedan {resultado['excede']} habitaciones excediendo (costo {resultado['costo']:g})")
+        QMessageBox.information(self, "Optimizar Arreglos", "\n".join(lineas))
+        self.close()
+
+class PerfilWindow(QWidget):
+    # Desglose del último refresco (perfil.ultimo), revisado periódicamente
+    INTERVALO_MS = 500
+
     def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Perfil")
+        self.setGeometry(200, 200, 560, 420)
+        self.texto = QPlainTextEdit()
+        self.texto.setReadOnly(True)
+        self.texto.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout = QVBoxLayout()
+        layout.addWidget(self.texto)
+        self.setLayout(layout)
+
+        self.mostrado = None
+        self.temporizador = QTimer(self)
+        self.temporizador.timeout.connect(self.refrescar)
+        self.temporizador.start(self.INTERVALO_MS)
+        self.refrescar()
+
+    def refrescar(self):
+        ultimo = perfil.ultimo()
+        if ultimo is self.mostrado:
+            return
+        self.mostrado = ultimo
+        self.texto.setPlainText(ultimo.texto() if ultimo is not None else "Todavía no hay refrescos medidos.")
+
+class MainWindow(QMainWindow):
+    def __init__(self, ruta=None):
         super().__init__()
         self.setWindowTitle("Simulación de Ruido")
         self.setGeometry(100, 100, 600, 400)  # Tamaño reducido
@@ -252,21 +324,31 @@ class MainWindow(QMainWindow):
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
 
-        self.habitaciones = {}
-        self.datos_ruido = []
+        # Un edificio de archivo (JSON, CSV o compilado .edif) o el de ejemplo
+        self.edificio = cargar_edificio(ruta, compacto=True) if ruta else crear_edificio_predeterminado()
+        self.habitaciones = self.edificio.habitaciones
+        self.simulacion = Simulacion(self.edificio)
         self.reporte_generado = False
-        self.posiciones_fijas = {}
+        self.mensaje_progreso = ""
+        self.pendientes = set()  # Habitaciones modificadas aún sin recalcular (None: recalcular todo)
+        self.cambios = {}  # name -> ruido pedido desde la interfaz, que aplica el recálculo en segundo plano
 
-        self.inicializar_nodos()
-        self.conectar_nodos()
-        self.aplicar_reduccion_grafo()
+        self.simulacion.aplicar_reduccion_grafo()
 
         # Crear botones
         layout_principal = QVBoxLayout()
         layout_principal.setSpacing(10)  # Espaciado reducido
         layout_principal.setContentsMargins(20, 20, 20, 20)  # Márgenes ajustados
 
-        bot_textos = ["Generar Reporte", "Mostrar Grafo 3D", "Arreglar Nodo", "Salir"]
+        acciones = [
+            ("Generar Reporte", self.mostrar_reporte),
+            ("Mostrar Grafo 3D", self.mostrar_grafo),
+            ("Arreglar Nodo", self.arreglar_nodo),
+        ]
+        if perfil.activo():
+            acciones.append(("Perfil", self.mostrar_perfil))
+        acciones.append(("Salir", self.close))
+        bot_textos = [texto for texto, _ in acciones]
         botones = []
         ancho_boton = self.obtener_ancho_boton(bot_textos)
 
@@ -284,13 +366,20 @@ class MainWindow(QMainWindow):
         layout_principal.addStretch()
 
         # Conectar botones
-        botones[0].clicked.connect(self.mostrar_reporte)
-        botones[1].clicked.connect(self.mostrar_grafo)
-        botones[2].clicked.connect(self.arreglar_nodo)
-        botones[3].clicked.connect(self.close)
+        for btn, (_, funcion) in zip(botones, acciones):
+            btn.clicked.connect(funcion)
 
         self.central_widget.setLayout(layout_principal)
 
+        # Los cálculos corren en segundo plano; aquí solo se muestra su progreso
+        self.barra_progreso = QProgressBar()
+        self.barra_progreso.setMaximumWidth(200)
+        self.barra_progreso.hide()
+        self.statusBar().addPermanentWidget(self.barra_progreso)
+        self.ejecutor = EjecutorFondo(self)
+        self.ejecutor.progreso.connect(self.mostrar_progreso)
+        self.ejecutor.ocupado.connect(self.mostrar_ocupado)
+
     def centrar_ventana(self):
         qr = self.frameGeometry()
         cp = QDesktopWidget().availableGeometry().center()
@@ -303,202 +392,199 @@ class MainWindow(QMainWindow):
         max_ancho = max([fm.width(texto) for texto in textos]) + 40
         return max_ancho
 
-    def inicializar_nodos(self):
-        # Definir posiciones fijas para asegurar layout consistente
-        # Ampliar el edificio con más pisos y espacios
-        # Formato: (x, y, z)
-        self.habitaciones = {
-            # Piso 1
-            "Recepción": Nodo("Recepción", "oficina", True, True, True, 50, 1, (0, 0, 0), piso=1, es_fuente=True),
-            "Oficina 1": Nodo("Oficina 1", "oficina", True, True, True, 55, 1, (-4, 2, 0), piso=1),
-            "Oficina 2": Nodo("Oficina 2", "oficina", True, True, True, 60, 1, (-4, -2, 0), piso=1),
-            "Pasillo 1": Nodo("Pasillo 1", "pasillo", False, False, False, 40, 1, (-2, 0, 0), piso=1),
-            "Sala de Reuniones 1": Nodo("Sala de Reuniones 1", "reuniones", True, True, True, 52, 1, (2, 2, 0), piso=1),
-            "Sala de Reuniones 2": Nodo("Sala de Reuniones 2", "reuniones", True, True, True, 48, 1, (2, -2, 0), piso=1),
-            "Aula 1": Nodo("Aula 1", "aula", True, True, True, 58, 1, (4, 2, 0), piso=1),
-            "Aula 2": Nodo("Aula 2", "aula", True, True, True, 62, 1, (4, -2, 0), piso=1),
-            # Piso 2
-            "Laboratorio 1": Nodo("Laboratorio 1", "laboratorio", True, True, True, 45, 1, (-4, 2, 3), piso=2),
-            "Laboratorio 2": Nodo("Laboratorio 2", "laboratorio", True, True, True, 48, 1, (-4, -2, 3), piso=2),
-            "Oficina 3": Nodo("Oficina 3", "oficina", True, True, True, 50, 1, (-2, 2, 3), piso=2),
-            "Pasillo 2": Nodo("Pasillo 2", "pasillo", False, False, False, 42, 1, (-2, 0, 3), piso=2),
-            "Biblioteca": Nodo("Biblioteca", "biblioteca", True, True, True, 35, 1, (2, 2, 3), piso=2),
-            "Aula 3": Nodo("Aula 3", "aula", True, True, True, 57, 1, (4, 2, 3), piso=2),
-            "Aula 4": Nodo("Aula 4", "aula", True, True, True, 61, 1, (4, -2, 3), piso=2),
-            # Piso 3
-            "Auditorio": Nodo("Auditorio", "auditorio", True, True, True, 70, 1, (-4, 2, 6), piso=3, es_fuente=True),
-            "Cafetería": Nodo("Cafetería", "cafetería", True, True, True, 65, 1, (-4, -2, 6), piso=3),
-            "Oficina 4": Nodo("Oficina 4", "oficina", True, True, True, 55, 1, (-2, 2, 6), piso=3),
-            "Pasillo 3": Nodo("Pasillo 3", "pasillo", False, False, False, 43, 1, (-2, 0, 6), piso=3),
-            "Laboratorio 3": Nodo("Laboratorio 3", "laboratorio", True, True, True, 50, 1, (2, 2, 6), piso=3),
-            "Oficina 5": Nodo("Oficina 5", "oficina", True, True, True, 53, 1, (2, -2, 6), piso=3),
-            "Sala de Reuniones 3": Nodo("Sala de Reuniones 3", "reuniones", True, True, True, 49, 1, (0, 0, 6), piso=3),
-            "Aula 5": Nodo("Aula 5", "aula", True, True, True, 59, 1, (4, 2, 6), piso=3),
-            "Aula 6": Nodo("Aula 6", "aula", True, True, True, 63, 1, (4, -2, 6), piso=3),
-            # Piso 4
-            "Biblioteca 2": Nodo("Biblioteca 2", "biblioteca", True, True, True, 34, 1, (-4, 2, 9), piso=4),
-            "Oficina 6": Nodo("Oficina 6", "oficina", True, True, True, 54, 1, (-2, 2, 9), piso=4),
-            "Pasillo 4": Nodo("Pasillo 4", "pasillo", False, False, False, 44, 1, (-2, 0, 9), piso=4),
-            "Aula 7": Nodo("Aula 7", "aula", True, True, True, 60, 1, (4, 2, 9), piso=4),
-            "Aula 8": Nodo("Aula 8", "aula", True, True, True, 64, 1, (4, -2, 9), piso=4),
-        }
+    def generar_reporte(self):
+        pass  # Ya se ha generado en comparar_estandares
 
-        # Agregar sensores a los nodos
-        for habitacion in self.habitaciones.values():
-            habitacion.agregar_sensor(Sensor(habitacion.name, ruido_fijo=habitacion.ruido))
-
-        # Definir posiciones fijas
-        self.posiciones_fijas = {name: nodo.position for name, nodo in self.habitaciones.items()}
-
-    def conectar_nodos(self):
-        # Conexiones Piso 1
-        self.habitaciones["Recepción"].conectar(self.habitaciones["Pasillo 1"])
-        self.habitaciones["Oficina 1"].conectar(self.habitaciones["Pasillo 1"])
-        self.habitaciones["Oficina 2"].conectar(self.habitaciones["Pasillo 1"])
-        self.habitaciones["Pasillo 1"].conectar(self.habitaciones["Sala de Reuniones 1"])
-        self.habitaciones["Pasillo 1"].conectar(self.habitaciones["Sala de Reuniones 2"])
-        self.habitaciones["Pasillo 1"].conectar(self.habitaciones["Aula 1"])
-        self.habitaciones["Pasillo 1"].conectar(self.habitaciones["Aula 2"])
-
-        # Conexiones entre Piso 1 y Piso 2
-        self.habitaciones["Pasillo 1"].conectar(self.habitaciones["Pasillo 2"])
-
-        # Conexiones Piso 2
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Laboratorio 1"])
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Laboratorio 2"])
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Oficina 3"])
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Biblioteca"])
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Aula 3"])
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Aula 4"])
-
-        # Conexiones entre Piso 2 y Piso 3
-        self.habitaciones["Pasillo 2"].conectar(self.habitaciones["Pasillo 3"])
-
-        # Conexiones Piso 3
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Auditorio"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Cafetería"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Oficina 4"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Laboratorio 3"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Oficina 5"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Sala de Reuniones 3"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Aula 5"])
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Aula 6"])
-
-        # Conexiones entre Piso 3 y Piso 4
-        self.habitaciones["Pasillo 3"].conectar(self.habitaciones["Pasillo 4"])
-
-        # Conexiones Piso 4
-        self.habitaciones["Pasillo 4"].conectar(self.habitaciones["Biblioteca 2"])
-        self.habitaciones["Pasillo 4"].conectar(self.habitaciones["Oficina 6"])
-        self.habitaciones["Pasillo 4"].conectar(self.habitaciones["Aula 7"])
-        self.habitaciones["Pasillo 4"].conectar(self.habitaciones["Aula 8"])
-
-    def aplicar_reduccion_grafo(self):
-        # Implementar reducción del grafo directamente en el código base
-        nodos_fusionables = []
-        nombres = list(self.habitaciones.keys())
-        for i in range(len(nombres)):
-            for j in range(i + 1, len(nombres)):
-                nodo1 = self.habitaciones[nombres[i]]
-                nodo2 = self.habitaciones[nombres[j]]
-                if nodo1.tipo == nodo2.tipo and abs(nodo1.ruido - nodo2.ruido) <= 5:
-                    distancia = nodo1.calcular_distancia(nodo2)
-                    if distancia <= 2.0 and nodo1.piso == nodo2.piso:
-                        nodos_fusionables.append((nodo1, nodo2))
-
-        for nodo1, nodo2 in nodos_fusionables:
-            for conexion in nodo2.conexiones.copy():
-                if conexion != nodo1:
-                    nodo1.conectar(conexion)
-            nodo1.ruido = (nodo1.ruido + nodo2.ruido) / 2
-            # Eliminar conexiones bidireccionales
-            for conexion in nodo2.conexiones:
-                conexion.conexiones.remove(nodo2)
-            del self.habitaciones[nodo2.name]
-            del self.posiciones_fijas[nodo2.name]
-
-    def recibir_datos(self):
-        self.datos_ruido = []
-        for name, habitacion in self.habitaciones.items():
-            nivel_ruido = habitacion.medir_ruido()
-            self.datos_ruido.append((name, nivel_ruido))
-
-    def analizar_datos(self):
-        if not self.datos_ruido:
-            self.promedio_ruido = 0
-            self.max_ruido = 0
+    def mostrar_progreso(self, clave, porcentaje, mensaje):
+        if porcentaje < 0:
+            self.barra_progreso.setRange(0, 0)  # Sin estimación: barra indeterminada
         else:
-            self.promedio_ruido = sum(nivel for _, nivel in self.datos_ruido) / len(self.datos_ruido)
-            self.max_ruido = max(nivel for _, nivel in self.datos_ruido)
-
-    def comparar_estandares(self):
-        self.reporte = []
-        for name, nivel in self.datos_ruido:
-            espacio = self.habitaciones[name]
-            limites = espacio.get_limite_ruido()
-            if nivel > limites['limite_excedido']:
-                recomendacion = (
-                    "Implementar soluciones acústicas: Instalación de paneles acústicos en paredes y techos, "
-                    "aislamiento de fuentes de ruido externas o internas, rediseño de la distribución de actividades, "
-                    "y mejora del aislamiento en puertas y ventanas."
-                )
-                estado = "Excede"
-            elif nivel > limites['limite_cercano']:
-                recomendacion = (
-                    "Revisar medidas de mitigación: Considerar instalación de paneles acústicos o rediseño de actividades "
-                    "para reducir niveles de ruido."
-                )
-                estado = "Cerca"
-            else:
-                recomendacion = "El nivel de ruido es adecuado."
-                estado = "Adecuado"
-            self.reporte.append((name, nivel, estado, recomendacion))
+            self.barra_progreso.setRange(0, 100)
+            self.barra_progreso.setValue(porcentaje)
+        self.mensaje_progreso = mensaje
+        self.statusBar().showMessage(mensaje)
 
-    def generar_reporte(self):
-        pass  # Ya se ha generado en comparar_estandares
+    def mostrar_ocupado(self, ocupado):
+        self.barra_progreso.setVisible(ocupado)
+        # Solo borra el mensaje de progreso, no el aviso que haya dejado el trabajo al terminar
+        if not ocupado and self.statusBar().currentMessage() == self.mensaje_progreso:
+            self.statusBar().clearMessage()
+
+    def mostrar_error(self, traza):
+        print(traza, file=sys.stderr)
+        QMessageBox.critical(self, "Error", traza.strip().splitlines()[-1])
+
+    # Cada acción envía su cálculo al ejecutor (las funciones calcular_* corren en segundo
+    # plano y no tocan widgets) y otra función lo muestra al terminar, en el hilo de la interfaz
 
     def mostrar_reporte(self):
-        self.recibir_datos()
-        self.analizar_datos()
-        self.comparar_estandares()
+        self.ejecutor.enviar("reporte", self.calcular_reporte, self.abrir_reporte, self.mostrar_error)
+
+    def calcular_reporte(self, trabajo):
+        trabajo.progreso(-1, "Calculando el reporte")
+        self.simulacion.evaluar()
+        return self.simulacion.tabla_reporte()
+
+    def abrir_reporte(self, tabla):
         self.generar_reporte()
         self.reporte_generado = True
-        self.reporte_window = ReporteWindow(self.reporte)
+        anterior = getattr(self, 'reporte_window', None)
+        self.reporte_window = ReporteWindow(tabla, self.exportar_reporte)
+        if anterior is not None and anterior.isVisible():
+            self.reporte_window.copiar_vista(anterior)
         self.reporte_window.show()
+        if anterior is not None:
+            anterior.close()
+
+    def exportar_reporte(self, ruta, formato, filas):
+        def calcular(trabajo):
+            def progreso(hechas, total):
+                trabajo.progreso(100 * hechas // max(total, 1), f"Exportando el reporte a {ruta}")
+            escribir_reporte(self.simulacion, ruta, formato, filas, progreso)
+            return ruta
+
+        # Cada ruta tiene su clave: exportar otra vez al mismo archivo reemplaza la exportación anterior
+        self.ejecutor.enviar(
+            f"exportar:{ruta}", calcular,
+            lambda listo: self.statusBar().showMessage(f"Reporte exportado a {listo}", 5000), self.mostrar_error
+        )
 
     def mostrar_grafo(self):
-        self.grafo_window = Grafo3DWindow(self.habitaciones, self.posiciones_fijas)
+        self.ejecutor.enviar("grafo", self.calcular_grafo, self.abrir_grafo, self.mostrar_error)
+
+    def calcular_grafo(self, trabajo, recalcular=True):
+        trabajo.progreso(10, "Calculando el grafo 3D")
+        datos = datos_grafo(
+            self.simulacion, max_aristas=Grafo3DWindow.MAX_ARISTAS, max_etiquetas=Grafo3DWindow.MAX_ETIQUETAS,
+            recalcular=recalcular
+        )
+        trabajo.progreso(50, "Dibujando el grafo 3D")
+        return Grafo3DWindow.construir_figura(self.simulacion, datos)
+
+    def abrir_grafo(self, figura):
+        anterior = getattr(self, 'grafo_window', None)
+        self.grafo_window = Grafo3DWindow(self.simulacion, figura=figura)
         self.grafo_window.show()
+        if anterior is not None:
+            anterior.close()
 
     def arreglar_nodo(self):
-        self.arreglar_window = ArreglarNodoWindow(self.habitaciones, self.actualizar_datos)
+        self.ejecutor.enviar("arreglar_nodo", self.calcular_excedidas, self.abrir_arreglar_nodo, self.mostrar_error)
+
+    def calcular_excedidas(self, trabajo):
+        return habitaciones_excedidas(self.simulacion, trabajo)
+
+    def abrir_arreglar_nodo(self, excedidas):
+        self.arreglar_window = ArreglarNodoWindow(
+            self.habitaciones, excedidas, self.arreglar_habitacion, self.optimizar_arreglos
+        )
         self.arreglar_window.show()
 
-    def actualizar_datos(self):
-        self.recibir_datos()
-        self.analizar_datos()
-        self.comparar_estandares()
+    def mostrar_perfil(self):
+        self.perfil_window = PerfilWindow()
+        self.perfil_window.show()
+
+    def optimizar_arreglos(self, al_terminar=None):
+        # Plan de menor costo para todas las habitaciones que exceden, aplicado de una vez
+        def listo(resultado):
+            if al_terminar is not None:
+                al_terminar(resultado)
+            self.actualizar_datos()
+
+        self.ejecutor.enviar("optimizacion", self.calcular_optimizacion, listo, self.mostrar_error)
+
+    def calcular_optimizacion(self, trabajo):
+        trabajo.progreso(-1, "Buscando el plan de arreglos")
+        with perfil.etapa("busqueda"):
+            resultado = optimizar(self.simulacion, "ramificacion", presupuesto=PRESUPUESTO_OPTIMIZACION)
+        perfil.fijar("evaluaciones_optimizacion", resultado["estadisticas"]["evaluaciones"])
+        trabajo.verificar()
+        aplicar_plan(self.simulacion, resultado["intervenciones"])
+        return resultado
+
+    def arreglar_habitacion(self, name, ruido):
+        # El cambio se aplica en el hilo del ejecutor, antes de recalcular, para no escribir en
+        # la simulación mientras otro cálculo la está leyendo
+        self.cambios[name] = ruido
+        self.actualizar_datos([name])
+
+    def actualizar_datos(self, modificados=None):
+        # Un cambio hecho mientras se recalcula deja obsoleto ese recálculo: se cancela y el
+        # nuevo incluye también las habitaciones que el anterior no llegó a aplicar
+        if modificados is None or self.pendientes is None:
+            self.pendientes = None
+        else:
+            self.pendientes.update(modificados)
+        pendientes = None if self.pendientes is None else list(self.pendientes)
+        cambios = dict(self.cambios)
+        abiertas = self.ventanas_abiertas()
+        self.ejecutor.enviar(
+            "actualizacion", lambda trabajo: self.calcular_actualizacion(trabajo, pendientes, cambios, abiertas),
+            self.mostrar_actualizacion, self.fallo_actualizacion
+        )
+
+    def ventanas_abiertas(self):
+        return {
+            nombre for nombre in ("grafo", "reporte")
+            if hasattr(self, f"{nombre}_window") and getattr(self, f"{nombre}_window").isVisible()
+        }
+
+    def calcular_actualizacion(self, trabajo, modificados, cambios, abiertas):
+        # Los cambios pendientes se aplican aquí (si el recálculo se cancela, el siguiente los
+        # vuelve a aplicar). Con una lista de habitaciones modificadas solo se recalculan ellas
+        # y sus vecinos.
+        for name, ruido in cambios.items():
+            self.habitaciones[name].ruido = ruido
+        trabajo.progreso(-1, "Recalculando niveles")
+        if modificados is not None and self.simulacion.puede_actualizar():
+            return {"incremental": self.simulacion.actualizar_incremental(modificados)}
+        self.simulacion.evaluar()
+        # Las ventanas abiertas se rehacen con esta misma evaluación, sin volver a propagar
+        trabajo.verificar()
+        return {
+            "reporte": self.simulacion.tabla_reporte() if "reporte" in abiertas else None,
+            "grafo": self.calcular_grafo(trabajo, recalcular=False) if "grafo" in abiertas else None,
+        }
+
+    def mostrar_actualizacion(self, resultado):
+        self.pendientes = set()
+        self.cambios = {}
         self.generar_reporte()
         self.reporte_generado = False
-
-        # Actualizar el grafo si está abierto
-        try:
-            if hasattr(self, 'grafo_window') and self.grafo_window.isVisible():
-                self.grafo_window.close()
-                self.mostrar_grafo()
-        except AttributeError:
-            pass
-
-        # Actualizar el reporte si está abierto
-        try:
-            if hasattr(self, 'reporte_window') and self.reporte_window.isVisible():
-                self.reporte_window.close()
-                self.mostrar_reporte()
-        except AttributeError:
-            pass
+        if "incremental" in resultado:
+            self.actualizar_incremental(*resultado["incremental"])
+            return
+
+        # Rehacer el grafo y el reporte si siguen abiertos, con lo calculado en segundo plano
+        abiertas = self.ventanas_abiertas()
+        if resultado["grafo"] is not None and "grafo" in abiertas:
+            self.abrir_grafo(resultado["grafo"])
+        if resultado["reporte"] is not None and "reporte" in abiertas:
+            self.abrir_reporte(resultado["reporte"])
+
+    def fallo_actualizacion(self, traza):
+        self.pendientes = None  # El próximo recálculo será completo
+        self.mostrar_error(traza)
+
+    def actualizar_incremental(self, filas_reporte, estados):
+        # Parchear en sitio las ventanas abiertas en lugar de reconstruirlas
+        if hasattr(self, 'grafo_window') and self.grafo_window.isVisible():
+            self.grafo_window.actualizar_colores(estados)
+        if hasattr(self, 'reporte_window') and self.reporte_window.isVisible():
+            self.reporte_window.actualizar_filas(filas_reporte)
+
+    def closeEvent(self, event):
+        # No dejar cálculos en curso al salir
+        self.ejecutor.cancelar_todos()
+        self.ejecutor.esperar()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
+    # python ProyectoFinal.py [edificio] [--perfil]
+    argumentos = [argumento for argumento in sys.argv[1:] if argumento != "--perfil"]
+    if len(argumentos) < len(sys.argv) - 1:
+        perfil.activar()
     app = QApplication(sys.argv)
-    window = MainWindow()
+    window = MainWindow(argumentos[0] if argumentos else None)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
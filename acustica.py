@@ -0,0 +1,50 @@
+import functools
+
+import numpy as np
+
+# Conversión entre decibelios y potencia relativa (10^(dB/10)) para sumar niveles en
+# el dominio de la energía. Funciones vectorizadas exactas y tablas cuantizadas.
+
+PISO_DB = 0.0  # Nivel asignado a potencia nula (sin fuentes ni vecinas)
+DB_POR_OCTAVA = 10.0 * np.log10(2.0)  # dB que aporta cada potencia de 2
+
+def a_potencia(db):
+    return np.power(10.0, np.asarray(db, dtype=float) / 10.0)
+
+def a_db(potencia):
+    potencia = np.asarray(potencia, dtype=float)
+    with np.errstate(divide="ignore"):
+        return np.maximum(10.0 * np.log10(potencia), PISO_DB)
+
+def sumar_db(niveles, axis=None):
+    # Suma energética: 60 dB + 60 dB = 63.01 dB
+    return a_db(a_potencia(niveles).sum(axis=axis))
+
+class TablaConversion:
+    # dB -> potencia: tabla con paso fijo entre minimo y maximo (error <= paso / 2 dB).
+    # potencia -> dB: np.frexp separa mantisa [0.5, 1) y exponente binario; la mantisa se
+    # busca en una tabla de 2^bits entradas y el exponente suma DB_POR_OCTAVA por unidad.
+    def __init__(self, paso=0.01, minimo=-20.0, maximo=200.0, bits_mantisa=16):
+        self.paso = paso
+        self.minimo = minimo
+        self.maximo = maximo
+        self.potencias = a_potencia(minimo + paso * np.arange(int(round((maximo - minimo) / paso)) + 1))
+        self.escala_mantisa = 2 ** (bits_mantisa + 1)
+        centros = 0.5 + (np.arange(2 ** bits_mantisa) + 0.5) / self.escala_mantisa
+        self.mantisas = 10.0 * np.log10(centros)
+
+    def a_potencia(self, db):
+        db = np.clip(np.asarray(db, dtype=float), self.minimo, self.maximo)
+        return self.potencias[np.rint((db - self.minimo) / self.paso).astype(np.intp)]
+
+    def a_db(self, potencia):
+        potencia = np.asarray(potencia, dtype=float)
+        mantisa, exponente = np.frexp(potencia)
+        i = ((mantisa - 0.5) * self.escala_mantisa).astype(np.intp)
+        np.clip(i, 0, len(self.mantisas) - 1, out=i)
+        db = self.mantisas[i] + exponente * DB_POR_OCTAVA
+        return np.where(potencia > 0, np.maximum(db, PISO_DB), PISO_DB)
+
+@functools.lru_cache(maxsize=None)
+def tabla_predeterminada():
+    return TablaConversion()
@@ -0,0 +1,371 @@
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+from modelo import Nodo, Edificio
+
+class TablaClaves:
+    # Conjunto de claves enteras no negativas en una tabla hash de direccionamiento
+    # abierto sobre un arreglo int64 (mucho menos memoria que un set de int de Python)
+    VACIO = -1
+    MULTIPLICADOR = 0x9E3779B97F4A7C15
+
+    def __init__(self, capacidad=16):
+        self.bits = max(4, (2 * capacidad - 1).bit_length())
+        self.tabla = np.full(1 << self.bits, self.VACIO, dtype=np.int64)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def _posicion(self, clave):
+        return ((clave * self.MULTIPLICADOR) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.bits)
+
+    def agregar(self, clave):
+        # Devuelve False si la clave ya estaba
+        if 2 * (self.n + 1) > len(self.tabla):
+            self.reconstruir(self.claves(), 2 * (self.n + 1))
+        tabla = self.tabla
+        mascara = len(tabla) - 1
+        posicion = self._posicion(clave)
+        while True:
+            actual = tabla[posicion]
+            if actual == self.VACIO:
+                tabla[posicion] = clave
+                self.n += 1
+                return True
+            if actual == clave:
+                return False
+            posicion = (posicion + 1) & mascara
+
+    def claves(self):
+        return self.tabla[self.tabla != self.VACIO]
+
+    def reconstruir(self, claves, capacidad=None):
+        # Inserción vectorizada con sondeo lineal (claves sin repetir)
+        claves = np.asarray(claves, dtype=np.int64)
+        self.bits = max(4, (2 * max(capacidad or 0, len(claves)) - 1).bit_length())
+        self.tabla = np.full(1 << self.bits, self.VACIO, dtype=np.int64)
+        self.n = len(claves)
+        mascara = len(self.tabla) - 1
+        posiciones = ((claves.astype(np.uint64) * np.uint64(self.MULTIPLICADOR)) >> np.uint64(64 - self.bits)).astype(np.int64)
+        while len(claves):
+            libres = self.tabla[posiciones] == self.VACIO
+            _, primeras = np.unique(posiciones[libres], return_index=True)
+            colocadas = np.flatnonzero(libres)[primeras]
+            self.tabla[posiciones[colocadas]] = claves[colocadas]
+            pendientes = np.ones(len(claves), dtype=bool)
+            pendientes[colocadas] = False
+            claves = claves[pendientes]
+            posiciones = (posiciones[pendientes] + 1) & mascara
+
+class AlmacenHabitaciones:
+    # Atributos de las habitaciones en arreglos tipados indexados por id entero,
+    # tabla nombre <-> id y aristas en arreglos con detección de duplicados O(1)
+    CAMPOS = {
+        "ruido": np.float64,
+        "frecuencia": np.float32,
+        "piso": np.int16,
+        "tipo": np.uint8,
+        "pared": np.bool_,
+        "ventana": np.bool_,
+        "puerta": np.bool_,
+        "es_fuente": np.bool_,
+    }
+
+    def __init__(self, capacidad=16):
+        self.n = 0
+        self.nombres = []
+        self.ids = {}
+        self.tipos = []  # código -> tipo
+        self.codigos_tipo = {}
+        for campo, dtype in self.CAMPOS.items():
+            setattr(self, campo, np.zeros(capacidad, dtype=dtype))
+        self.posiciones = np.zeros((capacidad, 3), dtype=np.float64)
+
+        self.m = 0
+        self.origen = np.zeros(capacidad, dtype=np.int32)
+        self.destino = np.zeros(capacidad, dtype=np.int32)
+        self.claves_aristas = TablaClaves()
+        self.sensores = {}  # id -> lista, solo para habitaciones con sensores
+        self._csr = None
+
+    def _crecer(self, campos, necesario):
+        for campo in campos:
+            arreglo = getattr(self, campo)
+            if len(arreglo) < necesario:
+                nuevo = np.zeros((max(necesario, 2 * len(arreglo)),) + arreglo.shape[1:], dtype=arreglo.dtype)
+                nuevo[:len(arreglo)] = arreglo
+                setattr(self, campo, nuevo)
+
+    def codigo_tipo(self, tipo):
+        codigo = self.codigos_tipo.get(tipo)
+        if codigo is None:
+            codigo = len(self.tipos)
+            self.tipos.append(tipo)
+            self.codigos_tipo[tipo] = codigo
+        return codigo
+
+    def agregar(self, name, tipo, pared, ventana, puerta, ruido, frecuencia, position, piso, es_fuente=False):
+        if name in self.ids:
+            raise ValueError(f"La habitación '{name}' ya existe")
+        i = self.n
+        if i >= len(self.ruido):
+            self._crecer(list(self.CAMPOS) + ["posiciones"], i + 1)
+        self.ruido[i] = ruido
+        self.frecuencia[i] = frecuencia
+        self.piso[i] = piso
+        self.tipo[i] = self.codigo_tipo(tipo)
+        self.pared[i] = pared
+        self.ventana[i] = ventana
+        self.puerta[i] = puerta
+        self.es_fuente[i] = es_fuente
+        self.posiciones[i] = position
+        self.nombres.append(name)
+        self.ids[name] = i
+        self.n += 1
+        self._csr = None
+        return i
+
+    def conectar(self, a, b):
+        # Devuelve False si la arista ya existía (o es un lazo)
+        if a == b:
+            return False
+        if not self.claves_aristas.agregar((min(a, b) << 32) | max(a, b)):
+            return False
+        if self.m >= len(self.origen):
+            self._crecer(["origen", "destino"], self.m + 1)
+        self.origen[self.m] = a
+        self.destino[self.m] = b
+        self.m += 1
+        self._csr = None
+        return True
+
+    def desconectar(self, a, b):
+        # Devuelve False si la arista no existía; la tabla de claves se reconstruye sin ella
+        origen = self.origen[:self.m].astype(np.int64)
+        destino = self.destino[:self.m].astype(np.int64)
+        claves = (np.minimum(origen, destino) << 32) | np.maximum(origen, destino)
+        conservar = claves != ((min(a, b) << 32) | max(a, b))
+        if conservar.all():
+            return False
+        self.origen = self.origen[:self.m][conservar].copy()
+        self.destino = self.destino[:self.m][conservar].copy()
+        self.m = len(self.origen)
+        self.claves_aristas.reconstruir(claves[conservar])
+        self._csr = None
+        return True
+
+    def csr(self):
+        # Vecinos de cada habitación en el orden en que se crearon sus aristas,
+        # igual que Nodo.conexiones
+        if self._csr is None:
+            origen = self.origen[:self.m].astype(np.int64)
+            destino = self.destino[:self.m].astype(np.int64)
+            fuentes = np.concatenate([origen, destino])
+            vecinos = np.concatenate([destino, origen])
+            secuencia = np.concatenate([np.arange(self.m), np.arange(self.m)])
+            orden = np.lexsort((secuencia, fuentes))
+            indptr = np.zeros(self.n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(fuentes, minlength=self.n), out=indptr[1:])
+            self._csr = (indptr, vecinos[orden])
+        return self._csr
+
+    def vecinos(self, i):
+        indptr, indices = self.csr()
+        return indices[indptr[i]:indptr[i + 1]]
+
+    def compactar(self, vivos, representante):
+        # Conserva las habitaciones marcadas en `vivos` y redirige cada arista a
+        # representante[id]; elimina lazos y aristas repetidas conservando el orden.
+        # Las aristas y sensores cuyo representante no sigue vivo se descartan.
+        nuevo_id = np.cumsum(vivos) - 1
+        origen = representante[self.origen[:self.m]]
+        destino = representante[self.destino[:self.m]]
+        validas = vivos[origen] & vivos[destino]
+        origen, destino = nuevo_id[origen[validas]], nuevo_id[destino[validas]]
+        validas = origen != destino
+        origen, destino = origen[validas], destino[validas]
+        claves = (np.minimum(origen, destino).astype(np.int64) << 32) | np.maximum(origen, destino)
+        _, primeras = np.unique(claves, return_index=True)
+        primeras.sort()
+
+        for campo in list(self.CAMPOS) + ["posiciones"]:
+            setattr(self, campo, getattr(self, campo)[:self.n][vivos].copy())
+        sensores = {}
+        for i, lista in self.sensores.items():
+            if vivos[representante[i]]:
+                sensores.setdefault(int(nuevo_id[representante[i]]), []).extend(lista)
+        self.sensores = sensores
+        self.nombres = [name for name, vivo in zip(self.nombres, vivos.tolist()) if vivo]
+        self.ids = {name: i for i, name in enumerate(self.nombres)}
+        self.n = len(self.nombres)
+
+        self.origen = origen[primeras].astype(np.int32)
+        self.destino = destino[primeras].astype(np.int32)
+        self.m = len(self.origen)
+        self.claves_aristas.reconstruir(claves[primeras])
+        self._csr = None
+
+    def ajustar(self):
+        # Recorta la capacidad sobrante tras una carga masiva
+        for campo in list(self.CAMPOS) + ["posiciones"]:
+            setattr(self, campo, getattr(self, campo)[:self.n].copy())
+        self.origen = self.origen[:self.m].copy()
+        self.destino = self.destino[:self.m].copy()
+
+    def memoria(self):
+        # Bytes ocupados por los arreglos (sin contar la tabla de nombres)
+        arreglos = [getattr(self, campo) for campo in self.CAMPOS]
+        arreglos += [self.posiciones, self.origen, self.destino, self.claves_aristas.tabla]
+        return sum(arreglo.nbytes for arreglo in arreglos)
+
+class NodoCompacto(Nodo):
+    # Vista compatible con Nodo sobre una fila del almacén (para la interfaz y el código existente)
+    def __init__(self, edificio, i):
+        self.edificio = edificio
+        self.id = i
+
+    def __eq__(self, otro):
+        return isinstance(otro, NodoCompacto) and otro.edificio is self.edificio and otro.id == self.id
+
+    def __hash__(self):
+        return hash((id(self.edificio), self.id))
+
+    def __repr__(self):
+        return f"NodoCompacto({self.name!r})"
+
+    def _campo(campo, tipo):
+        def leer(self):
+            return tipo(getattr(self.edificio.almacen, campo)[self.id])
+
+        def escribir(self, valor):
+            getattr(self.edificio.almacen, campo)[self.id] = valor
+        return property(leer, escribir)
+
+    ruido = _campo("ruido", float)
+    frecuencia = _campo("frecuencia", float)
+    piso = _campo("piso", int)
+    pared = _campo("pared", bool)
+    ventana = _campo("ventana", bool)
+    puerta = _campo("puerta", bool)
+    es_fuente = _campo("es_fuente", bool)
+    del _campo
+
+    @property
+    def name(self):
+        return self.edificio.almacen.nombres[self.id]
+
+    @property
+    def tipo(self):
+        almacen = self.edificio.almacen
+        return almacen.tipos[almacen.tipo[self.id]]
+
+    @property
+    def position(self):
+        return tuple(self.edificio.almacen.posiciones[self.id].tolist())
+
+    @position.setter
+    def position(self, position):
+        self.edificio.almacen.posiciones[self.id] = position
+        self.edificio.registrar_cambio()
+
+    @property
+    def sensores(self):
+        return self.edificio.almacen.sensores.setdefault(self.id, [])
+
+    @property
+    def conexiones(self):
+        return [NodoCompacto(self.edificio, j) for j in self.edificio.almacen.vecinos(self.id).tolist()]
+
+    def conectar(self, nodo):
+        if self.edificio.almacen.conectar(self.id, nodo.id):
+            self.edificio.registrar_cambio()
+
+    def conectar_bidireccional(self, nodo):
+        self.conectar(nodo)
+
+    def desconectar(self, nodo):
+        if self.edificio.almacen.desconectar(self.id, nodo.id):
+            self.edificio.registrar_cambio()
+
+class VistaHabitaciones(Mapping):
+    # Mapeo nombre -> NodoCompacto; las vistas se crean al consultarlas
+    def __init__(self, edificio):
+        self.edificio = edificio
+
+    def __getitem__(self, name):
+        return NodoCompacto(self.edificio, self.edificio.almacen.ids[name])
+
+    def __contains__(self, name):
+        return name in self.edificio.almacen.ids
+
+    def __iter__(self):
+        return iter(list(self.edificio.almacen.nombres))
+
+    def __len__(self):
+        return self.edificio.almacen.n
+
+class EdificioCompacto(Edificio):
+    # Mismo contrato que Edificio pero respaldado por un AlmacenHabitaciones
+    def __init__(self, almacen=None):
+        super().__init__()
+        self.almacen = almacen or AlmacenHabitaciones()
+        self.habitaciones = VistaHabitaciones(self)
+
+    @classmethod
+    def desde_edificio(cls, edificio):
+        compacto = cls()
+        for nodo in edificio.habitaciones.values():
+            vista = compacto.agregar(nodo)
+            vista.sensores.extend(nodo.sensores)
+        ids = compacto.almacen.ids
+        indptr = [0]
+        indices = []
+        for nodo in edificio.habitaciones.values():
+            for vecino in nodo.conexiones:
+                compacto.conectar(nodo.name, vecino.name)
+                indices.append(ids[vecino.name])
+            indptr.append(len(indices))
+        # Las aristas se numeran recorriendo habitación por habitación, que no es el orden en
+        # que se crearon; la adyacencia conserva el orden de cada Nodo.conexiones para que
+        # la propagación sume en el mismo orden que el edificio original. Se recalcula con
+        # el orden de las aristas al primer cambio, como en un edificio compilado.
+        compacto.almacen._csr = (np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64))
+        return compacto
+
+    def agregar(self, nodo):
+        return self.agregar_habitacion(
+            nodo.name, nodo.tipo, nodo.pared, nodo.ventana, nodo.puerta, nodo.ruido,
+            nodo.frecuencia, nodo.position, nodo.piso, nodo.es_fuente
+        )
+
+    def agregar_habitacion(self, name, tipo, pared, ventana, puerta, ruido, frecuencia, position, piso, es_fuente=False):
+        i = self.almacen.agregar(name, tipo, pared, ventana, puerta, ruido, frecuencia, position, piso, es_fuente)
+        self.registrar_cambio()
+        return NodoCompacto(self, i)
+
+    def conectar(self, name1, name2):
+        ids = self.almacen.ids
+        if self.almacen.conectar(ids[name1], ids[name2]):
+            self.registrar_cambio()
+
+    def eliminar(self, name):
+        almacen = self.almacen
+        vivos = np.ones(almacen.n, dtype=bool)
+        vivos[almacen.ids[name]] = False
+        almacen.compactar(vivos, np.arange(almacen.n))
+        self.registrar_cambio()
+
+    def fusionar(self, grupos):
+        almacen = self.almacen
+        representante = np.arange(almacen.n)
+        for miembros in grupos:
+            ids = [miembro.id for miembro in miembros]
+            representante[ids] = ids[0]
+            # Nivel agregado independiente del orden: media con suma exacta. Como antes,
+            # la habitación que sobrevive conserva su propio es_fuente
+            almacen.ruido[ids[0]] = math.fsum(almacen.ruido[ids].tolist()) / len(ids)
+        almacen.compactar(representante == np.arange(almacen.n), representante)
+        self.registrar_cambio()
@@ -0,0 +1,104 @@
+import numpy as np
+
+import perfil
+
+# Propagación por bandas de octava. Los espectros son arreglos (habitaciones x bandas)
+# y las pérdidas por elemento se aplican con broadcasting, sin bucles por banda.
+
+BANDAS = (125, 250, 500, 1000, 2000, 4000)  # Hz
+
+# Pérdida de transmisión (dB) por banda de cada elemento constructivo
+PERDIDAS_TRANSMISION = {
+    "pared": (28, 35, 42, 48, 52, 50),
+    "puerta": (18, 21, 24, 26, 27, 28),
+    "ventana": (22, 25, 28, 32, 35, 33),
+}
+FRACCIONES_AREA = {"pared": 0.8, "puerta": 0.1, "ventana": 0.1}  # Parte de la envolvente de cada elemento
+
+PENDIENTE_ESPECTRO = 3.0  # dB por octava de distancia a la frecuencia dominante
+ELEMENTOS = ("pared", "puerta", "ventana")
+
+def distribucion(frecuencia, bandas=BANDAS):
+    # Fracción de la potencia de cada habitación en cada banda, alrededor de su frecuencia
+    # dominante (campo frecuencia, en kHz). Las formas se calculan una vez por frecuencia
+    # distinta: devuelve (clase de cada habitación, fracciones clases x bandas que suman 1).
+    frecuencia = np.where(np.asarray(frecuencia, dtype=float) > 0, frecuencia, 1.0)
+    unicas, clases = np.unique(frecuencia, return_inverse=True)
+    octavas = np.abs(np.log2(np.asarray(bandas, dtype=float)[None, :] / (unicas[:, None] * 1000.0)))
+    fracciones = np.power(10.0, -PENDIENTE_ESPECTRO * octavas / 10.0)
+    return clases.reshape(-1), fracciones / fracciones.sum(axis=1, keepdims=True)
+
+def transmision(pared, ventana, puerta):
+    # Coeficiente de transmisión (potencia) de la envolvente de cada habitación por banda:
+    # promedio por área de los elementos presentes; sin elementos (pasillo abierto) es 1.
+    # Solo hay 8 combinaciones de elementos, así que se calcula una fila por combinación.
+    combinaciones = (np.arange(8)[:, None] >> np.arange(3)) & 1  # (8, elementos)
+    areas = combinaciones * np.array([FRACCIONES_AREA[e] for e in ELEMENTOS])
+    coeficientes = np.power(10.0, -np.array([PERDIDAS_TRANSMISION[e] for e in ELEMENTOS], dtype=float) / 10.0)
+    total = areas.sum(axis=1, keepdims=True)
+    tabla = np.where(total > 0, (areas @ coeficientes) / np.where(total > 0, total, 1.0), 1.0)
+    codigos = np.asarray(pared, dtype=np.intp) | (np.asarray(puerta, dtype=np.intp) << 1) | (np.asarray(ventana, dtype=np.intp) << 2)
+    return tabla[codigos]
+
+def pesos_aristas(motor):
+    return np.where(motor.aristas_validas, 1.0 / motor.atenuacion, 0.0)
+
+def transferir(motor, potencias, coeficientes, pesos=None):
+    # Un salto para todas las bandas a la vez: un único bincount sobre (fila, banda) aplanado
+    n, b = potencias.shape
+    pesos = pesos_aristas(motor) if pesos is None else pesos
+    aportes = np.take(potencias, motor.indices, axis=0) * pesos[:, None]
+    destinos = (motor.filas[:, None] * b + np.arange(b)).reshape(-1)
+    recibido = np.bincount(destinos, weights=aportes.reshape(-1), minlength=n * b).reshape(n, b)
+    return recibido * coeficientes
+
+def transferir_por_clases(motor, potencia, clases, fracciones, coeficientes, pesos):
+    # Primer salto: mientras los espectros son potencia x forma de su clase de frecuencia,
+    # basta un salto de una banda por clase (normalmente una sola) y un producto externo
+    n = len(motor.nombres)
+    if len(fracciones) == 1:
+        recibido = np.bincount(motor.filas, weights=potencia[motor.indices] * pesos, minlength=n)[:, None] * fracciones[0]
+    else:
+        recibido = np.zeros((n, fracciones.shape[1]))
+        for clase, forma in enumerate(fracciones):
+            valores = np.where(clases == clase, potencia, 0.0)
+            recibido += np.bincount(motor.filas, weights=valores[motor.indices] * pesos, minlength=n)[:, None] * forma
+    recibido *= coeficientes
+    return recibido
+
+def preparar(motor):
+    # Clases de frecuencia, coeficientes de transmisión y pesos por arista solo dependen de
+    # lo que el motor empaqueta una vez, así que se guardan en él
+    if getattr(motor, "bandas_preparadas", None) is None:
+        perfil.contar("bandas_preparadas_fallos")
+        clases, fracciones = distribucion(motor.frecuencia)
+        motor.bandas_preparadas = (
+            clases, fracciones, transmision(motor.pared, motor.ventana, motor.puerta), pesos_aristas(motor)
+        )
+    else:
+        perfil.contar("bandas_preparadas_aciertos")
+    return motor.bandas_preparadas
+
+def propagar(motor, conversion, modo="directo", inicial=None, **opciones):
+    # Como MotorPropagacion.calcular con suma energética, pero por banda. Devuelve
+    # (espectros en dB, nivel global en dB, potencias transmitidas, info de convergencia o None).
+    clases, fracciones, coeficientes, pesos = preparar(motor)
+    potencia = conversion.a_potencia(motor.ruido)
+    if len(fracciones) == 1:
+        potencias = potencia[:, None] * fracciones[0]
+    else:
+        potencias = potencia[:, None] * fracciones[clases]
+    if len(fracciones) <= len(BANDAS):
+        directo = transferir_por_clases(motor, potencia, clases, fracciones, coeficientes, pesos)
+    else:
+        directo = transferir(motor, potencias, coeficientes, pesos)
+    if modo == "multisalto":
+        total, x, info = motor.propagar_multisalto(
+            inicial=inicial, valores=potencias, relativa=True, directo=directo,
+            transferir=lambda valores: transferir(motor, valores, coeficientes, pesos), **opciones
+        )
+    else:
+        x, info = None, None
+        total = directo
+        total[motor.es_fuente] += potencias[motor.es_fuente]
+    return conversion.a_db(total), conversion.a_db(total.sum(axis=1)), x, info
@@ -0,0 +1,383 @@
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from generador import generar_edificio, dimensiones, TOPOLOGIAS
+from indice_espacial import pares_fusionables, pares_entre_pisos
+from ingesta import AgregadorRodante, leer_lecturas
+from simulacion import Simulacion
+from grafo import datos_grafo
+from optimizacion import EvaluadorIntervenciones, OptimizadorArreglos, optimizar
+from horarios import Horario, SimulacionHoraria
+
+def pares_fusionables_cuadratico(habitaciones):
+    # Recorrido original de aplicar_reduccion_grafo, como referencia
+    pares = []
+    nombres = list(habitaciones.keys())
+    for i in range(len(nombres)):
+        for j in range(i + 1, len(nombres)):
+            nodo1 = habitaciones[nombres[i]]
+            nodo2 = habitaciones[nombres[j]]
+            if nodo1.tipo == nodo2.tipo and abs(nodo1.ruido - nodo2.ruido) <= 5:
+                distancia = nodo1.calcular_distancia(nodo2)
+                if distancia <= 2.0 and nodo1.piso == nodo2.piso:
+                    pares.append((nodo1, nodo2))
+    return pares
+
+def pares_entre_pisos_cuadratico(pisos, radio):
+    # Recorrido original de Grafo3DWindow entre pisos adyacentes, como referencia
+    pares = []
+    for piso, nodos in pisos.items():
+        for nodo in nodos:
+            for otro in pisos.get(piso + 1, []):
+                if nodo.calcular_distancia(otro) <= radio:
+                    pares.append((nodo, otro))
+    return pares
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+def benchmark_indice_espacial(tamanos=(100, 400, 1600, 6400), pisos=4):
+    print(f"{'habitaciones':>12} {'fusion O(n²)':>14} {'fusion índice':>14} {'pisos O(n²)':>13} {'pisos índice':>13}")
+    for total in tamanos:
+        edificio = generar_edificio(pisos, total // pisos, topologia="rejilla")
+        habitaciones = edificio.habitaciones
+        por_piso = {}
+        for nodo in habitaciones.values():
+            por_piso.setdefault(nodo.piso, []).append(nodo)
+
+        t_cuad, ref = cronometrar(pares_fusionables_cuadratico, habitaciones)
+        t_ind, res = cronometrar(lambda: pares_fusionables(habitaciones, edificio.indice_espacial(2.0)))
+        assert ref == res
+        t_cuad_p, ref_p = cronometrar(pares_entre_pisos_cuadratico, por_piso, 7)
+        t_ind_p, res_p = cronometrar(lambda: pares_entre_pisos(por_piso, edificio.indice_espacial(7), 7))
+        assert sorted((a.name, b.name) for a, b in ref_p) == sorted((a.name, b.name) for a, b in res_p)
+        print(f"{total:>12} {t_cuad:>13.3f}s {t_ind:>13.3f}s {t_cuad_p:>12.3f}s {t_ind_p:>12.3f}s")
+
+def medir_memoria(construir):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    edificio = construir()
+    duracion = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return edificio, memoria, duracion
+
+def benchmark_memoria(total=100_000, pisos=10):
+    # Memoria por habitación: grafo de objetos Nodo (con su sensor) frente al almacén compacto
+    def con_objetos():
+        return generar_edificio(pisos, total // pisos, topologia="rejilla", sensores=True)
+
+    def compacto():
+        return generar_edificio(pisos, total // pisos, topologia="rejilla", compacto=True)
+
+    print(f"{'modelo':>10} {'habitaciones':>12} {'bytes/habitación':>17} {'construcción':>13}")
+    for nombre, construir in (("Nodo", con_objetos), ("compacto", compacto)):
+        edificio, memoria, duracion = medir_memoria(construir)
+        n = len(edificio.habitaciones)
+        print(f"{nombre:>10} {n:>12} {memoria / n:>17.0f} {duracion:>12.2f}s")
+        del edificio
+
+def benchmark_ingesta(habitaciones=1000, segundos=300, ventana=60):
+    # Lecturas sostenidas: una por segundo por habitación, desde texto en memoria
+    rnd = random.Random(0)
+    nombres = [f"H{i}" for i in range(habitaciones)]
+    texto = "".join(
+        f"{t},{name},{rnd.uniform(30, 80):.1f}\n" for t in range(segundos) for name in nombres
+    )
+    agregador = AgregadorRodante(nombres, ventanas=(ventana,))
+    duracion, _ = cronometrar(agregador.consumir, leer_lecturas(io.StringIO(texto)))
+    t_estadisticas, _ = cronometrar(agregador.estadisticas, ventana)
+    print(
+        f"{agregador.recibidas} lecturas en {duracion:.2f}s ({agregador.recibidas / duracion:,.0f} lecturas/s); "
+        f"agregados de {habitaciones} habitaciones en {t_estadisticas * 1000:.1f} ms"
+    )
+
+def benchmark_acustica(total=100_000, conversiones=2_000_000):
+    # Suma energética (exacta y con tablas) frente a la suma lineal de medir_ruido
+    import acustica
+    tabla = acustica.tabla_predeterminada()
+    db = np.random.default_rng(0).uniform(0, 150, conversiones)
+    potencia = acustica.a_potencia(db)
+    print(f"{'conversión':>14} {'exacta':>10} {'tabla':>10} {'error máx. (dB)':>16}")
+    t_exacta, _ = cronometrar(acustica.a_potencia, db)
+    t_tabla, aproximada = cronometrar(tabla.a_potencia, db)
+    print(f"{'dB->potencia':>14} {t_exacta:>9.4f}s {t_tabla:>9.4f}s {np.max(np.abs(acustica.a_db(aproximada) - db)):>16.2e}")
+    t_exacta, exacta = cronometrar(acustica.a_db, potencia)
+    t_tabla, aproximada = cronometrar(tabla.a_db, potencia)
+    print(f"{'potencia->dB':>14} {t_exacta:>9.4f}s {t_tabla:>9.4f}s {np.max(np.abs(aproximada - exacta)):>16.2e}")
+
+    motor = _simulacion_evaluada(total, "pasillo").motor
+    # Error respecto a la suma energética exacta
+    referencia = motor.calcular("directo", suma="energia")[0]
+    print(f"{'suma':>14} {'directo':>10} {'multisalto':>11} {'error máx. (dB)':>16}")
+    for nombre, opciones in (("lineal", {}), ("energía", {"suma": "energia"}),
+                             ("energía+tabla", {"suma": "energia", "tabla": True})):
+        t_directo, (niveles, _, _) = cronometrar(lambda: motor.calcular("directo", **opciones))
+        t_multisalto, _ = cronometrar(lambda: motor.calcular("multisalto", **opciones))
+        error = np.max(np.abs(niveles - referencia))
+        print(f"{nombre:>14} {t_directo:>9.4f}s {t_multisalto:>10.4f}s {error:>16.2e}")
+
+def benchmark_bandas(total=100_000, repeticiones=5):
+    # Propagación por bandas de octava frente a una sola banda con suma energética
+    # (mejor de varias repeticiones; la preparación por motor se mide aparte)
+    motor = _simulacion_evaluada(total, "pasillo").motor
+    t_preparacion, _ = cronometrar(motor.calcular, "directo", None, "bandas")
+    print(f"{'suma':>10} {'directo':>10} {'multisalto':>11}")
+    tiempos = {}
+    for suma in ("energia", "bandas"):
+        t_directo = min(cronometrar(lambda: motor.calcular("directo", suma=suma))[0] for _ in range(repeticiones))
+        t_multisalto, _ = cronometrar(lambda: motor.calcular("multisalto", suma=suma))
+        tiempos[suma] = t_directo
+        print(f"{suma:>10} {t_directo:>9.4f}s {t_multisalto:>10.4f}s")
+    print(
+        f"{len(motor.espectros[0])} bandas cuestan {tiempos['bandas'] / tiempos['energia']:.1f}x una banda "
+        f"(preparación única: {t_preparacion:.4f}s)"
+    )
+
+def benchmark_optimizacion(tamanos=(1_000, 10_000), muestra=200):
+    # Evaluación de candidatas deshaciendo sobre el motor (solo filas afectadas) frente a
+    # recalcular toda la propagación por candidata, y tiempo del voraz completo
+    print(f"{'habitaciones':>12} {'candidatas':>10} {'completa':>10} {'incremental':>12} {'voraz':>9} {'costo':>8}")
+    for total in tamanos:
+        simulacion = _simulacion_evaluada(total, "pasillo")
+        datos = simulacion.motor.compactar()
+        evaluador = EvaluadorIntervenciones(datos)
+        optimizador = OptimizadorArreglos(evaluador)
+        candidatas = optimizador.candidatas([])[:muestra]
+
+        def completa():
+            for intervencion in candidatas:
+                evaluador.aplicar(intervencion)
+                evaluador.motor.calcular("directo")
+                evaluador.deshacer()
+
+        t_completa, _ = cronometrar(completa)
+        t_incremental, _ = cronometrar(lambda: [evaluador.probar(intervencion) for intervencion in candidatas])
+        t_voraz, resultado = cronometrar(optimizar, simulacion, "voraz")
+        print(
+            f"{total:>12} {len(candidatas):>10} {t_completa:>9.4f}s {t_incremental:>11.4f}s "
+            f"{t_voraz:>8.2f}s {resultado['costo']:>8g}"
+        )
+
+def horarios_aleatorios(nombres, fraccion=0.05, franjas=2, semilla=0):
+    # Franjas de 1 a 4 horas en días al azar para una fracción de las habitaciones
+    azar = random.Random(semilla)
+    datos = {}
+    for name in azar.sample(nombres, max(1, int(len(nombres) * fraccion))):
+        datos[name] = []
+        for _ in range(franjas):
+            desde = azar.randrange(6 * 60, 20 * 60)
+            hasta = desde + azar.randrange(60, 4 * 60)
+            datos[name].append({
+                "dias": azar.sample(range(7), azar.randint(1, 7)),
+                "desde": f"{desde // 60:02d}:{desde % 60:02d}", "hasta": f"{hasta // 60 % 24:02d}:{hasta % 60:02d}",
+                "ruido": azar.uniform(60, 85), "ocupacion": azar.choice((0.25, 0.5, 1.0)),
+            })
+    return datos
+
+def benchmark_horarios(tamanos=(1_000, 10_000), dias=7, muestra=200):
+    # Una semana a resolución de minuto recalculando solo lo afectado por cada cambio de fuentes,
+    # frente a una propagación completa por paso (estimada con `muestra` pasos)
+    print(f"{'habitaciones':>12} {'pasos':>7} {'cambios':>8} {'incremental':>12} {'completa':>10} {'pico MB':>8}")
+    for total in tamanos:
+        simulacion = _simulacion_evaluada(total, "rejilla")
+        horario = Horario(horarios_aleatorios(simulacion.motor.nombres), simulacion.motor)
+        destino = tempfile.mkdtemp()
+        estadisticas = SimulacionHoraria(simulacion, horario).ejecutar(destino, dias)
+        # Segunda corrida solo para medir memoria (tracemalloc enlentece el bucle)
+        tracemalloc.start()
+        SimulacionHoraria(simulacion, horario).ejecutar(destino, dias)
+        pico = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        shutil.rmtree(destino)
+        t_completa, _ = cronometrar(lambda: [simulacion.motor.calcular("directo") for _ in range(muestra)])
+        print(
+            f"{total:>12} {estadisticas['pasos']:>7} {estadisticas['recalculos']:>8} "
+            f"{estadisticas['segundos']:>11.2f}s {t_completa / muestra * estadisticas['pasos']:>9.2f}s {pico:>8.2f}"
+        )
+
+def dibujar_por_artista(datos):
+    # Dibujo original de Grafo3DWindow (un artista por nodo, etiqueta y arista), como referencia
+    import matplotlib.pyplot as plt
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
+    for name, p, color in zip(datos["nombres"], datos["posiciones"], datos["colores"]):
+        ax.scatter(p[0], p[1], p[2], color=color, s=100)
+        ax.text(p[0], p[1], p[2], name, fontsize=9)
+    for (p1, p2), ancho in zip(datos["segmentos"], datos["anchos"]):
+        ax.plot([p1[0], p2[0]], [p1[1], p2[1]], [p1[2], p2[2]], color='gray', linestyle='--', linewidth=ancho)
+    fig.canvas.draw()
+    plt.close(fig)
+
+def benchmark_ventana_grafo(tamanos=(100, 1_000, 10_000), max_referencia=1_000):
+    # Construcción y primer dibujo de Grafo3DWindow (requiere PyQt5; usar QT_QPA_PLATFORM=offscreen)
+    import matplotlib.pyplot as plt
+    from PyQt5.QtWidgets import QApplication
+    from ProyectoFinal import Grafo3DWindow
+    app = QApplication.instance() or QApplication([])
+    print(f"{'habitaciones':>12} {'aristas':>9} {'por artista':>12} {'colecciones':>12}")
+    for total in tamanos:
+        simulacion = _simulacion_evaluada(total, "pasillo")
+        t_lote, ventana = cronometrar(Grafo3DWindow, simulacion)
+        aristas = len(ventana.canvas.figure.axes[0].collections[-1].get_segments())
+        plt.close(ventana.canvas.figure)
+        ventana.deleteLater()
+        referencia = "-"
+        if total <= max_referencia:
+            datos = datos_grafo(simulacion, max_aristas=Grafo3DWindow.MAX_ARISTAS)
+            referencia = f"{cronometrar(dibujar_por_artista, datos)[0]:.3f}s"
+        print(f"{total:>12} {aristas:>9} {referencia:>12} {t_lote:>11.3f}s")
+    app.processEvents()
+
+# Suite por etapas del flujo completo, con resultados en JSON para seguir regresiones.
+# Cada etapa indica el tamaño máximo en que se ejecuta; por encima se registra como null.
+
+def _preparar(total, topologia, compacto=False):
+    return generar_edificio(*dimensiones(total), topologia=topologia, compacto=compacto)
+
+def _simulacion_evaluada(total, topologia):
+    simulacion = Simulacion(_preparar(total, topologia))
+    simulacion.aplicar_reduccion_grafo()
+    simulacion.recibir_datos()
+    return simulacion
+
+def _etapa_construccion(total, topologia):
+    return lambda: None, lambda _: _preparar(total, topologia)
+
+def _etapa_construccion_compacta(total, topologia):
+    return lambda: None, lambda _: _preparar(total, topologia, compacto=True)
+
+def _etapa_reduccion(total, topologia):
+    return lambda: Simulacion(_preparar(total, topologia)), lambda simulacion: simulacion.aplicar_reduccion_grafo()
+
+def _etapa_medir_ruido(total, topologia):
+    def barrido(simulacion):
+        return [nodo.medir_ruido() for nodo in simulacion.habitaciones.values()]
+    return lambda: _simulacion_evaluada(total, topologia), barrido
+
+def _etapa_propagacion(total, topologia):
+    return lambda: _simulacion_evaluada(total, topologia), lambda simulacion: simulacion.motor.medir_todos()
+
+def _etapa_multisalto(total, topologia):
+    return lambda: _simulacion_evaluada(total, topologia), lambda simulacion: simulacion.motor.propagar_multisalto()
+
+def _etapa_comparar_estandares(total, topologia):
+    return lambda: _simulacion_evaluada(total, topologia), lambda simulacion: simulacion.comparar_estandares()
+
+def _etapa_layout(total, topologia):
+    return lambda: _simulacion_evaluada(total, topologia), datos_grafo
+
+ETAPAS = {
+    "construccion": (_etapa_construccion, 100_000),
+    "construccion_compacta": (_etapa_construccion_compacta, 100_000),
+    "reduccion": (_etapa_reduccion, 100_000),
+    "medir_ruido": (_etapa_medir_ruido, 100_000),
+    "propagacion": (_etapa_propagacion, 100_000),
+    "multisalto": (_etapa_multisalto, 100_000),
+    "comparar_estandares": (_etapa_comparar_estandares, 100_000),
+    "layout": (_etapa_layout, 100_000),
+}
+
+def version_actual():
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        )
+        return salida.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def ejecutar_suite(tamanos=(100, 1_000, 10_000, 100_000), topologia="pasillo", etapas=None):
+    resultados = {}
+    for total in tamanos:
+        fila = resultados.setdefault(str(total), {})
+        for nombre in etapas or ETAPAS:
+            crear, maximo = ETAPAS[nombre]
+            if total > maximo:
+                fila[nombre] = None
+                continue
+            preparar, medir = crear(total, topologia)
+            repeticiones = 3 if total <= 1_000 else 1
+            tiempos = []
+            for _ in range(repeticiones):
+                estado = preparar()
+                tiempos.append(cronometrar(medir, estado)[0])
+            fila[nombre] = min(tiempos)
+            print(f"{total:>8} {nombre:<22} {fila[nombre]:>10.4f}s", file=sys.stderr)
+    return {
+        "version": version_actual(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "topologia": topologia,
+        "resultados": resultados,
+    }
+
+def comparar_suites(anterior, actual, tolerancia=0.2):
+    # Etapas que empeoran más que `tolerancia` (fracción) respecto a la ejecución anterior
+    regresiones = []
+    for total, fila in actual["resultados"].items():
+        for etapa, segundos in fila.items():
+            previo = anterior["resultados"].get(total, {}).get(etapa)
+            if segundos is not None and previo and segundos > previo * (1 + tolerancia):
+                regresiones.append((int(total), etapa, previo, segundos))
+    return regresiones
+
+def main_suite(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py suite")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--topologia", choices=TOPOLOGIAS, default="pasillo")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS))
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, stdout)")
+    parser.add_argument("--comparar", metavar="JSON", help="Resultados anteriores para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    suite = ejecutar_suite(args.tamanos, args.topologia, args.etapas)
+    texto = json.dumps(suite, indent=1)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar_suites(json.load(archivo), suite, args.tolerancia)
+        for total, etapa, previo, segundos in regresiones:
+            print(f"Regresión: {etapa} con {total} habitaciones {previo:.4f}s -> {segundos:.4f}s", file=sys.stderr)
+        return 1 if regresiones else 0
+    return 0
+
+BENCHMARKS = {
+    "indice": benchmark_indice_espacial,
+    "memoria": benchmark_memoria,
+    "ingesta": benchmark_ingesta,
+    "acustica": benchmark_acustica,
+    "bandas": benchmark_bandas,
+    "optimizacion": benchmark_optimizacion,
+    "horarios": benchmark_horarios,
+    "ventana": benchmark_ventana_grafo,
+}
+
+if __name__ == "__main__":
+    # python benchmarks.py suite [opciones] | python benchmarks.py [indice|memoria|ingesta|acustica|bandas|optimizacion|horarios|ventana ...]
+    if sys.argv[1:2] == ["suite"]:
+        sys.exit(main_suite(sys.argv[2:]))
+    nombres = sys.argv[1:] or [nombre for nombre in BENCHMARKS if nombre != "ventana"]
+    for nombre in nombres:
+        BENCHMARKS[nombre]()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from simulacion import Simulacion, cargar_edificio, crear_edificio_predeterminado, escribir_reporte, guardar_edificio
+from lotes import compactar_simulacion, ejecutar_lote, escribir_tabla
+from ingesta import AgregadorRodante, abrir_fuente, leer_lecturas, procesar_flujo
+from propagacion import MODOS, OPCIONES_MULTISALTO, SUMAS
+from optimizacion import ESTRATEGIAS, LIMITES, OPCIONES_OPTIMIZACION, aplicar_plan, describir, optimizar
+from horarios import Horario, SimulacionHoraria, leer_horarios, minuto_semana
+import perfil
+
+# Ejecución sin interfaz gráfica: no importa PyQt5 ni matplotlib
+
+EXTENSIONES = {"json": ".json", "csv": ".csv", "texto": ".txt"}
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Simulación de habitabilidad por ruido sin interfaz gráfica.")
+    parser.add_argument("edificios", nargs="*", help="Edificios en JSON, CSV o compilados .edif (por defecto, el edificio de ejemplo)")
+    parser.add_argument("--salida", default="reportes", help="Directorio donde se escriben los reportes")
+    parser.add_argument("--formato", choices=sorted(EXTENSIONES), default="json", help="Formato de los reportes")
+    parser.add_argument("--sin-reduccion", action="store_true", help="No fusionar habitaciones equivalentes")
+    parser.add_argument("--estricto", action="store_true", help="Terminar con código 1 si alguna habitación excede su límite")
+    parser.add_argument("--modo", choices=MODOS, default="directo", help="Propagación solo a vecinas o por todo el grafo")
+    parser.add_argument("--saltos", type=int, default=OPCIONES_MULTISALTO["saltos"], help="Máximo de saltos (iteraciones) en modo multisalto")
+    parser.add_argument("--tolerancia", type=float, default=OPCIONES_MULTISALTO["tolerancia"], help="Residuo (dB) para dar por convergido el modo multisalto")
+    parser.add_argument("--factor-salto", type=float, default=OPCIONES_MULTISALTO["factor_salto"], help="Amortiguación de cada salto adicional")
+    parser.add_argument("--suma", choices=SUMAS, default="lineal", help="Sumar dB linealmente o en energía (potencia)")
+    parser.add_argument("--tabla", action="store_true", help="Usar tablas cuantizadas para las conversiones dB/potencia")
+    parser.add_argument("--escenarios", metavar="RUTA", help="JSON con una lista de escenarios de fuentes a evaluar por edificio")
+    parser.add_argument("--procesos", type=int, help="Evaluar (edificio, escenario) en paralelo con N procesos")
+    parser.add_argument("--lecturas", metavar="FUENTE", help="Lecturas 'tiempo,habitacion,db' de un archivo, '-' (stdin) o tcp:HOST:PUERTO")
+    parser.add_argument("--ventana", type=float, default=60, help="Ventana en segundos del Leq aplicado a cada habitación")
+    parser.add_argument("--tasa", type=float, default=1.0, help="Lecturas por segundo esperadas por habitación (el anillo crece si llegan más, hasta --tasa-maxima)")
+    parser.add_argument("--tasa-maxima", type=float, help="Tope de lecturas por segundo por habitación que se conservan; las que lo superan reemplazan a las más viejas de la ventana (por defecto, 4 veces --tasa)")
+    parser.add_argument("--intervalo", type=float, help="Reevaluar cada N segundos de lecturas (por defecto, solo al final)")
+    parser.add_argument("--optimizar", choices=ESTRATEGIAS, help="Buscar y aplicar el plan de arreglos de menor costo (voraz o ramificación y poda)")
+    parser.add_argument("--presupuesto", type=float, default=OPCIONES_OPTIMIZACION["presupuesto"], help="Segundos máximos de búsqueda de --optimizar")
+    parser.add_argument("--limite", choices=LIMITES, default=OPCIONES_OPTIMIZACION["limite"], help="Límite que --optimizar debe cumplir en todas las habitaciones")
+    parser.add_argument("--horarios", metavar="RUTA", help="JSON con las franjas horarias de fuentes y ocupación por habitación")
+    parser.add_argument("--dias", type=float, default=1, help="Días a simular con --horarios")
+    parser.add_argument("--paso", type=int, default=1, help="Minutos entre pasos de --horarios")
+    parser.add_argument("--inicio", default="lunes 00:00", help="Día y hora de inicio de --horarios (por ejemplo 'martes 08:00')")
+    parser.add_argument("--perfil", action="store_true", help=f"Medir las etapas y escribir <salida>/perfil.json (también con {perfil.VARIABLE_ENTORNO}=1)")
+    parser.add_argument("--exportar-ejemplo", metavar="RUTA", help="Guardar el edificio de ejemplo (.json, .csv o .edif) y salir")
+    parser.add_argument("--compilar", metavar="RUTA", help="Guardar el primer edificio, ya reducido, en formato compilado .edif y salir")
+    return parser
+
+def opciones_propagacion(args):
+    return {
+        "saltos": args.saltos, "tolerancia": args.tolerancia, "factor_salto": args.factor_salto,
+        "suma": args.suma, "tabla": args.tabla,
+    }
+
+def simular(edificio, reducir=True, modo="directo", opciones=None):
+    simulacion = Simulacion(edificio, modo, opciones)
+    if reducir:
+        simulacion.aplicar_reduccion_grafo()
+    simulacion.evaluar()
+    return simulacion
+
+def nombrar(fuentes):
+    # (nombre, ruta) por edificio. El nombre (el archivo sin extensión) identifica al edificio en
+    # las salidas; si dos entradas coinciden (r2k.json y r2k.edif) se numeran r2k, r2k-2, ...
+    usados = set()
+    nombrados = []
+    for ruta in fuentes:
+        base = "ejemplo" if ruta is None else os.path.splitext(os.path.basename(ruta))[0]
+        nombre, numero = base, 1
+        while nombre in usados:
+            numero += 1
+            nombre = f"{base}-{numero}"
+        if nombre != base:
+            print(f"Aviso: {ruta} se nombra {nombre} porque {base} ya se usa", file=sys.stderr)
+        usados.add(nombre)
+        nombrados.append((nombre, ruta))
+    return nombrados
+
+def cargar(ruta):
+    if ruta is None:
+        return crear_edificio_predeterminado()
+    # Los edificios leídos de archivo usan el modelo compacto en arreglos (los .edif, mapeados)
+    return cargar_edificio(ruta, compacto=True)
+
+def main_lote(args, fuentes):
+    # Todos los edificios y escenarios en una sola tabla de resultados
+    escenarios = None
+    if args.escenarios:
+        with open(args.escenarios, encoding="utf-8") as archivo:
+            escenarios = json.load(archivo)
+    edificios = {}
+    for nombre, ruta in nombrar(fuentes):
+        edificio = cargar(ruta)
+        simulacion = Simulacion(edificio, args.modo, opciones_propagacion(args))
+        if not args.sin_reduccion:
+            simulacion.aplicar_reduccion_grafo()
+        edificios[nombre] = compactar_simulacion(simulacion)
+
+    with perfil.etapa("lote"):
+        tabla, estadisticas = ejecutar_lote(edificios, escenarios, args.procesos)
+    destino = os.path.join(args.salida, "resultados.csv")
+    with perfil.etapa("escritura"):
+        escribir_tabla(tabla, destino)
+    print(
+        f"{estadisticas['trabajos']} trabajos en {estadisticas['segundos']:.3f}s "
+        f"({estadisticas['trabajos_por_segundo']:.1f} trabajos/s), "
+        f"{estadisticas['excede']} habitaciones exceden -> {destino}"
+    )
+    return 1 if args.estricto and estadisticas["excede"] else 0
+
+def main_lecturas(args, fuentes):
+    # Un edificio alimentado por un flujo de lecturas de sensores
+    nombre, ruta = nombrar(fuentes)[0]
+    edificio = cargar(ruta)
+    simulacion = Simulacion(edificio, args.modo, opciones_propagacion(args))
+    if not args.sin_reduccion:
+        simulacion.aplicar_reduccion_grafo()
+    agregador = AgregadorRodante(
+        simulacion.habitaciones.keys(), ventanas=(args.ventana,), lecturas_por_segundo=args.tasa,
+        mapeo=simulacion.mapeo_reduccion, max_lecturas_por_segundo=args.tasa_maxima
+    )
+
+    def mostrar(agregador, simulacion):
+        resumen = simulacion.resumen()
+        print(
+            f"t={agregador.ultimo_tiempo:.0f}: {agregador.recibidas} lecturas, "
+            f"promedio {resumen['promedio_ruido']:.2f} dB, {resumen['excede']} exceden"
+        )
+
+    with abrir_fuente(args.lecturas) as archivo:
+        procesar_flujo(leer_lecturas(archivo), agregador, simulacion, args.ventana, args.intervalo, mostrar)
+    destino = os.path.join(args.salida, nombre + "_reporte" + EXTENSIONES[args.formato])
+    escribir_reporte(simulacion, destino, args.formato)
+    print(f"{agregador.descartadas} lecturas descartadas -> {destino}")
+    if agregador.expulsadas:
+        print(
+            f"Aviso: {agregador.expulsadas} lecturas salieron antes de tiempo de la ventana de "
+            f"{args.ventana:g}s (más de {agregador.max_lecturas_por_segundo:g} por segundo)", file=sys.stderr
+        )
+    return 1 if args.estricto and simulacion.resumen()["excede"] else 0
+
+def main_optimizar(args, fuentes):
+    # Plan de arreglos por edificio: se aplica, se reporta el resultado y se guarda el plan en JSON
+    pendientes = 0
+    for nombre, ruta in nombrar(fuentes):
+        edificio = cargar(ruta)
+        simulacion = simular(edificio, not args.sin_reduccion, args.modo, opciones_propagacion(args))
+        antes = simulacion.resumen()["excede"]
+        resultado = optimizar(
+            simulacion, args.optimizar, args.procesos or 1, presupuesto=args.presupuesto, limite=args.limite
+        )
+        aplicar_plan(simulacion, resultado["intervenciones"])
+        destino = os.path.join(args.salida, nombre + "_reporte" + EXTENSIONES[args.formato])
+        escribir_reporte(simulacion, destino, args.formato)
+        with open(os.path.join(args.salida, nombre + "_plan.json"), "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, ensure_ascii=False, indent=1)
+
+        estadisticas = resultado["estadisticas"]
+        print(
+            f"{nombre}: {antes} -> {resultado['excede']} exceden con {len(resultado['intervenciones'])} "
+            f"intervenciones, costo {resultado['costo']:g} ({estadisticas['evaluaciones']} evaluaciones, "
+            f"{estadisticas['segundos']:.2f}s{'' if estadisticas['completo'] else ', presupuesto agotado'}) -> {destino}"
+        )
+        for intervencion in resultado["intervenciones"]:
+            print(f"  {describir(intervencion)}")
+        pendientes += not resultado["factible"]
+    return 1 if args.estricto and pendientes else 0
+
+def main_horarios(args, fuentes):
+    # Simulación paso a paso; los resultados van a <salida>/<edificio>_horario/ mientras se calculan
+    datos = leer_horarios(args.horarios)
+    excedidos = 0
+    for nombre, ruta in nombrar(fuentes):
+        edificio = cargar(ruta)
+        simulacion = simular(edificio, not args.sin_reduccion, args.modo, opciones_propagacion(args))
+        horario = Horario(datos, simulacion.motor, simulacion.mapeo_reduccion)
+        destino = os.path.join(args.salida, nombre + "_horario")
+        estadisticas = SimulacionHoraria(simulacion, horario).ejecutar(
+            destino, args.dias, args.paso, minuto_semana(args.inicio)
+        )
+        print(
+            f"{nombre}: {estadisticas['pasos']} pasos, {estadisticas['recalculos']} con cambios, "
+            f"{estadisticas['filas_recalculadas']} filas recalculadas, {estadisticas['minutos_excede']:g} "
+            f"minutos-habitación excedidos ({estadisticas['segundos']:.2f}s) -> {destino}"
+        )
+        excedidos += estadisticas["minutos_excede"] > 0
+    return 1 if args.estricto and excedidos else 0
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    if args.exportar_ejemplo:
+        guardar_edificio(crear_edificio_predeterminado(), args.exportar_ejemplo)
+        return 0
+
+    fuentes = args.edificios or [None]
+    if args.compilar:
+        edificio = cargar(fuentes[0])
+        simulacion = Simulacion(edificio)
+        if not args.sin_reduccion:
+            simulacion.aplicar_reduccion_grafo()
+        guardar_edificio(edificio, args.compilar, None if args.sin_reduccion else simulacion.mapeo_reduccion)
+        print(f"{len(edificio.habitaciones)} habitaciones -> {args.compilar}")
+        return 0
+
+    os.makedirs(args.salida, exist_ok=True)
+    if args.perfil:
+        perfil.activar()
+    with perfil.sesion("cli"):
+        codigo = ejecutar(args, fuentes)
+    if perfil.activo():
+        destino = os.path.join(args.salida, "perfil.json")
+        perfil.ultimo().guardar(destino)
+        print(perfil.ultimo().texto())
+        print(f"-> {destino}")
+    return codigo
+
+def ejecutar(args, fuentes):
+    if args.horarios:
+        return main_horarios(args, fuentes)
+    if args.optimizar:
+        return main_optimizar(args, fuentes)
+    if args.lecturas:
+        return main_lecturas(args, fuentes)
+    if args.escenarios or args.procesos:
+        return main_lote(args, fuentes)
+
+    excedidos = 0
+    for nombre, ruta in nombrar(fuentes):
+        inicio = time.perf_counter()
+        edificio = cargar(ruta)
+        simulacion = simular(edificio, not args.sin_reduccion, args.modo, opciones_propagacion(args))
+        destino = os.path.join(args.salida, nombre + "_reporte" + EXTENSIONES[args.formato])
+        with perfil.etapa("escritura"):
+            escribir_reporte(simulacion, destino, args.formato)
+
+        resumen = simulacion.resumen()
+        excedidos += resumen["excede"]
+        print(
+            f"{nombre}: {resumen['habitaciones']} habitaciones, "
+            f"promedio {resumen['promedio_ruido']:.2f} dB, máximo {resumen['max_ruido']:.2f} dB, "
+            f"{resumen['excede']} exceden, {resumen['cerca']} cerca "
+            f"({time.perf_counter() - inicio:.3f}s) -> {destino}"
+        )
+        convergencia = resumen["convergencia"]
+        if convergencia is not None:
+            print(
+                f"  multisalto: {convergencia['iteraciones']} iteraciones, residuo {convergencia['residuo']:.2e} dB"
+                + ("" if convergencia["convergio"] else " (sin converger)")
+            )
+    return 1 if args.estricto and excedidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
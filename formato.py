@@ -0,0 +1,151 @@
+import json
+import struct
+
+import numpy as np
+
+from almacen import AlmacenHabitaciones, EdificioCompacto, TablaClaves
+from propagacion import MotorPropagacion
+
+# Formato binario compilado (.edif): cabecera JSON y arreglos alineados a 64 bytes con
+# el grafo ya reducido, el almacén de habitaciones y los arreglos del motor de propagación.
+# Se abre con np.memmap en modo copia-en-escritura: abrir no copia los arreglos y varios
+# procesos que abren el mismo archivo comparten sus páginas.
+#
+#   MAGIA (8 bytes) | versión (uint32) | largo de la cabecera (uint32) | cabecera JSON | arreglos
+
+MAGIA = b"EDIFRUID"
+VERSION = 1
+ALINEACION = 64
+EXTENSION = ".edif"
+
+# Arreglos del motor que no están ya en el almacén
+CAMPOS_MOTOR = ("limite_cercano", "limite_excedido", "indptr", "indices", "atenuacion", "aristas_validas")
+
+# Campos del motor que se toman directamente del almacén
+MOTOR_DESDE_ALMACEN = {
+    "posiciones": "posiciones", "pisos": "piso", "pared": "pared", "ventana": "ventana",
+    "puerta": "puerta", "frecuencia": "frecuencia", "ruido": "ruido", "es_fuente": "es_fuente",
+}
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
+
+def _texto(nombres):
+    # Nombres como un solo bloque UTF-8 separado por saltos de línea
+    return np.frombuffer("\n".join(nombres).encode("utf-8"), dtype=np.uint8)
+
+def compilar(edificio, ruta, mapeo=None):
+    # `edificio` puede ser un Edificio de objetos Nodo o un EdificioCompacto; `mapeo` es el
+    # resultado de la reducción ({original: fusionado}) y solo se guardan las entradas que cambian
+    if getattr(edificio, "almacen", None) is None:
+        edificio = EdificioCompacto.desde_edificio(edificio)
+    almacen = edificio.almacen
+    n, m = almacen.n, almacen.m
+    motor = MotorPropagacion.desde_edificio(edificio)
+    fusionadas = {original: destino for original, destino in (mapeo or {}).items() if original != destino}
+
+    arreglos = {campo: getattr(almacen, campo)[:n] for campo in AlmacenHabitaciones.CAMPOS}
+    arreglos["posiciones"] = almacen.posiciones[:n]
+    arreglos["origen"] = almacen.origen[:m]
+    arreglos["destino"] = almacen.destino[:m]
+    arreglos["claves_aristas"] = almacen.claves_aristas.tabla
+    for campo in CAMPOS_MOTOR:
+        arreglos[campo] = getattr(motor, campo)
+    arreglos["nombres"] = _texto(almacen.nombres)
+    arreglos["mapeo_originales"] = _texto(fusionadas)
+    arreglos["mapeo_destinos"] = np.array([almacen.ids[d] for d in fusionadas.values()], dtype=np.int64)
+
+    directorio = {}
+    posicion = 0
+    for campo, arreglo in arreglos.items():
+        arreglo = np.ascontiguousarray(arreglo)
+        arreglos[campo] = arreglo
+        directorio[campo] = {"dtype": arreglo.dtype.str, "forma": list(arreglo.shape), "desplazamiento": posicion}
+        posicion = _alinear(posicion + arreglo.nbytes)
+    cabecera = {
+        "habitaciones": n, "aristas": m, "tipos": almacen.tipos, "reducido": mapeo is not None,
+        "bits_claves": almacen.claves_aristas.bits, "claves": len(almacen.claves_aristas),
+        "arreglos": directorio,
+    }
+    cabecera = json.dumps(cabecera, ensure_ascii=False).encode("utf-8")
+    inicio = _alinear(len(MAGIA) + 8 + len(cabecera))
+    with open(ruta, "wb") as archivo:
+        archivo.write(MAGIA + struct.pack("<II", VERSION, len(cabecera)) + cabecera)
+        for campo, arreglo in arreglos.items():
+            archivo.seek(inicio + directorio[campo]["desplazamiento"])
+            archivo.write(arreglo.tobytes())
+        archivo.truncate(inicio + posicion)
+
+def _mapear(ruta):
+    # Devuelve (cabecera, {campo: arreglo sobre el mapa de memoria})
+    with open(ruta, "rb") as archivo:
+        inicio = archivo.read(len(MAGIA) + 8)
+        if inicio[:len(MAGIA)] != MAGIA:
+            raise ValueError(f"{ruta} no es un edificio compilado")
+        version, largo = struct.unpack("<II", inicio[len(MAGIA):])
+        if version != VERSION:
+            raise ValueError(f"Versión de formato no soportada: {version}")
+        cabecera = json.loads(archivo.read(largo).decode("utf-8"))
+    base = _alinear(len(MAGIA) + 8 + largo)
+    mapa = np.memmap(ruta, dtype=np.uint8, mode="c")
+    arreglos = {}
+    for campo, descripcion in cabecera["arreglos"].items():
+        dtype = np.dtype(descripcion["dtype"])
+        cantidad = int(np.prod(descripcion["forma"], dtype=np.int64))
+        desplazamiento = base + descripcion["desplazamiento"]
+        vista = mapa[desplazamiento:desplazamiento + cantidad * dtype.itemsize]
+        arreglos[campo] = vista.view(dtype).reshape(descripcion["forma"])
+    return cabecera, arreglos
+
+def _nombres(bloque):
+    return bytes(bloque).decode("utf-8").split("\n") if len(bloque) else []
+
+def abrir_compilado(ruta):
+    # EdificioCompacto sobre el archivo mapeado. `reduccion` guarda el mapeo de la reducción
+    # ya aplicada (como reducir_grafo: cada habitación original -> la que la representa) y
+    # `compilado` los arreglos del motor, válidos
+    # mientras no cambie la versión del edificio.
+    cabecera, arreglos = _mapear(ruta)
+    almacen = AlmacenHabitaciones.__new__(AlmacenHabitaciones)
+    almacen.n = cabecera["habitaciones"]
+    almacen.m = cabecera["aristas"]
+    almacen.nombres = _nombres(arreglos["nombres"])
+    almacen.ids = dict(zip(almacen.nombres, range(almacen.n)))
+    almacen.tipos = list(cabecera["tipos"])
+    almacen.codigos_tipo = {tipo: codigo for codigo, tipo in enumerate(almacen.tipos)}
+    for campo in list(AlmacenHabitaciones.CAMPOS) + ["posiciones", "origen", "destino"]:
+        setattr(almacen, campo, arreglos[campo])
+    claves = TablaClaves.__new__(TablaClaves)
+    claves.tabla = arreglos["claves_aristas"]
+    claves.bits = cabecera["bits_claves"]
+    claves.n = cabecera["claves"]
+    almacen.claves_aristas = claves
+    almacen.sensores = {}
+    almacen._csr = (arreglos["indptr"], arreglos["indices"])
+
+    edificio = EdificioCompacto(almacen)
+    edificio.reduccion = None
+    if cabecera["reducido"]:
+        # El archivo solo guarda las fusionadas; las que quedaron se representan a sí mismas
+        destinos = map(almacen.nombres.__getitem__, arreglos["mapeo_destinos"].tolist())
+        edificio.reduccion = dict(zip(almacen.nombres, almacen.nombres))
+        edificio.reduccion.update(zip(_nombres(arreglos["mapeo_originales"]), destinos))
+    edificio.compilado = datos_motor(almacen, arreglos)
+    edificio.version_compilado = edificio.version
+    edificio.ruta_compilada = ruta
+    return edificio
+
+def datos_motor(almacen, arreglos):
+    # Forma compacta del motor (como MotorPropagacion.compactar) sin copiar arreglos
+    datos = {campo: getattr(almacen, origen) for campo, origen in MOTOR_DESDE_ALMACEN.items()}
+    for campo in CAMPOS_MOTOR:
+        datos[campo] = arreglos[campo]
+    datos["nombres"] = almacen.nombres
+    return datos
+
+def cargar_datos_compilados(ruta):
+    # Forma compacta para los trabajos por lotes, con el mapeo de la reducción
+    edificio = abrir_compilado(ruta)
+    datos = dict(edificio.compilado)
+    datos["mapeo"] = edificio.reduccion or {}
+    return datos
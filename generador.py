@@ -0,0 +1,99 @@
+import math
+import random
+
+from modelo import Nodo, Sensor, Edificio
+from almacen import EdificioCompacto
+
+# Generador de edificios sintéticos para pruebas de rendimiento
+
+TOPOLOGIAS = ("pasillo", "anillo", "estrella", "rejilla")
+
+MEZCLA_PREDETERMINADA = {
+    "aula": 0.4, "oficina": 0.25, "laboratorio": 0.15, "reuniones": 0.1,
+    "biblioteca": 0.05, "cafetería": 0.03, "auditorio": 0.02,
+}
+
+RUIDO_TIPICO = {
+    "aula": (55, 65), "oficina": (45, 60), "laboratorio": (45, 55), "reuniones": (45, 55),
+    "biblioteca": (30, 40), "cafetería": (60, 70), "auditorio": (65, 75), "pasillo": (40, 45),
+}
+
+ALTURA_PISO = 3
+
+def dimensiones(total, max_pisos=50):
+    # Reparte `total` habitaciones en pisos de tamaño parecido
+    pisos = max(1, min(max_pisos, round(total ** (1 / 3))))
+    return pisos, max(1, total // pisos)
+
+def generar_edificio(pisos, habitaciones_por_piso, topologia="pasillo", mezcla=None,
+                     fraccion_fuentes=0.05, separacion=None, semilla=0, compacto=False, sensores=False):
+    # habitaciones_por_piso incluye los nodos de pasillo. Topologías:
+    #   pasillo: cadena de pasillos con dos habitaciones por tramo, escaleras en el primer tramo
+    #   anillo: como pasillo pero cerrando la cadena
+    #   estrella: un único pasillo por piso conectado a todas las habitaciones (como el ejemplo)
+    #   rejilla: sin pasillos, cada habitación unida a sus vecinas de rejilla
+    # La separación por defecto (2.5, o 2.0 en rejilla) decide si hay vecinas fusionables.
+    if topologia not in TOPOLOGIAS:
+        raise ValueError(f"Topología desconocida: {topologia}")
+    if separacion is None:
+        separacion = 2.0 if topologia == "rejilla" else 2.5
+    rnd = random.Random(semilla)
+    mezcla = mezcla or MEZCLA_PREDETERMINADA
+    tipos = list(mezcla)
+    pesos = list(mezcla.values())
+
+    edificio = EdificioCompacto() if compacto else Edificio()
+
+    def agregar(name, tipo, position, piso):
+        bajo, alto = RUIDO_TIPICO.get(tipo, (45, 60))
+        es_pasillo = tipo == "pasillo"
+        nodo = Nodo(
+            name, tipo, not es_pasillo, not es_pasillo, not es_pasillo, round(rnd.uniform(bajo, alto), 1), 1,
+            position, piso=piso, es_fuente=not es_pasillo and rnd.random() < fraccion_fuentes
+        )
+        if sensores:
+            nodo.agregar_sensor(Sensor(name, ruido_fijo=nodo.ruido))
+        return edificio.agregar(nodo)
+
+    anterior = None
+    for piso in range(1, pisos + 1):
+        z = (piso - 1) * ALTURA_PISO
+        if topologia == "rejilla":
+            lado = max(1, math.isqrt(habitaciones_por_piso))
+            nodos = []
+            for k in range(habitaciones_por_piso):
+                position = ((k % lado) * separacion, (k // lado) * separacion, z)
+                nodos.append(agregar(f"H{piso}-{k}", rnd.choices(tipos, pesos)[0], position, piso))
+            for k, nodo in enumerate(nodos):
+                if (k + 1) % lado and k + 1 < len(nodos):
+                    nodo.conectar(nodos[k + 1])
+                if k + lado < len(nodos):
+                    nodo.conectar(nodos[k + lado])
+            escalera = nodos[0]
+        elif topologia == "estrella":
+            pasillo = agregar(f"P{piso}", "pasillo", (0, 0, z), piso)
+            lado = max(1, math.isqrt(habitaciones_por_piso - 1))
+            for k in range(habitaciones_por_piso - 1):
+                position = ((k % lado + 1) * separacion, (k // lado) * separacion, z)
+                pasillo.conectar(agregar(f"H{piso}-{k}", rnd.choices(tipos, pesos)[0], position, piso))
+            escalera = pasillo
+        else:
+            tramos = max(1, math.ceil(habitaciones_por_piso / 3))
+            pasillos = [agregar(f"P{piso}-{c}", "pasillo", (c * separacion, 0, z), piso) for c in range(tramos)]
+            for c in range(1, tramos):
+                pasillos[c - 1].conectar(pasillos[c])
+            if topologia == "anillo" and tramos > 2:
+                pasillos[-1].conectar(pasillos[0])
+            for k in range(habitaciones_por_piso - tramos):
+                c = (k // 2) % tramos
+                lado = 2 if k % 2 == 0 else -2
+                position = (c * separacion, lado * (1 + k // (2 * tramos)), z)
+                pasillos[c].conectar(agregar(f"H{piso}-{k}", rnd.choices(tipos, pesos)[0], position, piso))
+            escalera = pasillos[0]
+        if anterior is not None:
+            anterior.conectar(escalera)
+        anterior = escalera
+
+    if compacto:
+        edificio.almacen.ajustar()
+    return edificio
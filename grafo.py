@@ -0,0 +1,71 @@
+import numpy as np
+
+import perfil
+from indice_espacial import pares_entre_pisos
+
+# Datos del grafo 3D (posiciones, colores y segmentos) calculados sin matplotlib,
+# para que el dibujo solo tenga que entregarlos a los artistas
+
+COLORES_CODIGO = ("green", "yellow", "red")  # Índice: código de modelo.ESTADOS
+
+def aristas_reales(motor):
+    # Conexiones acústicas sin duplicar (i < j) a partir de la CSR del motor
+    seleccion = motor.filas < motor.indices
+    return motor.filas[seleccion], motor.indices[seleccion]
+
+def aristas_entre_pisos(edificio, motor, radio=7):
+    # Habitaciones de pisos adyacentes a distancia <= radio, con el índice espacial
+    pisos = {}
+    for nodo in edificio.habitaciones.values():
+        pisos.setdefault(nodo.piso, []).append(nodo)
+    pares = pares_entre_pisos(pisos, edificio.indice_espacial(radio), radio)
+    origen = np.array([motor.indice[a.name] for a, _ in pares], dtype=np.int64)
+    destino = np.array([motor.indice[b.name] for _, b in pares], dtype=np.int64)
+    return origen, destino
+
+def limitar_aristas(origen, destino, anchos, maximo):
+    # Conserva las `maximo` aristas más cortas (las de mayor ancho), en su orden original
+    if maximo is None or len(origen) <= maximo:
+        return origen, destino, anchos
+    seleccion = np.sort(np.argsort(-anchos, kind="stable")[:maximo])
+    return origen[seleccion], destino[seleccion], anchos[seleccion]
+
+def etiquetas_visibles(estados, niveles, maximo):
+    # Nivel de detalle: todas las etiquetas si caben; si no, las habitaciones más
+    # problemáticas primero (por estado y luego por nivel)
+    if maximo is None or len(estados) <= maximo:
+        return np.arange(len(estados))
+    orden = np.lexsort((-niveles, -estados.astype(np.int64)))
+    return np.sort(orden[:maximo])
+
+def datos_grafo(simulacion, entre_pisos=True, radio_pisos=7, max_aristas=None, max_etiquetas=None, recalcular=True):
+    # recalcular=False usa los niveles de la última evaluación sin volver a propagar
+    with perfil.etapa("datos_grafo"):
+        return _datos_grafo(simulacion, entre_pisos, radio_pisos, max_aristas, max_etiquetas, recalcular)
+
+def _datos_grafo(simulacion, entre_pisos, radio_pisos, max_aristas, max_etiquetas, recalcular):
+    if recalcular:
+        simulacion.recibir_datos()
+    motor = simulacion.motor
+    estados = motor.estados(simulacion.niveles)
+    origen, destino = aristas_reales(motor)
+    if entre_pisos:
+        with perfil.etapa("aristas_entre_pisos"):
+            extra_origen, extra_destino = aristas_entre_pisos(simulacion.edificio, motor, radio_pisos)
+        origen = np.concatenate([origen, extra_origen])
+        destino = np.concatenate([destino, extra_destino])
+    distancias = np.linalg.norm(motor.posiciones[destino] - motor.posiciones[origen], axis=1)
+    with np.errstate(divide="ignore"):
+        anchos = np.where(distancias > 0, 0.5 / np.log(distancias + 1), 0.0)  # Atenuar según distancia
+    origen, destino, anchos = limitar_aristas(origen, destino, anchos, max_aristas)
+    perfil.fijar("aristas_dibujadas", len(origen))
+    segmentos = np.stack([motor.posiciones[origen], motor.posiciones[destino]], axis=1)
+    return {
+        "nombres": motor.nombres,
+        "posiciones": motor.posiciones,
+        "estados": estados,
+        "colores": [COLORES_CODIGO[codigo] for codigo in estados.tolist()],
+        "segmentos": segmentos,
+        "anchos": anchos,
+        "etiquetas": etiquetas_visibles(estados, simulacion.niveles, max_etiquetas),
+    }
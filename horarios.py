@@ -0,0 +1,253 @@
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+import acustica
+from modelo import ESTADOS
+
+# Simulación en el tiempo con horarios semanales de fuentes y ocupación. Los horarios se
+# compilan una vez a la lista de cambios de la semana; en cada paso solo se recalculan las
+# habitaciones cuya fuente cambió (y sus vecinas) y los resultados se escriben a disco a
+# medida que se producen, así la memoria no depende del horizonte.
+#
+# Formato JSON: {habitacion: [franja, ...]}, con franjas como
+#   {"dias": ["lunes", "martes"], "desde": "10:00", "hasta": "12:00", "ruido": 75, "ocupacion": 0.5}
+# "dias" es opcional (todos) y acepta nombres o números (0 = lunes); si "hasta" es menor que
+# "desde" la franja cruza la medianoche. Durante una franja la habitación es fuente con "ruido"
+# (por defecto su nivel base) más 10·log10("ocupacion"); una ocupación 0 la apaga. Fuera de sus
+# franjas, una habitación con horario no es fuente. Si varias franjas coinciden, vale la última.
+
+DIAS = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+MINUTOS_DIA = 24 * 60
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+
+def leer_horarios(ruta):
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+def _minutos(hora):
+    horas, minutos = hora.split(":")
+    return int(horas) * 60 + int(minutos)
+
+def _dia(dia):
+    if isinstance(dia, int):
+        return dia % 7
+    return DIAS.index(dia.lower().replace("é", "e").replace("á", "a"))
+
+def minuto_semana(texto):
+    # "lunes", "martes 08:30" o "08:30" (lunes) -> minutos desde el lunes 00:00
+    partes = texto.split()
+    dia = _dia(partes[0]) if not partes[0][0].isdigit() else 0
+    hora = _minutos(partes[-1]) if partes[-1][0].isdigit() else 0
+    return dia * MINUTOS_DIA + hora
+
+def formatear_minuto(minuto):
+    dia, hora = divmod(int(minuto) % MINUTOS_SEMANA, MINUTOS_DIA)
+    return f"{DIAS[dia]} {hora // 60:02d}:{hora % 60:02d}"
+
+class Horario:
+    # Franjas de todas las habitaciones en arreglos y la lista de cambios de una semana:
+    # [(minuto de la semana, posiciones, ruido, es_fuente)], con posiciones en self.filas
+    def __init__(self, datos, motor, mapeo=None):
+        mapeo = mapeo or {}
+        filas, franjas = [], []
+        for name, lista in datos.items():
+            fila = motor.indice[mapeo.get(name, name)]
+            filas.append(fila)
+            franjas.extend((fila, franja) for franja in lista)
+        self.filas = np.array(sorted(set(filas)), dtype=np.int64)
+        posicion = {fila: p for p, fila in enumerate(self.filas.tolist())}
+        self.ruido_base = motor.ruido[self.filas].astype(float)
+
+        self.posiciones = np.array([posicion[fila] for fila, _ in franjas], dtype=np.int64)
+        self.dias = np.array([
+            sum(1 << _dia(dia) for dia in franja.get("dias", range(7))) for _, franja in franjas
+        ], dtype=np.int64)
+        self.desde = np.array([_minutos(franja["desde"]) for _, franja in franjas], dtype=np.int64)
+        self.hasta = np.array([_minutos(franja["hasta"]) for _, franja in franjas], dtype=np.int64)
+        ocupacion = np.array([franja.get("ocupacion", 1.0) for _, franja in franjas], dtype=float)
+        ruido = np.array([franja.get("ruido", np.nan) for _, franja in franjas], dtype=float)
+        ruido = np.where(np.isnan(ruido), self.ruido_base[self.posiciones], ruido)
+        with np.errstate(divide="ignore"):
+            self.ruido = ruido + 10.0 * np.log10(ocupacion)
+        self.encendida = ocupacion > 0
+        self.eventos = self._eventos()
+
+    def estado(self, minuto):
+        # (ruido, es_fuente) de cada habitación con horario en un minuto de la semana
+        dia, hora = divmod(int(minuto) % MINUTOS_SEMANA, MINUTOS_DIA)
+        hoy = (self.dias >> dia) & 1 == 1
+        ayer = (self.dias >> ((dia - 1) % 7)) & 1 == 1
+        normal = self.desde <= self.hasta
+        activa = np.where(
+            normal,
+            hoy & (self.desde <= hora) & (hora < self.hasta),
+            (hoy & (hora >= self.desde)) | (ayer & (hora < self.hasta)),
+        )
+        ruido = self.ruido_base.copy()
+        fuente = np.zeros(len(self.filas), dtype=bool)
+        # La última franja activa de cada habitación es la que vale
+        activas = np.flatnonzero(activa)[::-1]
+        _, ultimas = np.unique(self.posiciones[activas], return_index=True)
+        elegidas = activas[ultimas]
+        ruido[self.posiciones[elegidas]] = np.where(self.encendida[elegidas], self.ruido[elegidas], self.ruido_base[self.posiciones[elegidas]])
+        fuente[self.posiciones[elegidas]] = self.encendida[elegidas]
+        return ruido, fuente
+
+    def _eventos(self):
+        # Estado en cada borde de franja de la semana y diferencias con el borde anterior
+        bordes = set()
+        for dias, desde, hasta in zip(self.dias.tolist(), self.desde.tolist(), self.hasta.tolist()):
+            for dia in range(7):
+                if dias >> dia & 1:
+                    inicio = dia * MINUTOS_DIA
+                    fin = inicio + hasta + (MINUTOS_DIA if hasta < desde else 0)
+                    bordes.update(((inicio + desde) % MINUTOS_SEMANA, fin % MINUTOS_SEMANA))
+        bordes = sorted(bordes)
+        if not bordes:
+            return []
+        estados = [self.estado(borde) for borde in bordes]
+        eventos = []
+        anterior = estados[-1]  # La semana es cíclica
+        for borde, (ruido, fuente) in zip(bordes, estados):
+            cambian = np.flatnonzero((ruido != anterior[0]) | (fuente != anterior[1]))
+            if len(cambian):
+                eventos.append((borde, cambian, ruido[cambian], fuente[cambian]))
+            anterior = (ruido, fuente)
+        return eventos
+
+    def eventos_desde(self, inicio):
+        # Cambios posteriores a `inicio` (minutos absolutos), semana tras semana
+        if not self.eventos:
+            return
+        semana = inicio // MINUTOS_SEMANA
+        while True:
+            for minuto, posiciones, ruido, fuente in self.eventos:
+                instante = semana * MINUTOS_SEMANA + minuto
+                if instante > inicio:
+                    yield instante, posiciones, ruido, fuente
+            semana += 1
+
+class SimulacionHoraria:
+    # Recorre el horizonte paso a paso sobre el motor de una Simulacion ya evaluada, sin tocar
+    # el edificio. Acumula por habitación minutos en cada estado, nivel máximo y energía (Leq).
+    def __init__(self, simulacion, horario):
+        self.simulacion = simulacion
+        self.horario = horario
+        self.suma = simulacion.opciones.get("suma", "lineal")
+        self.completo = simulacion.modo == "multisalto" or self.suma == "bandas"
+        simulacion.recibir_datos()
+        self.motor = simulacion.motor
+        n = len(self.motor.nombres)
+        self.codigos = self.motor.estados(simulacion.niveles)
+        self.potencia = acustica.a_potencia(simulacion.niveles)
+        self.energia = np.zeros(n)
+        self.minutos = np.zeros((len(ESTADOS), n))
+        self.maximo = np.full(n, -np.inf)
+        self.desde = np.zeros(n, dtype=np.int64)  # Minuto desde el que rige el nivel de cada fila
+        self.recalculos = 0
+        self.filas_recalculadas = 0
+
+    def aplicar(self, posiciones, ruido, fuente):
+        # Fija el estado de las habitaciones con horario indicadas y recalcula lo afectado.
+        # Devuelve las filas cuyo nivel cambió.
+        motor = self.motor
+        filas = self.horario.filas[posiciones]
+        cambian = (motor.ruido[filas] != ruido) | (motor.es_fuente[filas] != fuente)
+        if not cambian.any():
+            return np.zeros(0, dtype=np.int64)
+        filas = filas[cambian]
+        motor.ruido[filas] = ruido[cambian]
+        motor.es_fuente[filas] = fuente[cambian]
+        simulacion = self.simulacion
+        if self.completo:
+            # Todo el grafo (o todas las bandas) puede cambiar: se resuelve desde la solución anterior
+            anteriores = simulacion.niveles
+            simulacion.propagar()
+            tolerancia = simulacion.opciones.get("tolerancia", 1e-6)
+            filas = np.flatnonzero(np.abs(simulacion.niveles - anteriores) > tolerancia)
+            self.filas_recalculadas += len(simulacion.niveles)
+        else:
+            filas = motor.vecindad(filas)
+            simulacion.niveles[filas] = motor.calcular_filas(filas, self.suma, simulacion.opciones.get("tabla", False))
+            self.filas_recalculadas += len(filas)
+        self.recalculos += 1
+        return filas
+
+    def acumular(self, filas, ahora):
+        # Cierra el tramo de las filas indicadas: su nivel y estado rigieron desde self.desde
+        duracion = ahora - self.desde[filas]
+        self.energia[filas] += self.potencia[filas] * duracion
+        self.minutos[self.codigos[filas], filas] += duracion
+        self.desde[filas] = ahora
+
+    def ejecutar(self, destino, dias=1, paso=1, inicio=0):
+        # Escribe en `destino`: pasos.csv (resumen por paso), cambios.csv (habitaciones cuyo nivel
+        # cambió en cada paso; todas en el primero) y habitaciones.csv (exposición en el horizonte)
+        os.makedirs(destino, exist_ok=True)
+        motor, simulacion = self.motor, self.simulacion
+        total = int(round(dias * MINUTOS_DIA / paso))
+        inicio_reloj = time.perf_counter()
+        eventos = self.horario.eventos_desde(inicio)
+        proximo = next(eventos, None)
+
+        with open(os.path.join(destino, "pasos.csv"), "w", encoding="utf-8", newline="") as archivo_pasos, \
+                open(os.path.join(destino, "cambios.csv"), "w", encoding="utf-8", newline="") as archivo_cambios:
+            pasos = csv.writer(archivo_pasos)
+            cambios = csv.writer(archivo_cambios)
+            pasos.writerow(["minuto", "momento", "promedio", "maximo", "excede", "cerca", "adecuado", "recalculadas"])
+            cambios.writerow(["minuto", "habitacion", "nivel", "estado"])
+            resumen = None
+            for k in range(total):
+                ahora = inicio + k * paso
+                if k == 0:
+                    self.aplicar(np.arange(len(self.horario.filas)), *self.horario.estado(ahora))
+                    cambiadas = np.arange(len(motor.nombres))
+                    self.desde[:] = ahora
+                else:
+                    # Todos los cambios hasta este paso; de cada habitación vale el último
+                    pendientes = {}
+                    while proximo is not None and proximo[0] <= ahora:
+                        for posicion, ruido, fuente in zip(*(valores.tolist() for valores in proximo[1:])):
+                            pendientes[posicion] = (ruido, fuente)
+                        proximo = next(eventos, None)
+                    cambiadas = np.zeros(0, dtype=np.int64)
+                    if pendientes:
+                        posiciones = np.fromiter(pendientes, dtype=np.int64, count=len(pendientes))
+                        ruido, fuente = zip(*pendientes.values())
+                        cambiadas = self.aplicar(posiciones, np.array(ruido), np.array(fuente))
+                if len(cambiadas):
+                    self.acumular(cambiadas, ahora)
+                    niveles = simulacion.niveles
+                    self.codigos[cambiadas] = motor.estados(niveles[cambiadas], cambiadas)
+                    self.potencia[cambiadas] = acustica.a_potencia(niveles[cambiadas])
+                    self.maximo[cambiadas] = np.maximum(self.maximo[cambiadas], niveles[cambiadas])
+                    conteos = np.bincount(self.codigos, minlength=len(ESTADOS))
+                    resumen = [f"{niveles.mean():.2f}", f"{niveles.max():.2f}", conteos[2], conteos[1], conteos[0]]
+                    for i, nivel, codigo in zip(cambiadas.tolist(), niveles[cambiadas].tolist(), self.codigos[cambiadas].tolist()):
+                        cambios.writerow([ahora, motor.nombres[i], f"{nivel:.2f}", ESTADOS[codigo]])
+                pasos.writerow([ahora, formatear_minuto(ahora)] + resumen + [len(cambiadas)])
+            self.acumular(np.arange(len(motor.nombres)), inicio + total * paso)
+
+        minutos_totales = max(total * paso, 1)
+        leq = acustica.a_db(self.energia / minutos_totales)
+        with open(os.path.join(destino, "habitaciones.csv"), "w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["habitacion", "leq", "maximo", "minutos_excede", "minutos_cerca", "minutos_adecuado"])
+            for i, name in enumerate(motor.nombres):
+                escritor.writerow([
+                    name, f"{leq[i]:.2f}", f"{self.maximo[i]:.2f}",
+                    f"{self.minutos[2, i]:g}", f"{self.minutos[1, i]:g}", f"{self.minutos[0, i]:g}",
+                ])
+        # El motor vuelve a los niveles del edificio
+        simulacion.recibir_datos()
+        return {
+            "pasos": total,
+            "recalculos": self.recalculos,
+            "filas_recalculadas": self.filas_recalculadas,
+            "segundos": time.perf_counter() - inicio_reloj,
+            "minutos_excede": float(self.minutos[2].sum()),
+        }
@@ -0,0 +1,53 @@
+import math
+
+class IndiceEspacial:
+    # Rejilla uniforme sobre (x, y) separada por piso para consultas por radio
+    def __init__(self, habitaciones, tamano_celda):
+        self.tamano_celda = tamano_celda
+        self.pisos = {}  # piso -> {(cx, cy): [nodos]}
+        for nodo in habitaciones.values():
+            self.insertar(nodo)
+
+    def celda(self, position):
+        return (math.floor(position[0] / self.tamano_celda), math.floor(position[1] / self.tamano_celda))
+
+    def insertar(self, nodo):
+        celdas = self.pisos.setdefault(nodo.piso, {})
+        celdas.setdefault(self.celda(nodo.position), []).append(nodo)
+
+    def vecinos(self, nodo, radio, piso=None):
+        # Habitaciones del piso indicado (por defecto el del nodo) a distancia <= radio.
+        # La distancia en (x, y) nunca supera la 3D, así que la rejilla no pierde candidatos.
+        celdas = self.pisos.get(nodo.piso if piso is None else piso)
+        if not celdas:
+            return []
+        cx, cy = self.celda(nodo.position)
+        alcance = math.ceil(radio / self.tamano_celda)
+        encontrados = []
+        for dx in range(-alcance, alcance + 1):
+            for dy in range(-alcance, alcance + 1):
+                for otro in celdas.get((cx + dx, cy + dy), ()):
+                    if otro is not nodo and nodo.calcular_distancia(otro) <= radio:
+                        encontrados.append(otro)
+        return encontrados
+
+def pares_fusionables(habitaciones, indice, distancia_max=2.0, diferencia_ruido=5):
+    # Mismos criterios y mismo orden (i < j) que el recorrido por todos los pares
+    orden = {name: i for i, name in enumerate(habitaciones)}
+    pares = []
+    for name, nodo1 in habitaciones.items():
+        candidatos = [otro for otro in indice.vecinos(nodo1, distancia_max) if orden[otro.name] > orden[name]]
+        candidatos.sort(key=lambda otro: orden[otro.name])
+        for nodo2 in candidatos:
+            if nodo1.tipo == nodo2.tipo and abs(nodo1.ruido - nodo2.ruido) <= diferencia_ruido:
+                pares.append((nodo1, nodo2))
+    return pares
+
+def pares_entre_pisos(pisos, indice, radio):
+    # Pares de habitaciones en pisos adyacentes (piso, piso + 1) a distancia <= radio
+    pares = []
+    for piso, nodos in pisos.items():
+        for nodo in nodos:
+            for otro in indice.vecinos(nodo, radio, piso=piso + 1):
+                pares.append((nodo, otro))
+    return pares
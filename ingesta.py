@@ -0,0 +1,154 @@
+import contextlib
+import socket
+import sys
+
+import numpy as np
+
+# Ingesta continua de lecturas de sensores (tiempo, habitación, dB) con agregados
+# rodantes por habitación, en memoria proporcional a la tasa de lecturas
+
+def abrir_fuente(fuente):
+    # "-" lee de stdin, "tcp:HOST:PUERTO" se conecta a un socket local, lo demás es un archivo
+    if fuente == "-":
+        return contextlib.nullcontext(sys.stdin)  # Al salir del with, stdin sigue abierto
+    if fuente.startswith("tcp:"):
+        _, host, puerto = fuente.split(":")
+        conexion = socket.create_connection((host, int(puerto)))
+        return conexion.makefile("r", encoding="utf-8")
+    return open(fuente, encoding="utf-8")
+
+def leer_lecturas(lineas):
+    # Genera (tiempo, habitacion, db) a partir de líneas "tiempo,habitacion,db";
+    # ignora comentarios, encabezados y líneas mal formadas
+    for linea in lineas:
+        if not linea or linea[0] == "#":
+            continue
+        partes = linea.rstrip("\r\n").split(",")
+        if len(partes) != 3:
+            continue
+        try:
+            yield float(partes[0]), partes[1], float(partes[2])
+        except ValueError:
+            continue
+
+class AgregadorRodante:
+    # Un anillo por habitación (filas de un único arreglo) con capacidad para la
+    # ventana más larga; Leq, máximo y percentiles se calculan por ventana de tiempo.
+    # Memoria: habitaciones x capacidad x 8 bytes (tiempos relativos y dB en float32). La
+    # capacidad parte de la tasa esperada y se duplica cuando una lectura pisaría otra aún
+    # dentro de la ventana más larga (fuentes más rápidas o habitaciones fusionadas), hasta
+    # max_lecturas_por_segundo (por defecto, FACTOR_TASA_MAXIMA veces la tasa esperada).
+    # Con el anillo en el tope, cada lectura nueva reemplaza a la más vieja aunque siga
+    # dentro de la ventana: esa lectura se pierde y se cuenta en `expulsadas`.
+    FACTOR_TASA_MAXIMA = 4
+
+    def __init__(self, nombres, ventanas=(60, 300, 900), lecturas_por_segundo=1.0, mapeo=None,
+                 max_lecturas_por_segundo=None):
+        self.nombres = list(nombres)
+        self.ids = {name: i for i, name in enumerate(self.nombres)}
+        for original, fusionado in (mapeo or {}).items():
+            if fusionado in self.ids:
+                self.ids.setdefault(original, self.ids[fusionado])
+        self.ventanas = tuple(sorted(ventanas))
+        self.capacidad = max(1, int(np.ceil(self.ventanas[-1] * lecturas_por_segundo)))
+        if max_lecturas_por_segundo is None:
+            max_lecturas_por_segundo = lecturas_por_segundo * self.FACTOR_TASA_MAXIMA
+        self.max_lecturas_por_segundo = max_lecturas_por_segundo
+        self.capacidad_maxima = max(self.capacidad, int(np.ceil(self.ventanas[-1] * max_lecturas_por_segundo)))
+        n = len(self.nombres)
+        self.tiempos = np.full((n, self.capacidad), -np.inf, dtype=np.float32)
+        self.valores = np.zeros((n, self.capacidad), dtype=np.float32)
+        self.cabezas = [0] * n  # Lista: en agregar() indexa más rápido que un arreglo
+        self.origen_tiempo = None
+        self.ultimo_tiempo = -np.inf
+        self.recibidas = 0
+        self.descartadas = 0
+        self.expulsadas = 0
+
+    def agregar(self, tiempo, habitacion, db):
+        i = self.ids.get(habitacion)
+        if i is None:
+            self.descartadas += 1
+            return False
+        if self.origen_tiempo is None:
+            self.origen_tiempo = tiempo
+        if tiempo > self.ultimo_tiempo:
+            self.ultimo_tiempo = tiempo
+        posicion = self.cabezas[i]
+        # La posición a pisar guarda la lectura más vieja del anillo: si sigue dentro de la
+        # ventana más larga, el anillo está lleno de lecturas vigentes
+        if self.tiempos.item(i, posicion) > self.ultimo_tiempo - self.origen_tiempo - self.ventanas[-1]:
+            if self.capacidad < self.capacidad_maxima:
+                self.ampliar()
+                posicion = self.cabezas[i]
+            else:
+                self.expulsadas += 1
+        self.tiempos[i, posicion] = tiempo - self.origen_tiempo
+        self.valores[i, posicion] = db
+        self.cabezas[i] = (posicion + 1) % self.capacidad
+        self.recibidas += 1
+        return True
+
+    def ampliar(self):
+        # Duplica la capacidad de todos los anillos; cada uno queda en orden cronológico
+        # con la cabeza en la primera posición nueva
+        nueva = min(self.capacidad * 2, self.capacidad_maxima)
+        orden = (np.array(self.cabezas)[:, None] + np.arange(self.capacidad)) % self.capacidad
+        tiempos = np.full((len(self.nombres), nueva), -np.inf, dtype=np.float32)
+        valores = np.zeros((len(self.nombres), nueva), dtype=np.float32)
+        tiempos[:, :self.capacidad] = np.take_along_axis(self.tiempos, orden, axis=1)
+        valores[:, :self.capacidad] = np.take_along_axis(self.valores, orden, axis=1)
+        self.tiempos, self.valores = tiempos, valores
+        self.cabezas = [self.capacidad] * len(self.nombres)
+        self.capacidad = nueva
+
+    def consumir(self, lecturas):
+        for tiempo, habitacion, db in lecturas:
+            self.agregar(tiempo, habitacion, db)
+
+    def estadisticas(self, ventana, ahora=None, niveles_excedidos=(10, 50, 90)):
+        # Por habitación: lecturas, Leq, máximo y L10/L50/L90 (nivel superado el N% del tiempo)
+        ahora = self.ultimo_tiempo if ahora is None else ahora
+        dentro = self.tiempos > ahora - ventana - (self.origen_tiempo or 0.0)
+        lecturas = dentro.sum(axis=1)
+        con_datos = lecturas > 0
+        energia = np.where(dentro, 10.0 ** (self.valores.astype(float) / 10.0), 0.0).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            leq = np.where(con_datos, 10.0 * np.log10(energia / np.maximum(lecturas, 1)), np.nan)
+        enmascarados = np.where(dentro, self.valores.astype(float), np.nan)
+        resultado = {"lecturas": lecturas, "leq": leq, "max": np.full(len(self.nombres), np.nan)}
+        if con_datos.any():
+            resultado["max"][con_datos] = np.nanmax(enmascarados[con_datos], axis=1)
+        for n in niveles_excedidos:
+            valores = np.full(len(self.nombres), np.nan)
+            if con_datos.any():
+                valores[con_datos] = np.nanpercentile(enmascarados[con_datos], 100 - n, axis=1)
+            resultado[f"L{n}"] = valores
+        return resultado
+
+    def niveles(self, ventana, ahora=None):
+        # {habitacion: Leq} solo para habitaciones con lecturas dentro de la ventana
+        estadisticas = self.estadisticas(ventana, ahora)
+        con_datos = np.flatnonzero(estadisticas["lecturas"] > 0)
+        return {self.nombres[i]: float(estadisticas["leq"][i]) for i in con_datos}
+
+def procesar_flujo(lecturas, agregador, simulacion, ventana, intervalo=None, al_evaluar=None):
+    # Consume el flujo y, cada `intervalo` segundos de datos (y al final), aplica los Leq
+    # como nivel de cada habitación y reevalúa propagación y estándares
+    siguiente = None
+    for tiempo, habitacion, db in lecturas:
+        agregador.agregar(tiempo, habitacion, db)
+        if intervalo is None:
+            continue
+        if siguiente is None:
+            siguiente = tiempo + intervalo
+        elif tiempo >= siguiente:
+            evaluar_mediciones(agregador, simulacion, ventana, al_evaluar)
+            siguiente = tiempo + intervalo
+    evaluar_mediciones(agregador, simulacion, ventana, al_evaluar)
+
+def evaluar_mediciones(agregador, simulacion, ventana, al_evaluar=None):
+    simulacion.fijar_niveles(agregador.niveles(ventana))
+    simulacion.evaluar()
+    if al_evaluar is not None:
+        al_evaluar(agregador, simulacion)
@@ -0,0 +1,102 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modelo import ESTADOS
+from propagacion import MotorPropagacion
+from formato import cargar_datos_compilados
+
+# Ejecución por lotes de trabajos (edificio, escenario) en un pool de procesos.
+# Cada proceso recibe los edificios una sola vez, en forma compacta. Los edificios
+# compilados sin cambios viajan como ruta y cada proceso mapea el mismo archivo.
+
+ESCENARIO_BASE = {"nombre": "base"}
+
+_edificios = {}
+
+CAMPOS_CON_RUTA = ("ruta", "ruido", "es_fuente", "modo", "opciones")
+
+def _abrir(datos):
+    if "nombres" in datos:
+        return datos
+    # Solo la ruta y los niveles actuales: la geometría se comparte a través del archivo mapeado
+    return {**cargar_datos_compilados(datos["ruta"]), **datos}
+
+def _inicializar_trabajador(edificios):
+    global _edificios
+    _edificios = {nombre: _abrir(datos) for nombre, datos in edificios.items()}
+
+def compactar_simulacion(simulacion):
+    simulacion.recibir_datos()
+    datos = simulacion.motor.compactar()
+    datos["mapeo"] = dict(simulacion.mapeo_reduccion)
+    datos["modo"] = simulacion.modo
+    datos["opciones"] = simulacion.opciones
+    edificio = simulacion.edificio
+    if getattr(edificio, "ruta_compilada", None) and edificio.version == edificio.version_compilado:
+        datos["ruta"] = edificio.ruta_compilada
+    return datos
+
+def _para_trabajadores(datos):
+    if "ruta" not in datos:
+        return datos
+    return {campo: datos[campo] for campo in CAMPOS_CON_RUTA}
+
+def evaluar_escenario(datos, escenario):
+    # Un escenario activa o desactiva fuentes ("fuentes": {habitacion: bool}) y puede
+    # fijar niveles ("ruido": {habitacion: dB}); los nombres fusionados se traducen con "mapeo"
+    motor = MotorPropagacion.desde_compacto(datos)
+    motor.ruido = datos["ruido"].copy()
+    motor.es_fuente = datos["es_fuente"].copy()
+    mapeo = datos.get("mapeo", {})
+    for name, activa in escenario.get("fuentes", {}).items():
+        motor.es_fuente[motor.indice[mapeo.get(name, name)]] = bool(activa)
+    for name, nivel in escenario.get("ruido", {}).items():
+        motor.ruido[motor.indice[mapeo.get(name, name)]] = nivel
+    niveles, _, _ = motor.calcular(datos.get("modo", "directo"), **datos.get("opciones", {}))
+    return niveles, motor.estados(niveles)
+
+def _ejecutar_trabajo(trabajo):
+    nombre_edificio, escenario = trabajo
+    niveles, estados = evaluar_escenario(_edificios[nombre_edificio], escenario)
+    return nombre_edificio, escenario.get("nombre", "base"), niveles, estados
+
+def ejecutar_lote(edificios, escenarios=None, procesos=None):
+    # edificios: {nombre: forma compacta}. Devuelve (tabla, estadisticas), donde cada fila
+    # de la tabla es (edificio, escenario, habitacion, nivel, estado).
+    escenarios = escenarios or [ESCENARIO_BASE]
+    trabajos = [(nombre, escenario) for nombre in edificios for escenario in escenarios]
+    inicio = time.perf_counter()
+    if procesos == 1:
+        _inicializar_trabajador(edificios)
+        resultados = list(map(_ejecutar_trabajo, trabajos))
+    else:
+        compartidos = {nombre: _para_trabajadores(datos) for nombre, datos in edificios.items()}
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador,
+                                 initargs=(compartidos,)) as pool:
+            tamano_bloque = max(1, len(trabajos) // (4 * (procesos or os.cpu_count() or 1)))
+            resultados = list(pool.map(_ejecutar_trabajo, trabajos, chunksize=tamano_bloque))
+    duracion = time.perf_counter() - inicio
+
+    tabla = []
+    for nombre_edificio, nombre_escenario, niveles, estados in resultados:
+        nombres = edificios[nombre_edificio]["nombres"]
+        for name, nivel, estado in zip(nombres, niveles.tolist(), estados.tolist()):
+            tabla.append((nombre_edificio, nombre_escenario, name, nivel, ESTADOS[estado]))
+    estadisticas = {
+        "trabajos": len(trabajos),
+        "segundos": duracion,
+        "trabajos_por_segundo": len(trabajos) / duracion if duracion > 0 else float("inf"),
+        "excede": int(sum(np.count_nonzero(estados == 2) for _, _, _, estados in resultados)),
+    }
+    return tabla, estadisticas
+
+def escribir_tabla(tabla, ruta):
+    with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(["edificio", "escenario", "habitacion", "nivel", "estado"])
+        for edificio, escenario, name, nivel, estado in tabla:
+            escritor.writerow([edificio, escenario, name, f"{nivel:.2f}", estado])
@@ -0,0 +1,209 @@
+import math
+from indice_espacial import IndiceEspacial
+
+class Nodo:
+    def __init__(self, name, tipo, pared, ventana, puerta, ruido, frecuencia, position, piso, es_fuente=False):
+        self.edificio = None  # Edificio al que pertenece, que registra los cambios de topología
+        self.name = name
+        self.tipo = tipo
+        self.pared = pared
+        self.ventana = ventana
+        self.puerta = puerta
+        self.ruido = ruido
+        self.frecuencia = frecuencia
+        self.sensores = []
+        self.conexiones = []
+        self.position = position  # (x, y, z)
+        self.piso = piso
+        self.es_fuente = es_fuente
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, position):
+        self._position = position
+        # Mover una habitación cambia las atenuaciones de sus aristas
+        if self.edificio is not None:
+            self.edificio.registrar_cambio()
+
+    def agregar_sensor(self, sensor):
+        self.sensores.append(sensor)
+
+    def conectar(self, nodo):
+        if nodo not in self.conexiones:
+            self.conexiones.append(nodo)
+            nodo.conectar_bidireccional(self)
+            if self.edificio is not None:
+                self.edificio.registrar_cambio()
+
+    def conectar_bidireccional(self, nodo):
+        if nodo not in self.conexiones:
+            self.conexiones.append(nodo)
+
+    def desconectar(self, nodo):
+        if nodo in self.conexiones:
+            self.conexiones.remove(nodo)
+            if self in nodo.conexiones:
+                nodo.conexiones.remove(self)
+            if self.edificio is not None:
+                self.edificio.registrar_cambio()
+
+    def medir_ruido(self):
+        ruido_propio = self.ruido if self.es_fuente else 0
+        ruido_propagado = 0
+        for nodo in self.conexiones:
+            distancia = self.calcular_distancia(nodo)
+            atenuacion = math.log(distancia + 1)  # Atenuación logarítmica
+            if distancia == 0:
+                continue
+            if self.piso != nodo.piso:
+                atenuacion *= 1.5  # Mayor atenuación entre pisos
+            ruido_propagado += nodo.ruido / atenuacion
+        absorcion = 0.8 if self.pared else 1.0
+        ruido_total = ruido_propio + (ruido_propagado * absorcion)
+        return ruido_total
+
+    def calcular_distancia(self, otro_nodo):
+        x1, y1, z1 = self.position
+        x2, y2, z2 = otro_nodo.position
+        return math.sqrt((x2 - x1)**2 + (y2 - y1)**2 + (z2 - z1)**2)
+
+    def get_limite_ruido(self):
+        return limites_para(self.tipo)
+
+LIMITES_RUIDO = {
+    "aula": {"limite_adecuado": 55, "limite_cercano": 60, "limite_excedido": 65},
+    "pasillo": {"limite_adecuado": 45, "limite_cercano": 50, "limite_excedido": 55},
+    "biblioteca": {"limite_adecuado": 35, "limite_cercano": 40, "limite_excedido": 45},
+    "auditorio": {"limite_adecuado": 60, "limite_cercano": 65, "limite_excedido": 70},
+    "cafetería": {"limite_adecuado": 60, "limite_cercano": 65, "limite_excedido": 70},
+    "laboratorio": {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60},
+    "oficina": {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60},
+    "reuniones": {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60},
+}
+LIMITE_PREDETERMINADO = {"limite_adecuado": 50, "limite_cercano": 55, "limite_excedido": 60}
+
+def limites_para(tipo):
+    return LIMITES_RUIDO.get(tipo, LIMITE_PREDETERMINADO)
+
+RECOMENDACION_EXCEDE = (
+    "Implementar soluciones acústicas: Instalación de paneles acústicos en paredes y techos, "
+    "aislamiento de fuentes de ruido externas o internas, rediseño de la distribución de actividades, "
+    "y mejora del aislamiento en puertas y ventanas."
+)
+RECOMENDACION_CERCA = (
+    "Revisar medidas de mitigación: Considerar instalación de paneles acústicos o rediseño de actividades "
+    "para reducir niveles de ruido."
+)
+RECOMENDACION_ADECUADO = "El nivel de ruido es adecuado."
+
+# Códigos de estado usados por los cálculos vectorizados (índice en estas tuplas)
+ESTADOS = ("Adecuado", "Cerca", "Excede")
+RECOMENDACIONES = (RECOMENDACION_ADECUADO, RECOMENDACION_CERCA, RECOMENDACION_EXCEDE)
+
+def evaluar_nivel(nivel, limites):
+    # Devuelve (estado, recomendacion) según los límites del tipo de espacio
+    if nivel > limites['limite_excedido']:
+        return "Excede", RECOMENDACION_EXCEDE
+    elif nivel > limites['limite_cercano']:
+        return "Cerca", RECOMENDACION_CERCA
+    return "Adecuado", RECOMENDACION_ADECUADO
+
+class Sensor:
+    def __init__(self, ubicacion, ruido_fijo=None):
+        self.ubicacion = ubicacion
+        self.ruido_fijo = ruido_fijo
+
+    def medir(self):
+        return self.ruido_fijo if self.ruido_fijo is not None else 0
+
+class Edificio:
+    # Modelo del edificio: habitaciones por nombre y una versión que cambia con la topología
+    def __init__(self, habitaciones=None):
+        self.habitaciones = {}
+        self.version = 0  # Cambia al agregar, conectar, fusionar, eliminar o mover habitaciones
+        self.indices_espaciales = {}  # tamano_celda -> (version, IndiceEspacial)
+        for nodo in (habitaciones or {}).values():
+            self.agregar(nodo)
+
+    def registrar_cambio(self):
+        # El motor de propagación y los índices espaciales se reconstruyen al ver otra versión
+        self.version += 1
+
+    def agregar(self, nodo):
+        nodo.edificio = self
+        self.habitaciones[nodo.name] = nodo
+        self.registrar_cambio()
+        return nodo
+
+    def eliminar(self, name):
+        # Quita la habitación con sus aristas: las vecinas dejan de verla
+        nodo = self._retirar(name)
+        for vecino in nodo.conexiones:
+            if nodo in vecino.conexiones:
+                vecino.conexiones.remove(nodo)
+        nodo.conexiones = []
+        return nodo
+
+    def _retirar(self, name):
+        nodo = self.habitaciones.pop(name)
+        self.registrar_cambio()
+        nodo.edificio = None
+        return nodo
+
+    def fusionar(self, grupos):
+        # grupos: listas de nodos; el primero de cada lista absorbe a los demás
+        representante = {}
+        for miembros in grupos:
+            for nodo in miembros:
+                representante[nodo.name] = miembros[0]
+
+        def destino(nodo):
+            return representante.get(nodo.name, nodo)
+
+        # Vecinos que sobreviven y apuntan a habitaciones que desaparecen
+        afectados = {}
+        for miembros in grupos:
+            for nodo in miembros[1:]:
+                for vecino in nodo.conexiones:
+                    afectados[vecino.name] = vecino
+
+        for miembros in grupos:
+            nodo = miembros[0]
+            # Nivel agregado independiente del orden: media con suma exacta. Como antes,
+            # la habitación que sobrevive conserva su propio es_fuente
+            nodo.ruido = math.fsum(miembro.ruido for miembro in miembros) / len(miembros)
+            conexiones = {}
+            for miembro in miembros:
+                for vecino in miembro.conexiones:
+                    otro = destino(vecino)
+                    if otro is not nodo:
+                        conexiones[otro.name] = otro
+                if miembro is not nodo:
+                    nodo.sensores.extend(miembro.sensores)
+            nodo.conexiones = list(conexiones.values())
+
+        for name, vecino in afectados.items():
+            if name in representante:
+                continue
+            conexiones = {}
+            for otro in vecino.conexiones:
+                otro = destino(otro)
+                if otro is not vecino:
+                    conexiones[otro.name] = otro
+            vecino.conexiones = list(conexiones.values())
+
+        # Las vecinas ya apuntan al representante: basta con retirar a los absorbidos
+        for miembros in grupos:
+            for nodo in miembros[1:]:
+                self._retirar(nodo.name)
+
+    def indice_espacial(self, tamano_celda):
+        # Se reconstruye solo si cambió la topología o alguna posición
+        version, indice = self.indices_espaciales.get(tamano_celda, (None, None))
+        if version != self.version:
+            indice = IndiceEspacial(self.habitaciones, tamano_celda)
+            self.indices_espaciales[tamano_celda] = (self.version, indice)
+        return indice
@@ -0,0 +1,146 @@
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QColor
+
+from modelo import ESTADOS, RECOMENDACIONES
+
+# Modelo de tabla del reporte sobre los arreglos de Simulacion.tabla_reporte(). La vista solo
+# pide las celdas que dibuja, y filtrar y ordenar operan sobre los arreglos (numpy), no fila a
+# fila. El texto de estado y la recomendación salen de tuplas compartidas por código.
+
+COLUMNAS = ("Habitación", "Piso", "Tipo", "Nivel (dB)", "Estado", "Recomendación")
+COLUMNA_NOMBRE, COLUMNA_PISO, COLUMNA_TIPO, COLUMNA_NIVEL, COLUMNA_ESTADO, COLUMNA_RECOMENDACION = range(6)
+SIMBOLOS = ("✅", "⚠️", "❌")  # Índice: código de modelo.ESTADOS
+TEXTOS_ESTADO = tuple(f"{simbolo} {estado}" for simbolo, estado in zip(SIMBOLOS, ESTADOS))
+PINCELES = tuple(QBrush(QColor(color)) for color in ("green", "orange", "red"))
+
+class ModeloReporte(QAbstractTableModel):
+    def __init__(self, tabla, parent=None):
+        super().__init__(parent)
+        self.nombres = tabla["nombres"]
+        self.niveles = tabla["niveles"]
+        self.estados = tabla["estados"]
+        self.pisos = tabla["pisos"]
+        self.tipos = tabla["tipos"]
+        self.codigos_tipo = tabla["codigos_tipo"]
+        self.posiciones = {name: i for i, name in enumerate(self.nombres)}
+        self.busqueda = np.array([name.lower() for name in self.nombres], dtype=str)
+        self.rango_nombres = None  # Posición de cada nombre en orden alfabético, al ordenar por nombre
+        self.filtros = {"estado": None, "piso": None, "tipo": None, "texto": ""}
+        self.columna = -1  # Sin ordenar: el orden del edificio
+        self.descendente = False
+        self.visibles = np.arange(len(self.nombres))  # Fila de la vista -> índice del reporte
+        self.fila_de = None  # Índice del reporte -> fila de la vista (-1 si está filtrada)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.visibles)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNAS)
+
+    def headerData(self, seccion, orientacion, rol=Qt.DisplayRole):
+        if orientacion == Qt.Horizontal and rol == Qt.DisplayRole:
+            return COLUMNAS[seccion]
+        return None
+
+    def data(self, index, rol=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self.visibles[index.row()]
+        columna = index.column()
+        if rol == Qt.DisplayRole:
+            if columna == COLUMNA_NOMBRE:
+                return self.nombres[i]
+            if columna == COLUMNA_PISO:
+                return int(self.pisos[i])
+            if columna == COLUMNA_TIPO:
+                return self.tipos[self.codigos_tipo[i]]
+            if columna == COLUMNA_NIVEL:
+                return f"{self.niveles[i]:.2f}"
+            if columna == COLUMNA_ESTADO:
+                return TEXTOS_ESTADO[self.estados[i]]
+            return RECOMENDACIONES[self.estados[i]]
+        if rol == Qt.ForegroundRole and columna in (COLUMNA_NIVEL, COLUMNA_ESTADO, COLUMNA_RECOMENDACION):
+            return PINCELES[self.estados[i]]
+        if rol == Qt.ToolTipRole and columna == COLUMNA_RECOMENDACION:
+            return RECOMENDACIONES[self.estados[i]]
+        if rol == Qt.TextAlignmentRole and columna in (COLUMNA_PISO, COLUMNA_NIVEL):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def sort(self, columna, orden=Qt.AscendingOrder):
+        self.columna = columna
+        self.descendente = orden == Qt.DescendingOrder
+        self.refrescar()
+
+    def filtrar(self, **filtros):
+        # estado (código), piso, tipo (nombre) o None para no filtrar; texto: parte del nombre
+        self.filtros.update(filtros)
+        self.refrescar()
+
+    def clave(self, columna):
+        if columna == COLUMNA_NOMBRE:
+            if self.rango_nombres is None:
+                self.rango_nombres = np.empty(len(self.nombres), dtype=np.int64)
+                self.rango_nombres[np.argsort(np.array(self.nombres, dtype=str), kind="stable")] = np.arange(len(self.nombres))
+            return self.rango_nombres
+        if columna == COLUMNA_PISO:
+            return self.pisos
+        if columna == COLUMNA_TIPO:
+            return self.codigos_tipo  # Los tipos vienen ordenados alfabéticamente
+        if columna == COLUMNA_NIVEL:
+            return self.niveles
+        return self.estados  # La recomendación depende solo del estado
+
+    def seleccion(self):
+        mascara = np.ones(len(self.nombres), dtype=bool)
+        if self.filtros["estado"] is not None:
+            mascara &= self.estados == self.filtros["estado"]
+        if self.filtros["piso"] is not None:
+            mascara &= self.pisos == self.filtros["piso"]
+        if self.filtros["tipo"] is not None:
+            mascara &= self.codigos_tipo == self.tipos.index(self.filtros["tipo"])
+        if self.filtros["texto"]:
+            mascara &= np.char.find(self.busqueda, self.filtros["texto"].lower()) >= 0
+        visibles = np.flatnonzero(mascara)
+        if 0 <= self.columna < len(COLUMNAS):
+            visibles = visibles[np.argsort(self.clave(self.columna)[visibles], kind="stable")]
+            if self.descendente:
+                visibles = visibles[::-1]
+        return visibles
+
+    def refrescar(self):
+        self.beginResetModel()
+        self.visibles = self.seleccion()
+        self.fila_de = None
+        self.endResetModel()
+
+    def actualizar_filas(self, filas):
+        # Filas (name, nivel, estado, recomendacion) de un recálculo incremental. Si ninguna
+        # cambia de posición ni entra o sale del filtro, solo se repintan esas filas.
+        codigos = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+        cambiadas = []
+        for name, nivel, estado, _ in filas:
+            i = self.posiciones.get(name)
+            if i is not None:
+                self.niveles[i] = nivel
+                self.estados[i] = codigos[estado]
+                cambiadas.append(i)
+        visibles = self.seleccion()
+        if not np.array_equal(visibles, self.visibles):
+            self.beginResetModel()
+            self.visibles = visibles
+            self.fila_de = None
+            self.endResetModel()
+            return
+        if self.fila_de is None:
+            self.fila_de = np.full(len(self.nombres), -1, dtype=np.int64)
+            self.fila_de[self.visibles] = np.arange(len(self.visibles))
+        for i in cambiadas:
+            fila = self.fila_de[i]
+            if fila >= 0:
+                self.dataChanged.emit(self.index(fila, 0), self.index(fila, len(COLUMNAS) - 1))
+
+    def conteo(self):
+        # Habitaciones visibles por código de estado
+        return np.bincount(self.estados[self.visibles], minlength=len(ESTADOS))
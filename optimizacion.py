@@ -0,0 +1,468 @@
+import heapq
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from propagacion import MotorPropagacion, OPCIONES_MULTISALTO, conversion_para
+
+# Optimización de arreglos: busca el conjunto de intervenciones de menor costo que deja
+# todas las habitaciones en o por debajo de su límite. Cada intervención es una tupla
+#   ("reducir_fuente", i, k): k-ésimo paso de paso_db dB menos en el ruido de la habitación i
+#   ("absorcion", i, 0): agregar absorción (pared) a una habitación que no la tiene
+#   ("cortar_conexion", i, j): eliminar la conexión entre i y j (i < j)
+# Las candidatas son las habitaciones que exceden, sus vecinas y sus conexiones. Cada una se
+# evalúa aplicándola y deshaciéndola sobre una copia del motor de propagación, recalculando
+# solo las filas afectadas (o toda la propagación, desde la solución anterior, en modo
+# multisalto o por bandas).
+
+ESTRATEGIAS = ("voraz", "ramificacion")
+LIMITES = ("excedido", "cercano")
+
+# Costos relativos: por dB reducido, por habitación y por conexión
+COSTOS = {"reducir_fuente": 2.0, "absorcion": 10.0, "cortar_conexion": 15.0}
+
+OPCIONES_OPTIMIZACION = {"paso_db": 5.0, "max_reduccion": 20.0, "limite": "excedido", "presupuesto": 10.0}
+
+class EvaluadorIntervenciones:
+    # Motor de propagación con una pila de intervenciones aplicadas que se pueden deshacer
+    def __init__(self, datos, modo="directo", opciones=None, paso_db=OPCIONES_OPTIMIZACION["paso_db"]):
+        # `datos` es la forma compacta del motor; los arreglos que cambian las intervenciones
+        # se copian para no tocar el motor de la simulación
+        opciones = dict(opciones or {})
+        self.suma = opciones.pop("suma", "lineal")
+        self.tabla = opciones.pop("tabla", False)
+        self.modo = modo
+        self.opciones = opciones
+        self.paso_db = paso_db
+        self.motor = MotorPropagacion.desde_compacto(datos)
+        for campo in ("ruido", "es_fuente", "pared", "aristas_validas"):
+            setattr(self.motor, campo, np.array(datos[campo]))
+        self.motor.ruido = self.motor.ruido.astype(float)
+        self.conversion = conversion_para(self.suma, self.tabla)
+        self.completo = modo == "multisalto" or self.suma == "bandas"
+        # Cambios menores que la tolerancia del multisalto son ruido numérico del arranque en caliente
+        self.umbral = opciones.get("tolerancia", OPCIONES_MULTISALTO["tolerancia"]) if self.completo else 0.0
+        self.valores = self.motor.ruido if self.conversion is None else self.conversion.a_potencia(self.motor.ruido)
+        self.pila = []  # (intervención, estado anterior, filas afectadas)
+        self.aplicadas = []  # Solo las intervenciones de la pila, para comparar planes rápido
+        self.posiciones_aristas = {}
+        self.x = None
+        self.niveles, self.x = self._niveles(None)
+
+    def _niveles(self, filas):
+        # Toda la propagación (desde la solución anterior) o solo las filas indicadas
+        if self.completo or filas is None:
+            niveles, x, _ = self.motor.calcular(self.modo, self.x, self.suma, self.tabla, **self.opciones)
+            return niveles, x
+        niveles = self.motor.medir_filas(filas, self.valores)
+        if self.conversion is not None:
+            niveles = self.conversion.a_db(niveles)
+        return niveles, None
+
+    def _fijar_ruido(self, i, nivel):
+        self.motor.ruido[i] = nivel
+        if self.conversion is not None:
+            self.valores[i] = self.conversion.a_potencia(nivel)
+
+    def _aristas(self, i, j):
+        # Posiciones de i -> j y j -> i en la adyacencia CSR
+        if (i, j) in self.posiciones_aristas:
+            return self.posiciones_aristas[i, j]
+        motor = self.motor
+        ida = motor.indptr[i] + np.flatnonzero(motor.indices[motor.indptr[i]:motor.indptr[i + 1]] == j)
+        vuelta = motor.indptr[j] + np.flatnonzero(motor.indices[motor.indptr[j]:motor.indptr[j + 1]] == i)
+        self.posiciones_aristas[i, j] = np.concatenate([ida, vuelta])
+        return self.posiciones_aristas[i, j]
+
+    def aplicar(self, intervencion):
+        # Devuelve las filas cuyo nivel directo puede cambiar
+        tipo, i, j = intervencion
+        motor = self.motor
+        if tipo == "reducir_fuente":
+            anterior = motor.ruido[i]
+            self._fijar_ruido(i, max(anterior - self.paso_db, 0.0))
+            filas = motor.indices[motor.indptr[i]:motor.indptr[i + 1]]
+            if motor.es_fuente[i]:
+                filas = np.append(filas, i)
+        elif tipo == "absorcion":
+            anterior = motor.pared[i]
+            motor.pared[i] = True
+            filas = np.array([i])
+        else:
+            aristas = self._aristas(i, j)
+            anterior = (aristas, motor.aristas_validas[aristas].copy())
+            motor.aristas_validas[aristas] = False
+            filas = np.array([i, j])
+        if tipo != "reducir_fuente":
+            motor.bandas_preparadas = None  # Coeficientes y pesos por banda dependen de pared y aristas
+        self.pila.append((intervencion, anterior, filas))
+        self.aplicadas.append(intervencion)
+        return filas
+
+    def deshacer(self):
+        (tipo, i, _), anterior, filas = self.pila.pop()
+        self.aplicadas.pop()
+        if tipo == "reducir_fuente":
+            self._fijar_ruido(i, anterior)
+        elif tipo == "absorcion":
+            self.motor.pared[i] = anterior
+        else:
+            aristas, validas = anterior
+            self.motor.aristas_validas[aristas] = validas
+        if tipo != "reducir_fuente":
+            self.motor.bandas_preparadas = None
+        return filas
+
+    def ir_a(self, plan):
+        # Deja aplicadas exactamente las intervenciones de `plan`, en orden, deshaciendo solo
+        # lo que no comparte con la pila actual
+        if self.aplicadas == plan:
+            return
+        comun = 0
+        limite = min(len(plan), len(self.aplicadas))
+        while comun < limite and self.aplicadas[comun] == plan[comun]:
+            comun += 1
+        filas = [self.deshacer() for _ in range(len(self.pila) - comun)]
+        filas += [self.aplicar(intervencion) for intervencion in plan[comun:]]
+        self._actualizar(np.unique(np.concatenate(filas)))
+
+    def _actualizar(self, filas):
+        niveles, x = self._niveles(filas.astype(np.int64))
+        if self.completo:
+            self.niveles, self.x = niveles, x
+        else:
+            self.niveles[filas] = niveles
+
+    def quitar(self, intervencion):
+        # Deshace una intervención de cualquier posición de la pila: las intervenciones conmutan
+        # porque cada una toca su propio campo, salvo los pasos de reducción de una misma
+        # habitación, y de esos solo se quita el último
+        posicion = self.aplicadas.index(intervencion)
+        self.pila.append(self.pila.pop(posicion))
+        self.aplicadas.append(self.aplicadas.pop(posicion))
+        self._actualizar(self.deshacer())
+
+    def reponer(self, intervencion):
+        self._actualizar(self.aplicar(intervencion))
+
+    def probar(self, intervencion):
+        # (filas que cambian, sus niveles nuevos) si se aplicara la intervención
+        filas = self.aplicar(intervencion).astype(np.int64)
+        nuevos, _ = self._niveles(filas)
+        self.deshacer()
+        if self.completo:
+            filas = np.flatnonzero(np.abs(nuevos - self.niveles) > self.umbral)
+            nuevos = nuevos[filas]
+        return filas, nuevos
+
+_evaluador = None
+
+def _inicializar_trabajador(datos, modo, opciones, paso_db):
+    global _evaluador
+    _evaluador = EvaluadorIntervenciones(datos, modo, opciones, paso_db)
+
+def _probar_bloque(trabajo):
+    # Cada proceso lleva su propia pila: solo reaplica lo que cambió desde el bloque anterior
+    plan, candidatas = trabajo
+    _evaluador.ir_a(plan)
+    return [_evaluador.probar(intervencion) for intervencion in candidatas]
+
+def _mochila(filas, reducciones, precios, necesario):
+    # Costo mínimo por fila de reunir `necesario` dB con fracciones de las reducciones disponibles
+    orden = np.lexsort((-reducciones / precios, filas))
+    filas, reducciones, precios = filas[orden], reducciones[orden], precios[orden]
+    inicios = np.searchsorted(filas, np.arange(len(necesario)))
+    acumulada = np.cumsum(reducciones)
+    gastado = np.cumsum(precios)
+    acumulada -= np.concatenate([[0.0], acumulada])[inicios][filas]
+    gastado -= np.concatenate([[0.0], gastado])[inicios][filas]
+    alcanza = np.flatnonzero(acumulada >= necesario[filas])
+    _, primeras = np.unique(filas[alcanza], return_index=True)
+    k = alcanza[primeras]
+    costos = np.zeros(len(necesario))
+    sobrante = (acumulada[k] - necesario[filas[k]]) / reducciones[k]
+    costos[filas[k]] = gastado[k] - precios[k] * sobrante
+    return costos
+
+class OptimizadorArreglos:
+    def __init__(self, evaluador, costos=None, limite="excedido", max_reduccion=OPCIONES_OPTIMIZACION["max_reduccion"],
+                 presupuesto=None, pool=None, procesos=1):
+        if limite not in LIMITES:
+            raise ValueError(f"Límite desconocido: {limite}")
+        self.evaluador = evaluador
+        self.costos = {**COSTOS, **(costos or {})}
+        self.limite = getattr(evaluador.motor, "limite_" + limite)
+        self.ruido_base = evaluador.motor.ruido.copy()  # Antes de cualquier intervención
+        self.max_pasos = int(max_reduccion // evaluador.paso_db)
+        self.fin = None if presupuesto is None else time.perf_counter() + presupuesto
+        self.pool = pool
+        self.procesos = procesos
+        self.evaluaciones = 0
+        self.nodos = 0
+        self.interrumpido = False
+        self.mejor_costo = np.inf
+        self.mejor_plan = None
+
+    def agotado(self):
+        if self.fin is not None and time.perf_counter() > self.fin:
+            self.interrumpido = True
+        return self.interrumpido
+
+    def costo(self, intervencion):
+        tipo, i, k = intervencion
+        if tipo != "reducir_fuente":
+            return self.costos[tipo]
+        # Se pagan los dB que baja el paso k; el último puede quedar corto al llegar a 0 dB
+        paso, ruido = self.evaluador.paso_db, float(self.ruido_base[i])
+        return self.costos[tipo] * (min(k * paso, ruido) - min((k - 1) * paso, ruido))
+
+    def costo_plan(self, plan):
+        return sum(self.costo(intervencion) for intervencion in plan)
+
+    def factible(self):
+        return not np.any(self.evaluador.niveles > self.limite)
+
+    def candidatas(self, plan, excluidas=frozenset()):
+        # Intervenciones sobre las habitaciones que exceden en el estado de `plan` y sus vecinas.
+        # El paso k de reducción solo está disponible si ya se aplicó el k - 1.
+        motor = self.evaluador.motor
+        aplicadas = set(plan)
+        pasos = {}
+        for tipo, i, k in plan:
+            if tipo == "reducir_fuente":
+                pasos[i] = max(pasos.get(i, 0), k)
+        candidatas = {}
+        for r in np.flatnonzero(self.evaluador.niveles > self.limite).tolist():
+            vecinas = motor.indices[motor.indptr[r]:motor.indptr[r + 1]].tolist()
+            for i in ([r] if motor.es_fuente[r] else []) + vecinas:
+                k = pasos.get(i, 0) + 1
+                if k <= self.max_pasos and motor.ruido[i] > 0:
+                    candidatas[("reducir_fuente", i, k)] = None
+            if not motor.pared[r]:
+                candidatas[("absorcion", r, 0)] = None
+            for j in vecinas:
+                candidatas[("cortar_conexion", min(r, j), max(r, j))] = None
+        return [c for c in candidatas if c not in aplicadas and c not in excluidas]
+
+    def evaluar(self, candidatas):
+        # Prueba las candidatas sobre el estado actual del evaluador
+        self.evaluaciones += len(candidatas)
+        if self.pool is None or len(candidatas) < 2 * self.procesos:
+            return [self.evaluador.probar(intervencion) for intervencion in candidatas]
+        plan = list(self.evaluador.aplicadas)
+        tamano = -(-len(candidatas) // self.procesos)
+        bloques = [(plan, candidatas[k:k + tamano]) for k in range(0, len(candidatas), tamano)]
+        return [resultado for bloque in self.pool.map(_probar_bloque, bloques) for resultado in bloque]
+
+    def ganancias(self, resultados):
+        # Exceso total (dB sobre el límite) que elimina cada candidata
+        niveles, limite = self.evaluador.niveles, self.limite
+        return np.array([
+            float((np.maximum(niveles[filas] - limite[filas], 0.0) - np.maximum(nuevos - limite[filas], 0.0)).sum())
+            for filas, nuevos in resultados
+        ])
+
+    def voraz(self, plan=()):
+        # Aplica en cada ronda la candidata con más exceso eliminado por unidad de costo. Es perezoso:
+        # como las ganancias solo bajan a medida que se interviene, la de una ronda anterior es una
+        # cota superior y solo se reevalúa la candidata que llega arriba del montículo con una
+        # evaluación vieja. Los procesos reparten la evaluación inicial de todas las candidatas.
+        plan = list(plan)
+        self.evaluador.ir_a(plan)
+        monticulo = []
+        secuencia = itertools.count()
+
+        def evaluar(candidatas):
+            for candidata, ganancia in zip(candidatas, self.ganancias(self.evaluar(candidatas)).tolist()):
+                if ganancia > self.evaluador.umbral:
+                    heapq.heappush(monticulo, (-ganancia / self.costo(candidata), next(secuencia), candidata, len(plan)))
+
+        if not self.factible():
+            evaluar(self.candidatas(plan))
+        while monticulo and not self.agotado():
+            if monticulo[0][3] != len(plan):
+                evaluar([heapq.heappop(monticulo)[2]])
+                continue
+            tipo, i, k = heapq.heappop(monticulo)[2]
+            plan.append((tipo, i, k))
+            self.evaluador.reponer((tipo, i, k))
+            if self.factible():
+                break
+            if tipo == "reducir_fuente" and k < self.max_pasos and self.evaluador.motor.ruido[i] > 0:
+                evaluar([(tipo, i, k + 1)])
+        return self.podar(plan)
+
+    def podar(self, plan):
+        # Quita las intervenciones que sobran, empezando por las más caras. Devuelve el plan en el
+        # orden de la pila del evaluador.
+        self.evaluador.ir_a(plan)
+        if not self.factible():
+            return plan
+        restantes = set(plan)
+        for intervencion in sorted(plan, key=lambda c: (self.costo(c), c[2]), reverse=True):
+            tipo, i, k = intervencion
+            if self.agotado() or (tipo == "reducir_fuente" and (tipo, i, k + 1) in restantes):
+                continue
+            self.evaluador.quitar(intervencion)
+            if self.factible():
+                restantes.discard(intervencion)
+            else:
+                self.evaluador.reponer(intervencion)
+        return list(self.evaluador.aplicadas)
+
+    def cota(self, candidatas, resultados, costos):
+        # Cota inferior del costo que falta: cada habitación que excede debe bajar (nivel - límite) dB.
+        # Si las intervenciones rinden menos cuanto más se ha intervenido (como en la suma lineal
+        # directa), lo más barato para una habitación es una mochila fraccionaria con las reducciones
+        # actuales, contando los pasos de reducción que quedan. Sirve la más cara de las mochilas y
+        # también su suma si el costo de cada intervención se reparte entre las habitaciones que ayuda.
+        niveles = self.evaluador.niveles
+        exceden = np.flatnonzero(niveles > self.limite)
+        posicion = np.full(len(niveles), -1, dtype=np.int64)
+        posicion[exceden] = np.arange(len(exceden))
+        filas, reducciones, precios, repartidos = [], [], [], []
+        for (tipo, _, k), (f, nuevos), costo in zip(candidatas, resultados, costos):
+            copias = self.max_pasos - k + 1 if tipo == "reducir_fuente" else 1
+            reduccion = (niveles[f] - nuevos) * copias
+            utiles = (posicion[f] >= 0) & (reduccion > 0)
+            cantidad = int(utiles.sum())
+            filas.append(posicion[f[utiles]])
+            reducciones.append(reduccion[utiles])
+            precios.append(np.full(cantidad, costo * copias))
+            repartidos.append(np.full(cantidad, costo * copias / max(cantidad, 1)))
+        filas = np.concatenate(filas + [np.zeros(0, dtype=np.int64)])
+        reducciones = np.concatenate(reducciones + [np.zeros(0)])
+        necesario = (niveles - self.limite)[exceden]
+        alcanzable = np.bincount(filas, weights=reducciones, minlength=len(exceden))
+        if np.any(alcanzable < necesario - self.evaluador.umbral):
+            return np.inf
+        necesario = np.minimum(necesario, alcanzable)
+        completa = _mochila(filas, reducciones, np.concatenate(precios + [np.zeros(0)]), necesario)
+        repartida = _mochila(filas, reducciones, np.concatenate(repartidos + [np.zeros(0)]), necesario)
+        return max(float(completa.max(initial=0.0)), float(repartida.sum()))
+
+    def ramificacion(self):
+        # Ramificación y poda en profundidad desde la solución voraz: cada rama agrega una candidata
+        # y descarta en sus hermanas posteriores las anteriores, así cada conjunto se visita una vez
+        plan = self.voraz()
+        self.evaluador.ir_a(plan)
+        if self.factible():
+            self.mejor_costo, self.mejor_plan = self.costo_plan(plan), plan
+        self._ramificar([], 0.0, frozenset())
+        return self.mejor_plan if self.mejor_plan is not None else plan
+
+    def _ramificar(self, plan, costo, excluidas):
+        if self.agotado():
+            return
+        self.nodos += 1
+        self.evaluador.ir_a(plan)
+        if self.factible():
+            if costo < self.mejor_costo:
+                self.mejor_costo, self.mejor_plan = costo, list(plan)
+            return
+        candidatas = self.candidatas(plan, excluidas)
+        if not candidatas:
+            return
+        resultados = self.evaluar(candidatas)
+        ganancias = self.ganancias(resultados)
+        costos = np.array([self.costo(c) for c in candidatas])
+        if costo + self.cota(candidatas, resultados, costos) >= self.mejor_costo - 1e-9:
+            return
+        utiles = ganancias > self.evaluador.umbral
+        descartadas = set(excluidas) | {c for c, util in zip(candidatas, utiles.tolist()) if not util}
+        for k in np.argsort(-(ganancias / costos), kind="stable").tolist():
+            if not utiles[k]:
+                break
+            if costo + costos[k] < self.mejor_costo - 1e-9:
+                self._ramificar(plan + [candidatas[k]], costo + costos[k], frozenset(descartadas))
+            descartadas.add(candidatas[k])
+
+def resumir_plan(plan, motor, paso_db, costos=COSTOS):
+    # Intervenciones por nombre (los pasos de reducción de una habitación se juntan), listas para
+    # guardar en JSON y para aplicar_plan
+    pasos = {}
+    resumen = []
+    for tipo, i, j in plan:
+        if tipo == "reducir_fuente":
+            pasos[i] = pasos.get(i, 0) + 1
+        elif tipo == "absorcion":
+            resumen.append({"tipo": tipo, "habitaciones": [motor.nombres[i]], "costo": costos[tipo]})
+        else:
+            resumen.append({"tipo": tipo, "habitaciones": [motor.nombres[i], motor.nombres[j]], "costo": costos[tipo]})
+    reducciones = []
+    for i, k in pasos.items():
+        reduccion = min(k * paso_db, float(motor.ruido[i]))
+        reducciones.append({
+            "tipo": "reducir_fuente", "habitaciones": [motor.nombres[i]],
+            "reduccion_db": reduccion, "costo": costos["reducir_fuente"] * reduccion,
+        })
+    return reducciones + resumen
+
+def describir(intervencion):
+    nombres = intervencion["habitaciones"]
+    if intervencion["tipo"] == "reducir_fuente":
+        texto = f"Reducir el ruido de {nombres[0]} en {intervencion['reduccion_db']:.1f} dB"
+    elif intervencion["tipo"] == "absorcion":
+        texto = f"Agregar absorción en {nombres[0]}"
+    else:
+        texto = f"Cortar la conexión {nombres[0]} - {nombres[1]}"
+    return f"{texto} (costo {intervencion['costo']:g})"
+
+def optimizar(simulacion, estrategia="voraz", procesos=1, costos=None, **opciones):
+    # Plan de arreglos de menor costo para el estado actual de la simulación (mismo modo y suma).
+    # Devuelve {intervenciones, costo, factible, excede, estadisticas}; no modifica el edificio.
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia desconocida: {estrategia}")
+    opciones = {**OPCIONES_OPTIMIZACION, **opciones}
+    simulacion.recibir_datos()
+    datos = simulacion.motor.compactar()
+    evaluador = EvaluadorIntervenciones(datos, simulacion.modo, simulacion.opciones, opciones["paso_db"])
+    inicio = time.perf_counter()
+    pool = None
+    if procesos > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=procesos, initializer=_inicializar_trabajador,
+            initargs=(datos, simulacion.modo, simulacion.opciones, opciones["paso_db"])
+        )
+    try:
+        optimizador = OptimizadorArreglos(
+            evaluador, costos, opciones["limite"], opciones["max_reduccion"], opciones["presupuesto"], pool, procesos
+        )
+        plan = optimizador.voraz() if estrategia == "voraz" else optimizador.ramificacion()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    evaluador.ir_a(plan)
+    intervenciones = resumir_plan(plan, simulacion.motor, opciones["paso_db"], optimizador.costos)
+    return {
+        "intervenciones": intervenciones,
+        "costo": optimizador.costo_plan(plan),
+        "factible": optimizador.factible(),
+        "excede": int(np.count_nonzero(evaluador.niveles > optimizador.limite)),
+        "estadisticas": {
+            "estrategia": estrategia,
+            "evaluaciones": optimizador.evaluaciones,
+            "nodos": optimizador.nodos,
+            "segundos": time.perf_counter() - inicio,
+            # Sin interrumpir, ramificación y poda recorrió todo el espacio de candidatas
+            "completo": not optimizador.interrumpido,
+        },
+    }
+
+def aplicar_plan(simulacion, intervenciones):
+    # Aplica las intervenciones al edificio y reevalúa la simulación
+    habitaciones = simulacion.habitaciones
+    for intervencion in intervenciones:
+        nombres = intervencion["habitaciones"]
+        nodo = habitaciones[nombres[0]]
+        if intervencion["tipo"] == "reducir_fuente":
+            nodo.ruido = max(nodo.ruido - intervencion["reduccion_db"], 0.0)
+        elif intervencion["tipo"] == "absorcion":
+            nodo.pared = True
+            # pared se empaqueta con la geometría: otra versión fuerza a reempaquetar el motor
+            simulacion.edificio.registrar_cambio()
+        else:
+            nodo.desconectar(habitaciones[nombres[1]])
+    return simulacion.evaluar()
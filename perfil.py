@@ -0,0 +1,157 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Instrumentación de las etapas del cálculo: tiempos por etapa (anidadas, "padre/hija"),
+# contadores y valores observados (tamaños, tasas de acierto). Se activa con la variable de
+# entorno HABITABILIDAD_PERFIL, con --perfil en cli.py y ProyectoFinal.py o con activar().
+# Apagada, etapa() devuelve un contexto vacío compartido y contar()/fijar() vuelven enseguida.
+
+VARIABLE_ENTORNO = "HABITABILIDAD_PERFIL"
+
+_NULO = contextlib.nullcontext()
+
+class Perfil:
+    def __init__(self, nombre=""):
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.fin = None
+        self.etapas = {}  # ruta -> [llamadas, segundos], en el orden en que se abrieron
+        self.contadores = {}
+        self.valores = {}
+        self.cerrojo = threading.Lock()
+        self.hilos = threading.local()
+
+    def pila(self):
+        pila = getattr(self.hilos, "pila", None)
+        if pila is None:
+            pila = self.hilos.pila = []
+        return pila
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        pila = self.pila()
+        pila.append(nombre)
+        ruta = "/".join(pila)
+        with self.cerrojo:
+            acumulado = self.etapas.setdefault(ruta, [0, 0.0])
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            pila.pop()
+            with self.cerrojo:
+                acumulado[0] += 1
+                acumulado[1] += segundos
+
+    def contar(self, nombre, cantidad=1):
+        with self.cerrojo:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def fijar(self, nombre, valor):
+        self.valores[nombre] = valor
+
+    def terminar(self):
+        self.fin = time.perf_counter()
+
+    def segundos(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def datos(self):
+        return {
+            "nombre": self.nombre,
+            "segundos": self.segundos(),
+            "etapas": [
+                {"etapa": ruta, "llamadas": llamadas, "segundos": segundos}
+                for ruta, (llamadas, segundos) in self.etapas.items()
+            ],
+            "contadores": dict(self.contadores),
+            "valores": dict(self.valores),
+        }
+
+    def texto(self):
+        total = self.segundos()
+        lineas = [f"Perfil {self.nombre}: {total:.4f}s",
+                  f"{'etapa':<40} {'llamadas':>8} {'segundos':>10} {'%':>6}"]
+        for ruta, (llamadas, segundos) in self.etapas.items():
+            partes = ruta.split("/")
+            etiqueta = "  " * (len(partes) - 1) + partes[-1]
+            porcentaje = 100.0 * segundos / total if total else 0.0
+            lineas.append(f"{etiqueta:<40} {llamadas:>8} {segundos:>10.4f} {porcentaje:>6.1f}")
+        for nombre, valor in sorted({**self.contadores, **self.valores}.items()):
+            lineas.append(f"{nombre}: {valor:.4g}" if isinstance(valor, float) else f"{nombre}: {valor}")
+        return "\n".join(lineas)
+
+    def guardar(self, ruta):
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(self.datos(), archivo, ensure_ascii=False, indent=1)
+
+_activo = os.environ.get(VARIABLE_ENTORNO, "") not in ("", "0")
+class _Hilos(threading.local):
+    perfil = None  # Perfil de la sesión en curso de cada hilo
+
+_hilos = _Hilos()
+_ultimo = None  # Último perfil completo
+
+def activar(activo=True):
+    global _activo
+    _activo = activo
+
+def activo():
+    return _activo
+
+def actual():
+    return _hilos.perfil
+
+def ultimo():
+    return _ultimo
+
+@contextlib.contextmanager
+def _sesion(perfil, nombre):
+    global _ultimo
+    anterior = actual()
+    _hilos.perfil = perfil
+    perfil.fin = None
+    try:
+        with perfil.etapa(nombre):
+            yield perfil
+    finally:
+        perfil.terminar()
+        _hilos.perfil = anterior
+        _ultimo = perfil
+
+def sesion(nombre):
+    # Un perfil nuevo por acción (una ejecución del cli, un refresco de la interfaz). Dentro
+    # de una sesión abierta en el mismo hilo solo abre una etapa más.
+    if not _activo:
+        return _NULO
+    perfil = actual()
+    if perfil is not None and perfil.pila():
+        return perfil.etapa(nombre)
+    return _sesion(Perfil(nombre), nombre)
+
+def continuar(perfil, nombre):
+    # Sigue en este hilo un perfil empezado en otro (un cálculo en segundo plano que
+    # termina en la interfaz), como una etapa más de primer nivel
+    if perfil is None or not _activo:
+        return _NULO
+    return _sesion(perfil, nombre)
+
+def etapa(nombre):
+    perfil = actual()
+    if perfil is None:
+        return _NULO
+    return perfil.etapa(nombre)
+
+def contar(nombre, cantidad=1):
+    perfil = actual()
+    if perfil is not None:
+        perfil.contar(nombre, cantidad)
+
+def fijar(nombre, valor):
+    perfil = actual()
+    if perfil is not None:
+        perfil.fijar(nombre, valor)
@@ -0,0 +1,265 @@
+import math
+import numpy as np
+import acustica
+import bandas
+import perfil
+from modelo import limites_para
+
+MODOS = ("directo", "multisalto")
+
+# Suma de dB como medir_ruido, en potencia y de vuelta a dB, o en potencia por bandas de octava
+SUMAS = ("lineal", "energia", "bandas")
+
+OPCIONES_MULTISALTO = {"saltos": 50, "tolerancia": 1e-6, "factor_salto": 0.1}
+
+def conversion_para(suma, tabla=False):
+    # None para la suma lineal; si no, algo con a_potencia/a_db (el módulo acustica o una tabla)
+    if suma not in SUMAS:
+        raise ValueError(f"Suma de niveles desconocida: {suma}")
+    if suma == "lineal":
+        return None
+    return acustica.tabla_predeterminada() if tabla else acustica
+
+class MotorPropagacion:
+    # Motor vectorizado: empaqueta las habitaciones en arreglos de NumPy y una
+    # adyacencia CSR para calcular el ruido de todas las habitaciones de una vez
+    # con las mismas reglas que Nodo.medir_ruido
+    def __init__(self, habitaciones):
+        self.empaquetar(habitaciones)
+
+    def empaquetar(self, habitaciones):
+        self.nombres = list(habitaciones.keys())
+        self.indice = {name: i for i, name in enumerate(self.nombres)}
+        nodos = list(habitaciones.values())
+        n = len(nodos)
+
+        self.posiciones = np.array([nodo.position for nodo in nodos], dtype=float).reshape(n, 3)
+        self.pisos = np.array([nodo.piso for nodo in nodos], dtype=np.int64)
+        self.pared = np.array([bool(nodo.pared) for nodo in nodos], dtype=bool)
+        self.ventana = np.array([bool(nodo.ventana) for nodo in nodos], dtype=bool)
+        self.puerta = np.array([bool(nodo.puerta) for nodo in nodos], dtype=bool)
+        self.frecuencia = np.array([nodo.frecuencia for nodo in nodos], dtype=float)
+        limites = [limites_para(nodo.tipo) for nodo in nodos]
+        self.limite_cercano = np.array([l['limite_cercano'] for l in limites], dtype=float)
+        self.limite_excedido = np.array([l['limite_excedido'] for l in limites], dtype=float)
+        self.actualizar_ruido(habitaciones)
+
+        # Adyacencia CSR respetando el orden de nodo.conexiones
+        grados = [len(nodo.conexiones) for nodo in nodos]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(grados, out=indptr[1:])
+        indices = np.array(
+            [self.indice[vecino.name] for nodo in nodos for vecino in nodo.conexiones],
+            dtype=np.int64
+        )
+        self.preparar_aristas(indptr, indices)
+
+    @classmethod
+    def desde_edificio(cls, edificio):
+        # Un edificio compacto ya guarda sus atributos en arreglos y se empaqueta sin recorrer nodos
+        almacen = getattr(edificio, "almacen", None)
+        if almacen is None:
+            return cls(edificio.habitaciones)
+        # Un edificio compilado sin cambios desde que se abrió trae los arreglos del motor
+        compilado = getattr(edificio, "compilado", None)
+        if compilado is not None and edificio.version == edificio.version_compilado:
+            motor = cls.desde_compacto(compilado)
+            motor.actualizar_ruido_edificio(edificio)
+            return motor
+        motor = cls.__new__(cls)
+        n = almacen.n
+        motor.nombres = list(almacen.nombres)
+        motor.indice = dict(almacen.ids)
+        motor.posiciones = almacen.posiciones[:n].astype(float)
+        motor.pisos = almacen.piso[:n].astype(np.int64)
+        motor.pared = almacen.pared[:n].copy()
+        motor.ventana = almacen.ventana[:n].copy()
+        motor.puerta = almacen.puerta[:n].copy()
+        motor.frecuencia = almacen.frecuencia[:n].astype(float)
+        limites = [limites_para(tipo) for tipo in almacen.tipos]
+        cercano = np.array([l['limite_cercano'] for l in limites], dtype=float)
+        excedido = np.array([l['limite_excedido'] for l in limites], dtype=float)
+        motor.limite_cercano = cercano[almacen.tipo[:n]]
+        motor.limite_excedido = excedido[almacen.tipo[:n]]
+        motor.actualizar_ruido_edificio(edificio)
+        motor.preparar_aristas(*almacen.csr())
+        return motor
+
+    def preparar_aristas(self, indptr, indices):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.filas = np.repeat(np.arange(len(self.nombres), dtype=np.int64), np.diff(self.indptr))
+        self.calcular_atenuaciones()
+
+    def actualizar_ruido_edificio(self, edificio):
+        almacen = getattr(edificio, "almacen", None)
+        if almacen is None:
+            self.actualizar_ruido(edificio.habitaciones)
+        else:
+            self.ruido = almacen.ruido[:almacen.n].astype(float)
+            self.es_fuente = almacen.es_fuente[:almacen.n].copy()
+
+    def actualizar_nodo(self, nodo):
+        # Actualización O(1) del nivel y la fuente de una sola habitación
+        i = self.indice[nodo.name]
+        self.ruido[i] = nodo.ruido
+        self.es_fuente[i] = bool(nodo.es_fuente)
+
+    def afectados(self, nombres):
+        # Una habitación modificada solo cambia su propio nivel y el de sus vecinos
+        return self.vecindad([self.indice[name] for name in nombres])
+
+    def vecindad(self, filas):
+        # Las filas indicadas y sus vecinas, ordenadas y sin repetir
+        filas = np.asarray(filas, dtype=np.int64)
+        inicios = self.indptr[filas]
+        grados = self.indptr[filas + 1] - inicios
+        aristas = np.repeat(inicios - np.cumsum(grados) + grados, grados) + np.arange(grados.sum(), dtype=np.int64)
+        return np.unique(np.concatenate([filas, self.indices[aristas]]))
+
+    def actualizar_ruido(self, habitaciones):
+        # Solo relee los niveles y las fuentes, sin tocar la geometría
+        nodos = habitaciones.values()
+        self.ruido = np.fromiter((nodo.ruido for nodo in nodos), dtype=float, count=len(self.nombres))
+        self.es_fuente = np.fromiter((bool(nodo.es_fuente) for nodo in nodos), dtype=bool, count=len(self.nombres))
+
+    def calcular_atenuaciones(self):
+        delta = self.posiciones[self.indices] - self.posiciones[self.filas]
+        distancias = np.sqrt((delta ** 2).sum(axis=1))
+        # math.log sobre las distancias únicas para coincidir bit a bit con medir_ruido
+        unicas, inverso = np.unique(distancias, return_inverse=True)
+        logs = np.array([math.log(d + 1) for d in unicas], dtype=float)
+        atenuacion = logs[inverso.reshape(-1)] if len(unicas) else np.zeros(0)
+        atenuacion = np.where(self.pisos[self.filas] != self.pisos[self.indices], atenuacion * 1.5, atenuacion)
+        self.aristas_validas = distancias != 0
+        self.atenuacion = np.where(self.aristas_validas, atenuacion, 1.0)
+
+    def transferir(self, valores):
+        # Un salto: lo que llega a cada habitación desde sus vecinas con niveles `valores`
+        aportes = np.where(self.aristas_validas, valores[self.indices] / self.atenuacion, 0.0)
+        # bincount acumula en orden de aristas, igual que el bucle de medir_ruido
+        ruido_propagado = np.bincount(self.filas, weights=aportes, minlength=len(self.nombres))
+        absorcion = np.where(self.pared, 0.8, 1.0)
+        return ruido_propagado * absorcion
+
+    def medir_todos(self, valores=None):
+        # `valores` sustituye a self.ruido (por ejemplo, las potencias en la suma energética)
+        valores = self.ruido if valores is None else valores
+        ruido_propio = np.where(self.es_fuente, valores, 0.0)
+        return ruido_propio + self.transferir(valores)
+
+    def propagar_multisalto(self, saltos=50, tolerancia=1e-6, factor_salto=0.1, inicial=None,
+                            valores=None, relativa=False, transferir=None, directo=None):
+        # Propagación por todo el grafo: el ruido recibido también se retransmite, amortiguado
+        # por factor_salto en cada salto adicional. Punto fijo de x = T·ruido + factor_salto·T·x
+        # por iteración de Jacobi; con saltos=1 coincide con medir_todos.
+        # Desde cero, la iteración k suma el salto k; `inicial` (la x de una solución anterior)
+        # arranca en caliente tras una edición. Devuelve (niveles, x, {iteraciones, residuo, convergio}).
+        # Con `relativa` (potencias) el residuo es el cambio relativo expresado en dB.
+        # `transferir` sustituye al salto de una banda (bandas.py pasa uno para habitaciones x bandas)
+        # y `directo`, si ya se conoce, es el primer salto transferir(valores).
+        valores = self.ruido if valores is None else valores
+        transferir = transferir or self.transferir
+        directo = transferir(valores) if directo is None else directo
+        x = np.zeros_like(directo) if inicial is None else np.asarray(inicial, dtype=float)
+        iteraciones = 0
+        residuo = np.inf
+        while iteraciones < saltos:
+            siguiente = directo + factor_salto * transferir(x)
+            cambio = np.abs(siguiente - x)
+            if relativa:
+                cambio = 10.0 * np.log10(1.0 + np.divide(cambio, siguiente, out=np.zeros_like(cambio), where=siguiente > 0))
+            residuo = float(np.max(cambio, initial=0.0))
+            x = siguiente
+            iteraciones += 1
+            if residuo <= tolerancia or not np.isfinite(residuo):
+                break
+        es_fuente = self.es_fuente if valores.ndim == 1 else self.es_fuente[:, None]
+        ruido_propio = np.where(es_fuente, valores, 0.0)
+        info = {"iteraciones": iteraciones, "residuo": residuo, "convergio": bool(residuo <= tolerancia)}
+        return ruido_propio + x, x, info
+
+    def calcular(self, modo="directo", inicial=None, suma="lineal", tabla=False, **opciones):
+        # Niveles según el modo de propagación y la suma de dB; con suma "energia" y `tabla`
+        # las conversiones usan la tabla cuantizada. Devuelve (niveles, x, info) como propagar_multisalto.
+        # Con suma "bandas" los espectros (habitaciones x bandas) quedan en self.espectros.
+        if modo not in MODOS:
+            raise ValueError(f"Modo de propagación desconocido: {modo}")
+        perfil.contar("propagaciones")
+        conversion = conversion_para(suma, tabla)
+        if suma == "bandas":
+            opciones = {**OPCIONES_MULTISALTO, **opciones} if modo == "multisalto" else {}
+            self.espectros, niveles, x, info = bandas.propagar(self, conversion, modo, inicial, **opciones)
+            return niveles, x, info
+        valores = self.ruido if conversion is None else conversion.a_potencia(self.ruido)
+        if modo == "multisalto":
+            niveles, x, info = self.propagar_multisalto(
+                inicial=inicial, valores=valores, relativa=conversion is not None,
+                **{**OPCIONES_MULTISALTO, **opciones}
+            )
+        else:
+            niveles, x, info = self.medir_todos(valores), None, None
+        if conversion is not None:
+            niveles = conversion.a_db(niveles)
+        return niveles, x, info
+
+    def calcular_filas(self, filas, suma="lineal", tabla=False):
+        # Propagación directa solo para las filas indicadas, con la suma de dB elegida
+        if suma == "bandas":
+            raise ValueError("La propagación por bandas se recalcula completa")
+        perfil.contar("filas_recalculadas", len(filas))
+        conversion = conversion_para(suma, tabla)
+        if conversion is None:
+            return self.medir_filas(filas)
+        return conversion.a_db(self.medir_filas(filas, conversion.a_potencia(self.ruido)))
+
+    def medir_filas(self, filas, valores=None):
+        # Igual que medir_todos pero solo para las filas indicadas, O(suma de grados)
+        valores = self.ruido if valores is None else valores
+        filas = np.asarray(filas, dtype=np.int64)
+        inicios = self.indptr[filas]
+        grados = self.indptr[filas + 1] - inicios
+        locales = np.repeat(np.arange(len(filas), dtype=np.int64), grados)
+        desplazamientos = np.arange(grados.sum(), dtype=np.int64) - np.repeat(np.cumsum(grados) - grados, grados)
+        aristas = np.repeat(inicios, grados) + desplazamientos
+        aportes = np.where(
+            self.aristas_validas[aristas],
+            valores[self.indices[aristas]] / self.atenuacion[aristas],
+            0.0
+        )
+        ruido_propagado = np.bincount(locales, weights=aportes, minlength=len(filas))
+        absorcion = np.where(self.pared[filas], 0.8, 1.0)
+        ruido_propio = np.where(self.es_fuente[filas], valores[filas], 0.0)
+        return ruido_propio + (ruido_propagado * absorcion)
+
+    def estados(self, niveles, filas=slice(None)):
+        # Código de estado por habitación: índice en modelo.ESTADOS (`niveles` de las `filas` indicadas)
+        codigos = np.zeros(len(niveles), dtype=np.int8)
+        codigos[niveles > self.limite_cercano[filas]] = 1
+        codigos[niveles > self.limite_excedido[filas]] = 2
+        return codigos
+
+    # Forma compacta (solo arreglos y nombres, sin referencias cíclicas entre Nodo)
+    # para enviar el grafo a otros procesos
+    CAMPOS_COMPACTOS = (
+        "posiciones", "pisos", "pared", "ventana", "puerta", "frecuencia", "ruido", "es_fuente", "limite_cercano", "limite_excedido",
+        "indptr", "indices", "atenuacion", "aristas_validas",
+    )
+
+    def compactar(self):
+        datos = {campo: getattr(self, campo) for campo in self.CAMPOS_COMPACTOS}
+        datos["nombres"] = self.nombres
+        return datos
+
+    @classmethod
+    def desde_compacto(cls, datos):
+        motor = cls.__new__(cls)
+        for campo in cls.CAMPOS_COMPACTOS:
+            setattr(motor, campo, datos[campo])
+        motor.nombres = list(datos["nombres"])
+        motor.indice = {name: i for i, name in enumerate(motor.nombres)}
+        motor.filas = np.repeat(np.arange(len(motor.nombres), dtype=np.int64), np.diff(motor.indptr))
+        return motor
+
+    def niveles(self):
+        return dict(zip(self.nombres, self.medir_todos().tolist()))
@@ -0,0 +1,48 @@
+from indice_espacial import pares_fusionables
+
+class UnionFind:
+    # Conjuntos disjuntos sobre índices 0..n-1; el representante es siempre el menor índice
+    def __init__(self, n):
+        self.padre = list(range(n))
+
+    def buscar(self, i):
+        padre = self.padre
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]  # Compresión por mitades
+            i = padre[i]
+        return i
+
+    def unir(self, i, j):
+        raiz_i = self.buscar(i)
+        raiz_j = self.buscar(j)
+        if raiz_i == raiz_j:
+            return
+        if raiz_i < raiz_j:
+            self.padre[raiz_j] = raiz_i
+        else:
+            self.padre[raiz_i] = raiz_j
+
+def reducir_grafo(edificio, distancia_max=2.0, diferencia_ruido=5):
+    # Agrupa todas las habitaciones fusionables (transitivamente) y fusiona cada grupo
+    # una sola vez. Devuelve {nombre_original: nombre_fusionado}.
+    habitaciones = edificio.habitaciones
+    nodos = list(habitaciones.values())
+    orden = {nodo.name: i for i, nodo in enumerate(nodos)}
+
+    # Los pares se evalúan con los niveles originales, así el resultado no depende del orden
+    conjuntos = UnionFind(len(nodos))
+    indice = edificio.indice_espacial(distancia_max)
+    for nodo1, nodo2 in pares_fusionables(habitaciones, indice, distancia_max, diferencia_ruido):
+        conjuntos.unir(orden[nodo1.name], orden[nodo2.name])
+
+    grupos = {}
+    for i in range(len(nodos)):
+        grupos.setdefault(conjuntos.buscar(i), []).append(nodos[i])
+    mapeo = {nodo.name: nodos[conjuntos.buscar(i)].name for i, nodo in enumerate(nodos)}
+
+    # Cada modelo de edificio fusiona a su manera (objetos Nodo o arreglos compactos);
+    # el primer miembro de cada grupo es el que sobrevive
+    fusionados = [miembros for miembros in grupos.values() if len(miembros) > 1]
+    if fusionados:
+        edificio.fusionar(fusionados)
+    return mapeo
@@ -0,0 +1,404 @@
+import csv
+import json
+
+import numpy as np
+
+from modelo import ESTADOS, Nodo, Sensor, Edificio, evaluar_nivel
+from propagacion import MotorPropagacion, OPCIONES_MULTISALTO
+from reduccion import reducir_grafo
+from bandas import BANDAS
+from almacen import EdificioCompacto
+import formato
+import perfil
+
+# Cálculo de la simulación sin dependencias de interfaz (PyQt5/matplotlib),
+# compartido por la ventana principal y la línea de comandos
+
+def crear_edificio_predeterminado():
+    # Definir posiciones fijas para asegurar layout consistente
+    # Ampliar el edificio con más pisos y espacios
+    # Formato: (x, y, z)
+    habitaciones = {
+        # Piso 1
+        "Recepción": Nodo("Recepción", "oficina", True, True, True, 50, 1, (0, 0, 0), piso=1, es_fuente=True),
+        "Oficina 1": Nodo("Oficina 1", "oficina", True, True, True, 55, 1, (-4, 2, 0), piso=1),
+        "Oficina 2": Nodo("Oficina 2", "oficina", True, True, True, 60, 1, (-4, -2, 0), piso=1),
+        "Pasillo 1": Nodo("Pasillo 1", "pasillo", False, False, False, 40, 1, (-2, 0, 0), piso=1),
+        "Sala de Reuniones 1": Nodo("Sala de Reuniones 1", "reuniones", True, True, True, 52, 1, (2, 2, 0), piso=1),
+        "Sala de Reuniones 2": Nodo("Sala de Reuniones 2", "reuniones", True, True, True, 48, 1, (2, -2, 0), piso=1),
+        "Aula 1": Nodo("Aula 1", "aula", True, True, True, 58, 1, (4, 2, 0), piso=1),
+        "Aula 2": Nodo("Aula 2", "aula", True, True, True, 62, 1, (4, -2, 0), piso=1),
+        # Piso 2
+        "Laboratorio 1": Nodo("Laboratorio 1", "laboratorio", True, True, True, 45, 1, (-4, 2, 3), piso=2),
+        "Laboratorio 2": Nodo("Laboratorio 2", "laboratorio", True, True, True, 48, 1, (-4, -2, 3), piso=2),
+        "Oficina 3": Nodo("Oficina 3", "oficina", True, True, True, 50, 1, (-2, 2, 3), piso=2),
+        "Pasillo 2": Nodo("Pasillo 2", "pasillo", False, False, False, 42, 1, (-2, 0, 3), piso=2),
+        "Biblioteca": Nodo("Biblioteca", "biblioteca", True, True, True, 35, 1, (2, 2, 3), piso=2),
+        "Aula 3": Nodo("Aula 3", "aula", True, True, True, 57, 1, (4, 2, 3), piso=2),
+        "Aula 4": Nodo("Aula 4", "aula", True, True, True, 61, 1, (4, -2, 3), piso=2),
+        # Piso 3
+        "Auditorio": Nodo("Auditorio", "auditorio", True, True, True, 70, 1, (-4, 2, 6), piso=3, es_fuente=True),
+        "Cafetería": Nodo("Cafetería", "cafetería", True, True, True, 65, 1, (-4, -2, 6), piso=3),
+        "Oficina 4": Nodo("Oficina 4", "oficina", True, True, True, 55, 1, (-2, 2, 6), piso=3),
+        "Pasillo 3": Nodo("Pasillo 3", "pasillo", False, False, False, 43, 1, (-2, 0, 6), piso=3),
+        "Laboratorio 3": Nodo("Laboratorio 3", "laboratorio", True, True, True, 50, 1, (2, 2, 6), piso=3),
+        "Oficina 5": Nodo("Oficina 5", "oficina", True, True, True, 53, 1, (2, -2, 6), piso=3),
+        "Sala de Reuniones 3": Nodo("Sala de Reuniones 3", "reuniones", True, True, True, 49, 1, (0, 0, 6), piso=3),
+        "Aula 5": Nodo("Aula 5", "aula", True, True, True, 59, 1, (4, 2, 6), piso=3),
+        "Aula 6": Nodo("Aula 6", "aula", True, True, True, 63, 1, (4, -2, 6), piso=3),
+        # Piso 4
+        "Biblioteca 2": Nodo("Biblioteca 2", "biblioteca", True, True, True, 34, 1, (-4, 2, 9), piso=4),
+        "Oficina 6": Nodo("Oficina 6", "oficina", True, True, True, 54, 1, (-2, 2, 9), piso=4),
+        "Pasillo 4": Nodo("Pasillo 4", "pasillo", False, False, False, 44, 1, (-2, 0, 9), piso=4),
+        "Aula 7": Nodo("Aula 7", "aula", True, True, True, 60, 1, (4, 2, 9), piso=4),
+        "Aula 8": Nodo("Aula 8", "aula", True, True, True, 64, 1, (4, -2, 9), piso=4),
+    }
+
+    edificio = Edificio(habitaciones)
+
+    # Agregar sensores a los nodos
+    for habitacion in habitaciones.values():
+        habitacion.agregar_sensor(Sensor(habitacion.name, ruido_fijo=habitacion.ruido))
+
+    # Conexiones Piso 1
+    habitaciones["Recepción"].conectar(habitaciones["Pasillo 1"])
+    habitaciones["Oficina 1"].conectar(habitaciones["Pasillo 1"])
+    habitaciones["Oficina 2"].conectar(habitaciones["Pasillo 1"])
+    habitaciones["Pasillo 1"].conectar(habitaciones["Sala de Reuniones 1"])
+    habitaciones["Pasillo 1"].conectar(habitaciones["Sala de Reuniones 2"])
+    habitaciones["Pasillo 1"].conectar(habitaciones["Aula 1"])
+    habitaciones["Pasillo 1"].conectar(habitaciones["Aula 2"])
+
+    # Conexiones entre Piso 1 y Piso 2
+    habitaciones["Pasillo 1"].conectar(habitaciones["Pasillo 2"])
+
+    # Conexiones Piso 2
+    habitaciones["Pasillo 2"].conectar(habitaciones["Laboratorio 1"])
+    habitaciones["Pasillo 2"].conectar(habitaciones["Laboratorio 2"])
+    habitaciones["Pasillo 2"].conectar(habitaciones["Oficina 3"])
+    habitaciones["Pasillo 2"].conectar(habitaciones["Biblioteca"])
+    habitaciones["Pasillo 2"].conectar(habitaciones["Aula 3"])
+    habitaciones["Pasillo 2"].conectar(habitaciones["Aula 4"])
+
+    # Conexiones entre Piso 2 y Piso 3
+    habitaciones["Pasillo 2"].conectar(habitaciones["Pasillo 3"])
+
+    # Conexiones Piso 3
+    habitaciones["Pasillo 3"].conectar(habitaciones["Auditorio"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Cafetería"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Oficina 4"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Laboratorio 3"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Oficina 5"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Sala de Reuniones 3"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Aula 5"])
+    habitaciones["Pasillo 3"].conectar(habitaciones["Aula 6"])
+
+    # Conexiones entre Piso 3 y Piso 4
+    habitaciones["Pasillo 3"].conectar(habitaciones["Pasillo 4"])
+
+    # Conexiones Piso 4
+    habitaciones["Pasillo 4"].conectar(habitaciones["Biblioteca 2"])
+    habitaciones["Pasillo 4"].conectar(habitaciones["Oficina 6"])
+    habitaciones["Pasillo 4"].conectar(habitaciones["Aula 7"])
+    habitaciones["Pasillo 4"].conectar(habitaciones["Aula 8"])
+    return edificio
+
+CADA_PROGRESO = 10000  # Filas entre avisos de progreso de escribir_reporte
+
+COLUMNAS_CSV = (
+    "name", "tipo", "pared", "ventana", "puerta", "ruido", "frecuencia", "x", "y", "z", "piso", "es_fuente", "conexiones"
+)
+
+def _booleano(texto, predeterminado):
+    texto = texto.strip().lower()
+    if not texto:
+        return predeterminado
+    return texto in ("1", "true", "si", "sí", "s", "x")
+
+def leer_csv(ruta):
+    # Una fila por habitación; "conexiones" lista vecinas separadas por ";"
+    habitaciones = []
+    conexiones = []
+    with open(ruta, encoding="utf-8", newline="") as archivo:
+        for fila in csv.DictReader(archivo):
+            habitaciones.append({
+                "name": fila["name"], "tipo": fila["tipo"],
+                "pared": _booleano(fila.get("pared", ""), True),
+                "ventana": _booleano(fila.get("ventana", ""), True),
+                "puerta": _booleano(fila.get("puerta", ""), True),
+                "ruido": float(fila["ruido"]), "frecuencia": float(fila.get("frecuencia") or 1),
+                "position": (float(fila["x"]), float(fila["y"]), float(fila["z"])),
+                "piso": int(fila["piso"]), "es_fuente": _booleano(fila.get("es_fuente", ""), False),
+            })
+            for vecina in (fila.get("conexiones") or "").split(";"):
+                if vecina.strip():
+                    conexiones.append((fila["name"], vecina.strip()))
+    return {"habitaciones": habitaciones, "conexiones": conexiones}
+
+def cargar_edificio(ruta, compacto=False):
+    # Formato JSON: {"habitaciones": [{...atributos de Nodo...}], "conexiones": [[a, b], ...]},
+    # CSV (ver COLUMNAS_CSV) o compilado (.edif, siempre compacto y mapeado en memoria).
+    # Con compacto=True se carga en un EdificioCompacto (arreglos, sin objetos Nodo ni sensores).
+    with perfil.etapa("carga"):
+        edificio = _cargar_edificio(ruta, compacto)
+        perfil.fijar("habitaciones_cargadas", len(edificio.habitaciones))
+    return edificio
+
+def _cargar_edificio(ruta, compacto):
+    if ruta.endswith(formato.EXTENSION):
+        return formato.abrir_compilado(ruta)
+    if ruta.endswith(".csv"):
+        datos = leer_csv(ruta)
+    else:
+        with open(ruta, encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+    edificio = EdificioCompacto() if compacto else Edificio()
+    for h in datos["habitaciones"]:
+        nodo = Nodo(
+            h["name"], h["tipo"], h.get("pared", True), h.get("ventana", True), h.get("puerta", True),
+            h["ruido"], h.get("frecuencia", 1), tuple(h["position"]), piso=h["piso"],
+            es_fuente=h.get("es_fuente", False)
+        )
+        if not compacto:
+            nodo.agregar_sensor(Sensor(nodo.name, ruido_fijo=nodo.ruido))
+        edificio.agregar(nodo)
+    habitaciones = edificio.habitaciones
+    for origen, destino in datos.get("conexiones", []):
+        habitaciones[origen].conectar(habitaciones[destino])
+    if compacto:
+        edificio.almacen.ajustar()
+    return edificio
+
+def guardar_edificio(edificio, ruta, mapeo=None):
+    # El formato se elige por la extensión (.json, .csv o .edif); `mapeo` marca el
+    # edificio compilado como ya reducido
+    if ruta.endswith(formato.EXTENSION):
+        formato.compilar(edificio, ruta, mapeo)
+        return
+    nodos = list(edificio.habitaciones.values())
+    if ruta.endswith(".csv"):
+        with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(COLUMNAS_CSV)
+            for nodo in nodos:
+                vecinas = ";".join(vecino.name for vecino in nodo.conexiones if nodo.name < vecino.name)
+                escritor.writerow([
+                    nodo.name, nodo.tipo, int(nodo.pared), int(nodo.ventana), int(nodo.puerta), nodo.ruido,
+                    nodo.frecuencia, *nodo.position, nodo.piso, int(nodo.es_fuente), vecinas
+                ])
+        return
+    habitaciones = [
+        {
+            "name": nodo.name, "tipo": nodo.tipo, "pared": nodo.pared, "ventana": nodo.ventana,
+            "puerta": nodo.puerta, "ruido": nodo.ruido, "frecuencia": nodo.frecuencia,
+            "position": list(nodo.position), "piso": nodo.piso, "es_fuente": nodo.es_fuente,
+        }
+        for nodo in nodos
+    ]
+    conexiones = [
+        [nodo.name, vecino.name]
+        for nodo in nodos
+        for vecino in nodo.conexiones
+        if nodo.name < vecino.name
+    ]
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump({"habitaciones": habitaciones, "conexiones": conexiones}, archivo, ensure_ascii=False, indent=1)
+
+class Simulacion:
+    def __init__(self, edificio, modo="directo", opciones=None):
+        # modo "directo" solo suma vecinas (como medir_ruido); "multisalto" propaga por
+        # todo el grafo con opciones {saltos, tolerancia, factor_salto}. Las opciones
+        # "suma" ("lineal" o "energia") y "tabla" eligen cómo se suman los decibelios.
+        self.edificio = edificio
+        self.habitaciones = edificio.habitaciones
+        self.datos_ruido = []
+        self.reporte = []
+        self.mapeo_reduccion = {}
+        self.motor = None
+        self.version_motor = None
+        self.modo = modo
+        self.opciones = dict(opciones or {})
+        self.transmitido = None  # Solución multisalto anterior, para arrancar en caliente
+        self.convergencia = None
+        self.espectros = None  # Niveles por banda (habitaciones x bandas) con suma "bandas"
+
+    def aplicar_reduccion_grafo(self):
+        # Fusiona grupos completos de habitaciones equivalentes con union-find. Un edificio
+        # compilado ya reducido trae su mapeo. En ambos casos el mapeo cubre todas las
+        # habitaciones originales: name -> habitación que la representa.
+        previa = getattr(self.edificio, "reduccion", None)
+        if previa is not None:
+            self.mapeo_reduccion = previa
+            return previa
+        with perfil.etapa("reduccion"):
+            antes = len(self.habitaciones)
+            self.mapeo_reduccion = reducir_grafo(self.edificio)
+            perfil.fijar("habitaciones_fusionadas", antes - len(self.habitaciones))
+        return self.mapeo_reduccion
+
+    def recibir_datos(self):
+        # Cálculo en lote con el motor vectorizado (mismo resultado que medir_ruido).
+        # Solo se reempaqueta la geometría si cambió la topología o alguna posición.
+        if self.version_motor != self.edificio.version:
+            with perfil.etapa("construccion_grafo"):
+                self.motor = MotorPropagacion.desde_edificio(self.edificio)
+            self.version_motor = self.edificio.version
+            self.transmitido = None
+            perfil.fijar("nodos", len(self.motor.nombres))
+            perfil.fijar("aristas", len(self.motor.indices) // 2)
+        else:
+            perfil.contar("motor_reutilizado")
+        self.motor.actualizar_ruido_edificio(self.edificio)
+        self.propagar()
+        self.datos_ruido = list(zip(self.motor.nombres, self.niveles.tolist()))
+
+    def propagar(self):
+        with perfil.etapa("propagacion"):
+            self.niveles, self.transmitido, self.convergencia = self.motor.calcular(
+                self.modo, self.transmitido, **self.opciones
+            )
+        if self.convergencia is not None:
+            perfil.contar("iteraciones_multisalto", self.convergencia["iteraciones"])
+        self.espectros = self.motor.espectros if self.opciones.get("suma") == "bandas" else None
+
+    def analizar_datos(self):
+        if not self.datos_ruido:
+            self.promedio_ruido = 0
+            self.max_ruido = 0
+        else:
+            self.promedio_ruido = float(self.niveles.mean())
+            self.max_ruido = float(self.niveles.max())
+
+    def comparar_estandares(self):
+        with perfil.etapa("estandares"):
+            self.reporte = []
+            for name, nivel in self.datos_ruido:
+                espacio = self.habitaciones[name]
+                estado, recomendacion = evaluar_nivel(nivel, espacio.get_limite_ruido())
+                self.reporte.append((name, nivel, estado, recomendacion))
+
+    def evaluar(self):
+        with perfil.etapa("evaluar"):
+            self.recibir_datos()
+            self.analizar_datos()
+            self.comparar_estandares()
+        return self.reporte
+
+    def fijar_niveles(self, niveles):
+        # Asigna niveles medidos ({habitacion: dB}) como ruido de cada habitación
+        almacen = getattr(self.edificio, "almacen", None)
+        if almacen is not None:
+            ids = [almacen.ids[name] for name in niveles]
+            almacen.ruido[ids] = list(niveles.values())
+        else:
+            for name, nivel in niveles.items():
+                self.habitaciones[name].ruido = nivel
+
+    def puede_actualizar(self):
+        return bool(self.datos_ruido) and self.version_motor == self.edificio.version
+
+    def actualizar_incremental(self, modificados):
+        # Recalcula solo las habitaciones modificadas y sus vecinos.
+        # Devuelve las filas de reporte cambiadas y {nombre: estado}.
+        with perfil.etapa("incremental"):
+            return self._actualizar_incremental(modificados)
+
+    def _actualizar_incremental(self, modificados):
+        for name in modificados:
+            self.motor.actualizar_nodo(self.habitaciones[name])
+        if self.modo == "multisalto" or self.opciones.get("suma") == "bandas":
+            # Un cambio alcanza todo el grafo (o todas las bandas): se resuelve de nuevo, desde la
+            # solución anterior en multisalto, y solo se parchean las filas que cambiaron más que la tolerancia
+            anteriores = self.niveles
+            self.propagar()
+            tolerancia = self.opciones.get("tolerancia", OPCIONES_MULTISALTO["tolerancia"])
+            filas = np.flatnonzero(np.abs(self.niveles - anteriores) > tolerancia)
+            niveles = self.niveles[filas]
+        else:
+            filas = self.motor.afectados(modificados)
+            niveles = self.motor.calcular_filas(
+                filas, self.opciones.get("suma", "lineal"), self.opciones.get("tabla", False)
+            )
+            self.niveles[filas] = niveles
+
+        filas_reporte = []
+        estados = {}
+        for i, nivel in zip(filas.tolist(), niveles.tolist()):
+            name = self.motor.nombres[i]
+            estado, recomendacion = evaluar_nivel(nivel, self.habitaciones[name].get_limite_ruido())
+            self.datos_ruido[i] = (name, nivel)
+            self.reporte[i] = (name, nivel, estado, recomendacion)
+            filas_reporte.append(self.reporte[i])
+            estados[name] = estado
+        self.analizar_datos()
+        return filas_reporte, estados
+
+    def tabla_reporte(self):
+        # El reporte en arreglos, en el mismo orden: estado como código de ESTADOS (la
+        # recomendación es la de modelo.RECOMENDACIONES) y tipo como índice en "tipos"
+        codigos = {estado: i for i, estado in enumerate(ESTADOS)}
+        nombres = [name for name, _, _, _ in self.reporte]
+        tipos, codigos_tipo = np.unique([self.habitaciones[name].tipo for name in nombres], return_inverse=True)
+        return {
+            "nombres": nombres,
+            "niveles": np.array([nivel for _, nivel, _, _ in self.reporte], dtype=float),
+            "estados": np.array([codigos[estado] for _, _, estado, _ in self.reporte], dtype=np.int8),
+            "pisos": self.motor.pisos[[self.motor.indice[name] for name in nombres]],
+            "tipos": tipos.tolist(),
+            "codigos_tipo": codigos_tipo.astype(np.int64),
+        }
+
+    def resumen(self):
+        estados = [estado for _, _, estado, _ in self.reporte]
+        return {
+            "habitaciones": len(self.reporte),
+            "promedio_ruido": self.promedio_ruido,
+            "max_ruido": self.max_ruido,
+            "excede": estados.count("Excede"),
+            "cerca": estados.count("Cerca"),
+            "adecuado": estados.count("Adecuado"),
+            "modo": self.modo,
+            "suma": self.opciones.get("suma", "lineal"),
+            "convergencia": self.convergencia,
+        }
+
+def escribir_reporte(simulacion, ruta, tipo, filas=None, progreso=None):
+    # Con suma por bandas, json y csv incluyen además el nivel de cada banda de octava.
+    # `filas` (índices del reporte, en el orden deseado) exporta solo una parte. Las filas se
+    # escriben de a una; `progreso(hechas, total)` se llama cada CADA_PROGRESO filas.
+    espectros = simulacion.espectros
+    reporte = simulacion.reporte
+    indices = range(len(reporte)) if filas is None else filas
+    total = len(indices)
+
+    def recorrer():
+        for k, i in enumerate(indices):
+            if progreso is not None and k % CADA_PROGRESO == 0:
+                progreso(k, total)
+            yield i, reporte[i]
+
+    if tipo == "json":
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            archivo.write('{"resumen": ' + json.dumps(simulacion.resumen(), ensure_ascii=False) + ',\n "reporte": [')
+            separador = "\n  "
+            for i, (name, nivel, estado, recomendacion) in recorrer():
+                fila = {"habitacion": name, "nivel": nivel, "estado": estado, "recomendacion": recomendacion}
+                if espectros is not None:
+                    fila["bandas"] = dict(zip(map(str, BANDAS), espectros[i].tolist()))
+                archivo.write(separador + json.dumps(fila, ensure_ascii=False))
+                separador = ",\n  "
+            archivo.write("\n ]}\n")
+    elif tipo == "csv":
+        with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            bandas = [f"{banda}Hz" for banda in BANDAS] if espectros is not None else []
+            escritor.writerow(["habitacion", "nivel", "estado", "recomendacion"] + bandas)
+            for i, (name, nivel, estado, recomendacion) in recorrer():
+                fila = [name, f"{nivel:.2f}", estado, recomendacion]
+                if espectros is not None:
+                    fila += [f"{valor:.2f}" for valor in espectros[i].tolist()]
+                escritor.writerow(fila)
+    else:
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            for _, (name, nivel, estado, recomendacion) in recorrer():
+                archivo.write(f"{estado:<8} {name}: {nivel:.2f} dB - {recomendacion}\n")
@@ -0,0 +1,39 @@
+import random
+
+import numpy as np
+import pytest
+
+from generador import TOPOLOGIAS, generar_edificio
+from simulacion import Simulacion
+
+def test_eliminar_igual_en_ambos_modelos():
+    # Tras eliminar habitaciones, el almacén compacto debe quedar igual que el grafo de Nodo
+    objetos = generar_edificio(4, 100, topologia="rejilla")
+    compacto = generar_edificio(4, 100, topologia="rejilla", compacto=True)
+    for name in random.Random(0).sample(sorted(objetos.habitaciones), 40):
+        objetos.eliminar(name)
+        compacto.eliminar(name)
+    assert list(objetos.habitaciones) == list(compacto.habitaciones)
+    for name, nodo in objetos.habitaciones.items():
+        vista = compacto.habitaciones[name]
+        assert [v.name for v in nodo.conexiones] == [v.name for v in vista.conexiones], name
+        assert nodo.medir_ruido() == vista.medir_ruido(), name
+
+@pytest.mark.parametrize("topologia", TOPOLOGIAS)
+def test_reduccion_igual_en_ambos_modelos(topologia):
+    # Con separación 2.0 todas las topologías tienen vecinas fusionables. Las habitaciones
+    # fusionadas juntan sus vecinas en otro orden en cada modelo, así que los niveles pueden
+    # diferir en el último bit; los estados y el grafo no
+    resultados = []
+    for compacto in (False, True):
+        simulacion = Simulacion(generar_edificio(3, 60, topologia, fraccion_fuentes=0.2, separacion=2.0, compacto=compacto))
+        simulacion.aplicar_reduccion_grafo()
+        simulacion.evaluar()
+        vecinas = {name: sorted(v.name for v in nodo.conexiones) for name, nodo in simulacion.habitaciones.items()}
+        resultados.append((simulacion.mapeo_reduccion, vecinas, simulacion.tabla_reporte()))
+    (mapeo, vecinas, tabla), (mapeo_compacto, vecinas_compacto, tabla_compacta) = resultados
+    assert mapeo == mapeo_compacto
+    assert vecinas == vecinas_compacto
+    assert list(tabla["nombres"]) == list(tabla_compacta["nombres"])
+    np.testing.assert_array_equal(tabla["estados"], tabla_compacta["estados"])
+    np.testing.assert_allclose(tabla["niveles"], tabla_compacta["niveles"], rtol=0, atol=1e-9)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from generador import generar_edificio
+from simulacion import Simulacion, cargar_edificio, guardar_edificio
+
+def evaluada(edificio, reducir=True):
+    simulacion = Simulacion(edificio)
+    if reducir:
+        simulacion.aplicar_reduccion_grafo()
+    simulacion.evaluar()
+    return simulacion
+
+@pytest.mark.parametrize("compacto", (False, True))
+@pytest.mark.parametrize("topologia", ("pasillo", "rejilla"))
+def test_edif_conserva_niveles_y_mapeo(tmp_path, topologia, compacto):
+    # Abrir el .edif da exactamente los niveles del edificio que se compiló
+    edificio = generar_edificio(3, 60, topologia, fraccion_fuentes=0.2, separacion=2.0, compacto=compacto)
+    original = evaluada(edificio)
+    ruta = str(tmp_path / "edificio.edif")
+    guardar_edificio(original.edificio, ruta, original.mapeo_reduccion)
+    abierto = evaluada(cargar_edificio(ruta))
+    assert abierto.mapeo_reduccion == original.mapeo_reduccion
+    assert abierto.datos_ruido == original.datos_ruido
+    tabla, tabla_abierta = original.tabla_reporte(), abierto.tabla_reporte()
+    np.testing.assert_array_equal(tabla["estados"], tabla_abierta["estados"])
+
+def test_json_y_edif_dan_el_mismo_reporte(tmp_path):
+    # Lo que hace cli.py: JSON cargado en el modelo compacto, reducido y compilado
+    json_ruta = str(tmp_path / "edificio.json")
+    guardar_edificio(generar_edificio(3, 60, "rejilla", fraccion_fuentes=0.2), json_ruta)
+    desde_json = evaluada(cargar_edificio(json_ruta, compacto=True))
+    edif_ruta = str(tmp_path / "edificio.edif")
+    guardar_edificio(desde_json.edificio, edif_ruta, desde_json.mapeo_reduccion)
+    desde_edif = evaluada(cargar_edificio(edif_ruta))
+    assert desde_edif.datos_ruido == desde_json.datos_ruido
+    assert desde_edif.mapeo_reduccion == desde_json.mapeo_reduccion
@@ -0,0 +1,60 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import generador
+from optimizacion import COSTOS, EvaluadorIntervenciones, OptimizadorArreglos, resumir_plan
+from simulacion import Simulacion
+
+# Reducir barato para que los planes mezclen los tres tipos de arreglo
+COSTOS_MEZCLADOS = {"reducir_fuente": 0.5, "absorcion": 4.0}
+
+def crear_optimizador(simulacion, **opciones):
+    simulacion.recibir_datos()
+    evaluador = EvaluadorIntervenciones(simulacion.motor.compactar())
+    return OptimizadorArreglos(evaluador, **opciones)
+
+def fuerza_bruta(optimizador):
+    # Costo mínimo probando todos los planes con las candidatas del estado inicial (las
+    # intervenciones solo bajan niveles, así que no aparecen candidatas nuevas)
+    universo = optimizador.candidatas([])
+    reducibles = sorted({i for tipo, i, _ in universo if tipo == "reducir_fuente"})
+    otras = [c for c in universo if c[0] != "reducir_fuente"]
+    mejor = np.inf
+    for pasos in itertools.product(range(optimizador.max_pasos + 1), repeat=len(reducibles)):
+        base = [("reducir_fuente", i, k) for i, n in zip(reducibles, pasos) for k in range(1, n + 1)]
+        for elegidas in itertools.product((False, True), repeat=len(otras)):
+            plan = base + [c for c, elegida in zip(otras, elegidas) if elegida]
+            costo = optimizador.costo_plan(plan)
+            if costo >= mejor:
+                continue
+            optimizador.evaluador.ir_a(plan)
+            if optimizador.factible():
+                mejor = costo
+    return mejor
+
+@pytest.mark.parametrize("semilla", range(6))
+def test_ramificacion_igual_a_fuerza_bruta(semilla):
+    edificio = generador.generar_edificio(1, 5, "pasillo", fraccion_fuentes=0.5, semilla=semilla)
+    simulacion = Simulacion(edificio)
+    optimizador = crear_optimizador(simulacion, costos=COSTOS_MEZCLADOS, max_reduccion=10.0)
+    plan = optimizador.ramificacion()
+    optimizador.evaluador.ir_a(plan)
+    assert not optimizador.interrumpido
+    assert optimizador.factible()
+    esperado = fuerza_bruta(crear_optimizador(simulacion, costos=COSTOS_MEZCLADOS, max_reduccion=10.0))
+    assert optimizador.costo_plan(plan) == pytest.approx(esperado)
+
+def test_ultimo_paso_de_reduccion_se_cobra_hasta_0_db():
+    edificio = generador.generar_edificio(1, 5, "pasillo", fraccion_fuentes=1.0)
+    fuente = next(nodo for nodo in edificio.habitaciones.values() if nodo.es_fuente)
+    fuente.ruido = 7.0
+    simulacion = Simulacion(edificio)
+    optimizador = crear_optimizador(simulacion, max_reduccion=10.0)
+    i = simulacion.motor.indice[fuente.name]
+    plan = [("reducir_fuente", i, 1), ("reducir_fuente", i, 2)]
+    assert optimizador.costo(plan[1]) == COSTOS["reducir_fuente"] * 2.0
+    [intervencion] = resumir_plan(plan, simulacion.motor, optimizador.evaluador.paso_db)
+    assert intervencion["reduccion_db"] == 7.0
+    assert intervencion["costo"] == optimizador.costo_plan(plan)
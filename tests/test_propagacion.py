@@ -0,0 +1,19 @@
+import pytest
+
+from generador import TOPOLOGIAS, generar_edificio
+from simulacion import Simulacion
+
+@pytest.mark.parametrize("topologia", TOPOLOGIAS)
+def test_motor_igual_a_medir_ruido(topologia):
+    # El motor vectorizado suma en el mismo orden que Nodo.medir_ruido
+    simulacion = Simulacion(generar_edificio(3, 40, topologia, fraccion_fuentes=0.2))
+    simulacion.evaluar()
+    esperado = [(name, nodo.medir_ruido()) for name, nodo in simulacion.habitaciones.items()]
+    assert simulacion.datos_ruido == esperado
+
+@pytest.mark.parametrize("topologia", TOPOLOGIAS)
+def test_motor_compacto_igual_a_medir_ruido(topologia):
+    simulacion = Simulacion(generar_edificio(3, 40, topologia, fraccion_fuentes=0.2, compacto=True))
+    simulacion.evaluar()
+    esperado = [(name, vista.medir_ruido()) for name, vista in simulacion.habitaciones.items()]
+    assert simulacion.datos_ruido == esperado
@@ -0,0 +1,129 @@
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import perfil
+
+# Cálculos de la interfaz en segundo plano. Comparten un único hilo (la simulación no admite
+# dos cálculos a la vez) y solo sus señales vuelven al hilo de la interfaz, donde se
+# actualizan los widgets. Un pedido nuevo con la misma clave deja obsoleto al anterior.
+
+class TrabajoCancelado(Exception):
+    pass
+
+class SenalesTrabajo(QObject):
+    progreso = pyqtSignal(object, int, str)  # trabajo, porcentaje (-1 si no se puede estimar), mensaje
+    terminado = pyqtSignal(object, object)  # trabajo, resultado
+    fallo = pyqtSignal(object, str)  # trabajo, traza del error
+    finalizado = pyqtSignal(object)  # siempre, también si se canceló
+
+class Trabajo(QRunnable):
+    def __init__(self, clave, funcion, senales):
+        super().__init__()
+        # El ejecutor guarda la referencia hasta que termina; así tryTake no libera el objeto
+        self.setAutoDelete(False)
+        self.clave = clave
+        self.funcion = funcion
+        self.senales = senales
+        self.cancelado = False
+        self.perfil = None
+
+    def verificar(self):
+        # Punto de control: un trabajo obsoleto se interrumpe aquí
+        if self.cancelado:
+            raise TrabajoCancelado()
+
+    def progreso(self, porcentaje, mensaje=""):
+        self.verificar()
+        self.senales.progreso.emit(self, porcentaje, mensaje)
+
+    def run(self):
+        try:
+            self.verificar()
+            with perfil.sesion(self.clave) as medido:
+                self.perfil = medido
+                resultado = self.funcion(self)
+            self.senales.terminado.emit(self, resultado)
+        except TrabajoCancelado:
+            pass
+        except Exception:
+            self.senales.fallo.emit(self, traceback.format_exc())
+        finally:
+            self.senales.finalizado.emit(self)
+
+class EjecutorFondo(QObject):
+    progreso = pyqtSignal(str, int, str)  # clave, porcentaje, mensaje del trabajo vigente
+    ocupado = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.senales = SenalesTrabajo(self)
+        self.senales.progreso.connect(self._progreso)
+        self.senales.terminado.connect(self._terminado)
+        self.senales.fallo.connect(self._fallo)
+        self.senales.finalizado.connect(self._finalizado)
+        self.vigentes = {}  # clave -> (trabajo, al_terminar, al_fallar)
+        self.en_curso = set()  # Todos los trabajos enviados que no terminaron, vigentes o no
+
+    def enviar(self, clave, funcion, al_terminar, al_fallar=None):
+        # funcion(trabajo) corre en segundo plano; al_terminar(resultado) y al_fallar(traza),
+        # en el hilo de la interfaz y solo si el trabajo sigue vigente
+        anterior = self.vigentes.get(clave)
+        if anterior is not None:
+            self.cancelar(anterior[0])
+        trabajo = Trabajo(clave, funcion, self.senales)
+        self.vigentes[clave] = (trabajo, al_terminar, al_fallar)
+        self.en_curso.add(trabajo)
+        self.pool.start(trabajo)
+        self.ocupado.emit(True)
+        return trabajo
+
+    def cancelar(self, trabajo):
+        # Si no empezó se quita de la cola; si está corriendo se detiene en su próximo punto de control
+        trabajo.cancelado = True
+        if self.pool.tryTake(trabajo):
+            self.en_curso.discard(trabajo)
+        entrada = self.vigentes.get(trabajo.clave)
+        if entrada is not None and entrada[0] is trabajo:
+            del self.vigentes[trabajo.clave]
+
+    def cancelar_todos(self):
+        for trabajo, _, _ in list(self.vigentes.values()):
+            self.cancelar(trabajo)
+        self.ocupado.emit(False)
+
+    def esperar(self, milisegundos=-1):
+        return self.pool.waitForDone(milisegundos)
+
+    def _vigente(self, trabajo):
+        entrada = self.vigentes.get(trabajo.clave)
+        if entrada is None or entrada[0] is not trabajo:
+            return None
+        return entrada
+
+    def _progreso(self, trabajo, porcentaje, mensaje):
+        if self._vigente(trabajo) is not None:
+            self.progreso.emit(trabajo.clave, porcentaje, mensaje)
+
+    def _terminado(self, trabajo, resultado):
+        entrada = self._vigente(trabajo)
+        if entrada is None:
+            return
+        del self.vigentes[trabajo.clave]
+        with perfil.continuar(trabajo.perfil, "interfaz"):
+            entrada[1](resultado)
+
+    def _fallo(self, trabajo, traza):
+        entrada = self._vigente(trabajo)
+        if entrada is None:
+            return
+        del self.vigentes[trabajo.clave]
+        if entrada[2] is not None:
+            entrada[2](traza)
+
+    def _finalizado(self, trabajo):
+        self.en_curso.discard(trabajo)
+        if not self.vigentes:
+            self.ocupado.emit(False)